@@ -129,16 +129,31 @@ class ActiveNetworkVisualizer:
         builder.save_html(filepath_to_save_html)
 
 
-final_V = pd.read_csv("../Data/Palsson B.Subtilis Reconstruction/Results/final_csv.csv")
-reactions_fluxes = final_V['x210']
-# reactions_activation = reaction_fluxes.any(axis='columns')
-active_reactions_indexes = reactions_fluxes.to_numpy().nonzero()[0]
+def read_active_reactions_ids(final_csv_filepath: str, column_name: str, reactions_index_map_filepath: str) -> list:
+    """
+    :param final_csv_filepath: The filepath for final_csv.csv
+    :param column_name: The name of the fluxes column (e.g. "x210")
+    :param reactions_index_map_filepath: The filepath for reactions_index_map.json of the solved final data, used only
+                                         if final_csv.csv has no "ID" column (e.g. the output of MulticolumnFBA.ipynb)
+    :return: List of ids for the reactions with a non-zero flux in the column
+    """
+    final_v = pd.read_csv(final_csv_filepath)
+    # reactions_activation = reaction_fluxes.any(axis='columns')
+    active_reactions_indexes = final_v[column_name].to_numpy().nonzero()[0]
+    if 'ID' in final_v.columns:
+        # The rows of a reduced final data follow the template reactions (see MulticolumnSolver.save_results)
+        return final_v['ID'].iloc[active_reactions_indexes].tolist()
+    with open(reactions_index_map_filepath, 'r') as js_file:
+        rxn_map = json.load(js_file)
+    rxn_rev_map = {value: key for (key, value) in rxn_map.items()}
+    return [rxn_rev_map[rxn_index] for rxn_index in active_reactions_indexes]
+
 
 rxn_map_path = "../Data/Palsson B.Subtilis Reconstruction/Microbial Final Data/reactions_index_map.json"
-with open(rxn_map_path, 'r') as js_file:
-    rxn_map = json.load(js_file)
-rxn_rev_map = {value: key for (key, value) in rxn_map.items()}
-active_reactions_ids = [rxn_rev_map[rxn_id] for rxn_id in active_reactions_indexes]
+active_reactions_ids = read_active_reactions_ids(
+    final_csv_filepath="../Data/Palsson B.Subtilis Reconstruction/Results/final_csv.csv",
+    column_name='x210',
+    reactions_index_map_filepath=rxn_map_path)
 
 compare_rpi_df = pd.read_csv("../Data/Palsson B.Subtilis Reconstruction/Results/rpi_nz.csv")
 compare_rpi_reactions = compare_rpi_df[compare_rpi_df.columns[0]].tolist()
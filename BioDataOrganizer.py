@@ -60,8 +60,7 @@ class BioDataOrganizer:  # ToDo: 1.descriptions  2.run from middle (if we have m
             reactions_ko_filepath=filepath_to_save_ko_reactions_dict,
             media_filepath_dict=self.media_filepaths_dict,
             internal_rxns_filepath=self.internal_rxns_filepath)
-        ko_bounds_maker.make_growth_bounds()
-        ko_bounds_maker.make_non_growth_bounds()
+        ko_bounds_maker.make_all_bounds()
         ko_bounds_maker.save_all_bounds(folder_to_save=self.folder_to_save_final_bounds + 'KO Bounds/')
 
     def organize_source_util_bounds(self,
@@ -79,8 +78,7 @@ class BioDataOrganizer:  # ToDo: 1.descriptions  2.run from middle (if we have m
             sources_util_filepath=filepath_to_save_util_dict,
             media_filepath_dict=self.media_filepaths_dict,
             internal_rxns_filepath=self.internal_rxns_filepath)
-        util_bounds_maker.make_growth_bounds()
-        util_bounds_maker.make_non_growth_bounds()
+        util_bounds_maker.make_all_bounds()
         util_bounds_maker.save_all_bounds(folder_to_save=self.folder_to_save_final_bounds + 'Util Bounds/')
 
     def finalize_bounds(self):
@@ -1,102 +1,339 @@
+import array
 import json
+import numpy as np
+import scipy.sparse
 import GeneKnockOutParser
+from StoichiometryMatrix import save_stoichiometry_matrix
 # import GeneAssociationMaker
 
 
+class GrowingArray:
+    """
+    A compact buffer with amortized appends (array.array), read as a NumPy array
+    """
+    _typecodes = {np.dtype(np.int8): 'b', np.dtype(np.int32): 'i', np.dtype(np.int64): 'q', np.dtype(np.float64): 'd'}
+
+    def __init__(self, dtype):
+        self._dtype = np.dtype(dtype)
+        self._buffer = array.array(self._typecodes[self._dtype])
+        self._array = None
+
+    def extend(self, values):
+        self._buffer.extend(values)
+        self._array = None
+
+    def append(self, value):
+        self._buffer.append(value)
+        self._array = None
+
+    def __len__(self):
+        return len(self._buffer)
+
+    def get_array(self):
+        if self._array is None:
+            self._array = np.array(self._buffer, dtype=self._dtype)
+        return self._array
+
+
+def restore_values(values, are_integers):
+    """
+    :param values: A float64 array of the stored values
+    :param are_integers: An int8 array, 1 for the values read as integers from the model file
+    :return: The list of the values as read from the model file (int or float), so that they are saved as before
+    """
+    return [int(value) if is_integer else value for value, is_integer in zip(values.tolist(), are_integers.tolist())]
+
+
+class ModelStore:
+    """
+    A struct-of-arrays container of a metabolic model: id and name tables, notes, lower/upper bound arrays,
+    and a CSR (reactions x metabolites) stoichiometry. Metabolite and Reaction are thin views over it.
+    Metabolites referenced by reactions but not listed are indexed after the listed ones, once
+    list_referenced_metabolites is called (e.g. after loading a model).
+    The bounds and the coefficients read as integers (e.g. 1 rather than 1.0) are flagged, so that the views and the
+    saved S.txt, l.txt, and u.txt keep them as in the model file.
+    """
+    def __init__(self):
+        # ############ Metabolites ############
+        self.metabolites_ids = []
+        self.metabolites_names = []
+        self.metabolites_notes = []
+        self.metabolites_index_map = {}
+        # ############ Reactions ############
+        self.reactions_ids = []
+        self.reactions_names = []
+        self.reactions_notes = []
+        self.bigg_ids = []
+        self.reactions_index_map = {}
+        self._lower_bounds = GrowingArray(dtype=np.float64)
+        self._upper_bounds = GrowingArray(dtype=np.float64)
+        self._lower_bounds_integers = GrowingArray(dtype=np.int8)
+        self._upper_bounds_integers = GrowingArray(dtype=np.int8)
+        # ############ Stoichiometry triplets, with metabolites in the order of their first appearance ############
+        self._metabolites_appearance_map = {}
+        self._appearance_metabolites_ids = []
+        self._listed_appearance_indexes = []
+        self._reactions_starts = GrowingArray(dtype=np.int64)  # reaction --> its first triplet
+        self._rows_appearances = GrowingArray(dtype=np.int32)
+        self._rows_reactions = GrowingArray(dtype=np.int32)
+        self._coefficients = GrowingArray(dtype=np.float64)
+        self._coefficients_integers = GrowingArray(dtype=np.int8)
+        self._reactions_metabolites_matrix = None
+
+    def _get_appearance_index(self, met_id):
+        appearance_index = self._metabolites_appearance_map.get(met_id)
+        if appearance_index is None:
+            appearance_index = len(self._metabolites_appearance_map)
+            self._metabolites_appearance_map[met_id] = appearance_index
+            self._appearance_metabolites_ids.append(met_id)
+        return appearance_index
+
+    def add_metabolite(self, met_id, name=None, notes=None):
+        if met_id in self.metabolites_index_map:
+            raise ValueError("The metabolite " + str(met_id) + " is listed more than once")
+        local_index = len(self.metabolites_ids)
+        self.metabolites_ids.append(met_id)
+        self.metabolites_names.append(name)
+        self.metabolites_notes.append(notes)
+        self.metabolites_index_map[met_id] = local_index
+        self._listed_appearance_indexes.append(self._get_appearance_index(met_id))
+        self._reactions_metabolites_matrix = None
+        return local_index
+
+    def add_reaction(self, rec_id, name, metabolites, notes, lower_bound, upper_bound, bigg_id):
+        local_index = len(self.reactions_ids)
+        self.reactions_ids.append(rec_id)
+        self.reactions_names.append(name)
+        self.reactions_notes.append(notes)
+        self.bigg_ids.append(bigg_id)
+        self.reactions_index_map[rec_id] = local_index
+        self._lower_bounds.append(lower_bound)
+        self._upper_bounds.append(upper_bound)
+        self._lower_bounds_integers.append(isinstance(lower_bound, int))
+        self._upper_bounds_integers.append(isinstance(upper_bound, int))
+        self._reactions_starts.append(len(self._coefficients))
+        self._rows_appearances.extend(map(self._get_appearance_index, metabolites))
+        self._rows_reactions.extend([local_index] * len(metabolites))
+        self._coefficients.extend(metabolites.values())
+        self._coefficients_integers.extend([isinstance(the_coeff, int) for the_coeff in metabolites.values()])
+        self._reactions_metabolites_matrix = None
+        return local_index
+
+    def add_metabolite_dict(self, a_metabolite_dict):
+        return self.add_metabolite(met_id=a_metabolite_dict['id'],
+                                   name=a_metabolite_dict['name'],
+                                   notes=a_metabolite_dict['notes'])
+
+    def add_reaction_dict(self, a_reaction_dict):
+        return self.add_reaction(rec_id=a_reaction_dict['id'],
+                                 name=a_reaction_dict['name'],
+                                 metabolites=a_reaction_dict['metabolites'],
+                                 notes=a_reaction_dict['notes'],
+                                 lower_bound=a_reaction_dict['lower_bound'],
+                                 upper_bound=a_reaction_dict['upper_bound'],
+                                 bigg_id=a_reaction_dict['notes']['original_bigg_ids'][0])
+
+    def list_referenced_metabolites(self):
+        """
+        Lists the metabolites only referenced by the reactions, after the listed ones
+        """
+        for met_id in self._metabolites_appearance_map:
+            if met_id not in self.metabolites_index_map:
+                self.add_metabolite(met_id=met_id)
+
+    def get_num_metabolites(self):
+        return len(self.metabolites_ids)
+
+    def get_num_reactions(self):
+        return len(self.reactions_ids)
+
+    def get_lower_bounds(self):
+        return self._lower_bounds.get_array()
+
+    def get_upper_bounds(self):
+        return self._upper_bounds.get_array()
+
+    def get_lower_bounds_values(self):
+        return restore_values(self.get_lower_bounds(), self._lower_bounds_integers.get_array())
+
+    def get_upper_bounds_values(self):
+        return restore_values(self.get_upper_bounds(), self._upper_bounds_integers.get_array())
+
+    def get_lower_bound(self, local_index):
+        lower_bound = self.get_lower_bounds()[local_index].item()
+        return int(lower_bound) if self._lower_bounds_integers.get_array()[local_index] else lower_bound
+
+    def get_upper_bound(self, local_index):
+        upper_bound = self.get_upper_bounds()[local_index].item()
+        return int(upper_bound) if self._upper_bounds_integers.get_array()[local_index] else upper_bound
+
+    def get_triplets(self):
+        """
+        :return: (metabolites local indexes, reactions local indexes, coefficients as read from the model file) of
+                 the stoichiometry triplets, in the order of the reactions and of the metabolites in each reaction
+        """
+        if len(self._listed_appearance_indexes) != len(self._metabolites_appearance_map):
+            raise KeyError("Some metabolites of the reactions are not listed, see list_referenced_metabolites")
+        appearance_positions = np.empty(len(self._listed_appearance_indexes), dtype=np.int32)
+        appearance_positions[np.array(self._listed_appearance_indexes, dtype=np.int64)] = \
+            np.arange(len(self._listed_appearance_indexes))
+        return (appearance_positions[self._rows_appearances.get_array()], self._rows_reactions.get_array(),
+                restore_values(self._coefficients.get_array(), self._coefficients_integers.get_array()))
+
+    def get_reactions_metabolites_matrix(self):
+        """
+        :return: The CSR (reactions x metabolites) stoichiometry, with metabolites in their local indexes
+        """
+        if self._reactions_metabolites_matrix is None:
+            rows_metabolites, rows_reactions, _ = self.get_triplets()
+            self._reactions_metabolites_matrix = scipy.sparse.csr_matrix(
+                (self._coefficients.get_array(), (rows_reactions, rows_metabolites)),
+                shape=(self.get_num_reactions(), self.get_num_metabolites()))
+        return self._reactions_metabolites_matrix
+
+    def get_stoichiometry_matrix(self):
+        """
+        :return: The (metabolites x reactions) stoichiometry matrix as a scipy.sparse CSC matrix
+        """
+        return self.get_reactions_metabolites_matrix().transpose().tocsc()
+
+    def get_reaction_metabolites(self, local_index):
+        # The metabolites in their order in the reaction, with the coefficients as read from the model file
+        reactions_starts = self._reactions_starts.get_array()
+        start = reactions_starts[local_index]
+        end = reactions_starts[local_index + 1] if local_index + 1 < len(reactions_starts) else len(self._coefficients)
+        coefficients = restore_values(self._coefficients.get_array()[start:end],
+                                      self._coefficients_integers.get_array()[start:end])
+        return {self._appearance_metabolites_ids[appearance_index]: the_coeff
+                for appearance_index, the_coeff in zip(self._rows_appearances.get_array()[start:end].tolist(),
+                                                       coefficients)}
+
+    def make_metabolites_views(self):
+        return {met_id: Metabolite(self, local_index) for met_id, local_index in self.metabolites_index_map.items()}
+
+    def make_reactions_views(self):
+        return {rec_id: Reaction(self, local_index) for rec_id, local_index in self.reactions_index_map.items()}
+
+    @classmethod
+    def from_model_data(cls, model_data):
+        model_store = cls()
+        for a_metabolite_dict in model_data['metabolites']:
+            model_store.add_metabolite_dict(a_metabolite_dict)
+        for a_reaction_dict in model_data['reactions']:
+            model_store.add_reaction_dict(a_reaction_dict)
+        model_store.list_referenced_metabolites()
+        return model_store
+
+    @classmethod
+    def from_json_stream(cls, model_filename, chunk_size=1 << 20, keep_details=True):
+        """
+        Fills the store one metabolite/reaction at a time, walking the model file by JSONStreamReader.
+        Without keep_details, the names and notes are dropped as soon as they are read, so that only the ids,
+        bounds, and stoichiometry triplets are kept in memory.
+        """
+        model_store = cls()
+        with open(model_filename, 'r') as f:
+            reader = JSONStreamReader(f, chunk_size=chunk_size)
+            for key in reader.iterate_object_keys():
+                if key == 'metabolites':
+                    for a_metabolite_dict in reader.iterate_array():
+                        if keep_details:
+                            model_store.add_metabolite_dict(a_metabolite_dict)
+                        else:
+                            model_store.add_metabolite(met_id=a_metabolite_dict['id'])
+                elif key == 'reactions':
+                    for a_reaction_dict in reader.iterate_array():
+                        if keep_details:
+                            model_store.add_reaction_dict(a_reaction_dict)
+                        else:
+                            model_store.add_reaction(rec_id=a_reaction_dict['id'],
+                                                     name=None,
+                                                     metabolites=a_reaction_dict['metabolites'],
+                                                     notes=None,
+                                                     lower_bound=a_reaction_dict['lower_bound'],
+                                                     upper_bound=a_reaction_dict['upper_bound'],
+                                                     bigg_id=a_reaction_dict['notes']['original_bigg_ids'][0])
+                else:
+                    reader.decode_value()
+        model_store.list_referenced_metabolites()
+        return model_store
+
+
 class Metabolite:
-    def __init__(self, met_id, name, notes, local_index):
-        self._id = met_id
-        self._name = name
-        self._notes = notes
+    def __init__(self, model_store, local_index):
+        self._model_store = model_store
         self._local_index = local_index
 
     def get_id(self):
-        return self._id
+        return self._model_store.metabolites_ids[self._local_index]
 
     def get_name(self):
-        return self._name
+        return self._model_store.metabolites_names[self._local_index]
 
     def get_notes(self):
-        return self._notes
+        return self._model_store.metabolites_notes[self._local_index]
 
     def get_local_index(self):
         return self._local_index
 
 
 class Reaction:
-    def __init__(self, rec_id, name, metabolites, notes, lower_bound, upper_bound, bigg_id, local_index):
-        self._id = rec_id
-        self._name = name
-        self._metabolites = metabolites
-        self._notes = notes
-        self._lower_bound = lower_bound
-        self._upper_bound = upper_bound
+    def __init__(self, model_store, local_index):
+        self._model_store = model_store
         self._local_index = local_index
-        self._bigg_id = bigg_id
 
     def get_id(self):
-        return self._id
+        return self._model_store.reactions_ids[self._local_index]
 
     def get_name(self):
-        return self._name
+        return self._model_store.reactions_names[self._local_index]
 
     def get_metabolites(self):
-        return self._metabolites
+        return self._model_store.get_reaction_metabolites(self._local_index)
 
     def get_notes(self):
-        return self._notes
+        return self._model_store.reactions_notes[self._local_index]
 
     def get_lower_bound(self):
-        return self._lower_bound
+        return self._model_store.get_lower_bound(self._local_index)
 
     def get_upper_bound(self):
-        return self._upper_bound
+        return self._model_store.get_upper_bound(self._local_index)
 
     def get_bigg_id(self):
-        return self._bigg_id
+        return self._model_store.bigg_ids[self._local_index]
 
     def get_local_index(self):
         return self._local_index
 
+    def get_model_store(self):
+        return self._model_store
+
 
 def make_metabolites_dict(metabolites_dicts_list):
-    metabolites_dict = {}
-    num_metabolites = len(metabolites_dicts_list)
-    for index in range(num_metabolites):
-        a_metabolite_dict = metabolites_dicts_list[index]
-        the_metabolite_id = a_metabolite_dict['id']
-        the_metabolite = Metabolite(met_id=the_metabolite_id,
-                                    name=a_metabolite_dict['name'],
-                                    notes=a_metabolite_dict['notes'],
-                                    local_index=index)
-        metabolites_dict[the_metabolite_id] = the_metabolite
-    return metabolites_dict
+    return ModelStore.from_model_data({'metabolites': metabolites_dicts_list, 'reactions': []}).make_metabolites_views()
+
+
+def get_views_model_store(all_reactions):
+    # The common store of the views, if they are exactly all the reactions of one store in order
+    model_store = None
+    if all_reactions:
+        model_store = next(iter(all_reactions.values())).get_model_store()
+    if model_store is None or list(all_reactions.keys()) != model_store.reactions_ids or \
+            any(the_reaction.get_model_store() is not model_store for the_reaction in all_reactions.values()):
+        return None
+    return model_store
 
 
 def get_bigg_ids(all_reactions):
-    bigg_ids = []
-    for rec_id, the_reaction in all_reactions.items():
-        bigg_ids.append(the_reaction.get_bigg_id())
-    return bigg_ids
+    model_store = get_views_model_store(all_reactions)
+    if model_store is not None:
+        return list(model_store.bigg_ids)
+    return [the_reaction.get_bigg_id() for the_reaction in all_reactions.values()]
 
 
 def make_reactions_dict(reactions_dicts_list):
-    reactions_dict = {}
-    num_reactions = len(reactions_dicts_list)
-    for index in range(num_reactions):
-        a_reaction_dict = reactions_dicts_list[index]
-        the_reaction_id = a_reaction_dict['id']
-        original_bigg_id = a_reaction_dict['notes']['original_bigg_ids'][0]
-        the_reaction = Reaction(rec_id=the_reaction_id,
-                                name=a_reaction_dict['name'],
-                                metabolites=a_reaction_dict['metabolites'],
-                                notes=a_reaction_dict['notes'],
-                                lower_bound=a_reaction_dict['lower_bound'],
-                                upper_bound=a_reaction_dict['upper_bound'],
-                                bigg_id=original_bigg_id,
-                                local_index=index)
-        reactions_dict[the_reaction_id] = the_reaction
-    return reactions_dict
+    return ModelStore.from_model_data({'metabolites': [], 'reactions': reactions_dicts_list}).make_reactions_views()
 
 
 def save_lines(lines, save_path):
@@ -120,20 +357,33 @@ def save_sparse_stoichiometry_matrix(all_metabolites, all_reactions, save_path):
     save_lines(lines, save_path + "/S.txt")
 
 
+def save_model_store_stoichiometry_matrix(model_store, save_path):
+    # The vectorized version of save_sparse_stoichiometry_matrix (S.txt, indexed from 1), with the same lines
+    rows_metabolites, rows_reactions, coefficients = model_store.get_triplets()
+    lines = [str(model_store.get_num_metabolites()) + ' ' + str(model_store.get_num_reactions())]
+    lines += [str(met_index + 1) + ' ' + str(rec_index + 1) + ' ' + str(the_coeff)
+              for met_index, rec_index, the_coeff in zip(rows_metabolites.tolist(), rows_reactions.tolist(),
+                                                         coefficients)]
+    save_lines(lines, save_path + "/S.txt")
+
+
 def save_lower_and_upper_bounds(all_reactions, bounds_path):
+    model_store = get_views_model_store(all_reactions)
+    if model_store is not None:
+        lbs = model_store.get_lower_bounds_values()
+        ubs = model_store.get_upper_bounds_values()
+    else:
+        lbs = [the_reaction.get_lower_bound() for the_reaction in all_reactions.values()]
+        ubs = [the_reaction.get_upper_bound() for the_reaction in all_reactions.values()]
     num_reactions = len(all_reactions.keys())
-    lbs = [str(num_reactions)]
-    ubs = [str(num_reactions)]
-    for rec_id, the_reaction in all_reactions.items():
-        rec_lb = the_reaction.get_lower_bound()
-        rec_ub = the_reaction.get_upper_bound()
-        lbs.append(str(rec_lb))
-        ubs.append(str(rec_ub))
-    save_lines(lbs, bounds_path + "/l.txt")
-    save_lines(ubs, bounds_path + "/u.txt")
+    save_lines([str(num_reactions)] + [str(rec_lb) for rec_lb in lbs], bounds_path + "/l.txt")
+    save_lines([str(num_reactions)] + [str(rec_ub) for rec_ub in ubs], bounds_path + "/u.txt")
 
 
-def save_bigg_model(model_filename, save_path, do_save):
+def save_bigg_model(model_filename, save_path, do_save, streaming=False):
+    if streaming:
+        # Walks the model incrementally, and saves S.npz, l.npy, and u.npy (see stream_bigg_model)
+        return save_streamed_bigg_model(model_filename, save_path, do_save)
     # with open(metabolites_filename, 'r') as f:
     #     lines = f.readlines()
     #     headers = lines[0]
@@ -157,12 +407,123 @@ def save_bigg_model(model_filename, save_path, do_save):
         model_data['compartments'] = {}  (Blank!)
         model_data['version'] = 1
         """
-        all_metabolites = make_metabolites_dict(model_data['metabolites'])
-        all_reactions = make_reactions_dict(model_data['reactions'])
+        model_store = ModelStore.from_model_data(model_data)
         if do_save:
-            save_sparse_stoichiometry_matrix(all_metabolites, all_reactions, save_path)
-            save_lower_and_upper_bounds(all_reactions, save_path)
-        return get_bigg_ids(all_reactions)
+            save_model_store_stoichiometry_matrix(model_store, save_path)
+            save_lower_and_upper_bounds(model_store.make_reactions_views(), save_path)
+        return list(model_store.bigg_ids)
+
+
+class JSONStreamReader:
+    """
+    Walks a JSON file incrementally, decoding one value (e.g. one item of a large array) at a time,
+    so that only a chunk of the file is kept in memory.
+    """
+    def __init__(self, file, chunk_size=1 << 20):
+        self._file = file
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._buffer = ''
+        self._position = 0
+        self._is_eof = False
+
+    def _read_chunk(self):
+        chunk = self._file.read(self._chunk_size)
+        if not chunk:
+            self._is_eof = True
+        self._buffer = self._buffer[self._position:] + chunk
+        self._position = 0
+
+    def peek_char(self):
+        while True:
+            while self._position < len(self._buffer) and self._buffer[self._position] in ' \t\n\r':
+                self._position += 1
+            if self._position < len(self._buffer):
+                return self._buffer[self._position]
+            if self._is_eof:
+                raise ValueError("Unexpected end of the JSON file")
+            self._read_chunk()
+
+    def expect_char(self, char):
+        if self.peek_char() != char:
+            raise ValueError("Expected " + char + " in the JSON file, found " + self._buffer[self._position])
+        self._position += 1
+
+    def decode_value(self):
+        self.peek_char()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._position)
+                # A value touching the end of the buffer (e.g. a number) may continue in the next chunk
+                if end < len(self._buffer) or self._is_eof:
+                    self._position = end
+                    return value
+            except json.JSONDecodeError:
+                if self._is_eof:
+                    raise
+            self._read_chunk()
+
+    def iterate_array(self):
+        self.expect_char('[')
+        if self.peek_char() == ']':
+            self._position += 1
+            return
+        while True:
+            yield self.decode_value()
+            if self.peek_char() == ',':
+                self._position += 1
+            else:
+                self.expect_char(']')
+                return
+
+    def iterate_object_keys(self):
+        """
+        Yields the keys of an object; the caller should consume the value of each key before the next one.
+        """
+        self.expect_char('{')
+        if self.peek_char() == '}':
+            self._position += 1
+            return
+        while True:
+            key = self.decode_value()
+            self.expect_char(':')
+            yield key
+            if self.peek_char() == ',':
+                self._position += 1
+            else:
+                self.expect_char('}')
+                return
+
+
+def stream_bigg_model(model_filename, chunk_size=1 << 20):
+    """
+    Parses a BiGG (COBRA) JSON model one metabolite/reaction at a time, keeping only the ids, bounds, and
+    stoichiometry triplets (see ModelStore.from_json_stream).
+    :return: Dict of 'metabolites_ids', 'reactions_ids', 'bigg_ids' (lists), 'lower_bounds', 'upper_bounds' (arrays),
+             and 'stoichiometry_matrix' (scipy.sparse CSC, metabolites x reactions, in the order of the model lists)
+    """
+    model_store = ModelStore.from_json_stream(model_filename, chunk_size=chunk_size, keep_details=False)
+    stoichiometry_matrix = model_store.get_stoichiometry_matrix()
+    return {'metabolites_ids': model_store.metabolites_ids,
+            'reactions_ids': model_store.reactions_ids,
+            'bigg_ids': model_store.bigg_ids,
+            'lower_bounds': model_store.get_lower_bounds(),
+            'upper_bounds': model_store.get_upper_bounds(),
+            'stoichiometry_matrix': stoichiometry_matrix}
+
+
+def save_streamed_bigg_model(model_filename, save_path, do_save):
+    """
+    The streaming version of save_bigg_model, saving S.npz (scipy.sparse), l.npy, and u.npy instead of
+    S.txt, l.txt, and u.txt.
+    :return: The original BiGG ids of the reactions
+    """
+    streamed_model = stream_bigg_model(model_filename)
+    if do_save:
+        save_stoichiometry_matrix(streamed_model['stoichiometry_matrix'], save_path + "/S.npz")
+        np.save(save_path + "/l.npy", streamed_model['lower_bounds'])
+        np.save(save_path + "/u.npy", streamed_model['upper_bounds'])
+    return streamed_model['bigg_ids']
 
 
 def main():
@@ -170,7 +531,7 @@ def main():
     # reactions_filename = "../Data/BiGG Universal Model/bigg_models_reactions.txt"
     model_filename = "../Data/BiGG Universal Model/universal_model.json"
     universal_model_path = "../Data/BiGG Universal Model"
-    all_reactions_bigg_ids = save_bigg_model(model_filename, universal_model_path, do_save=False)
+    all_reactions_bigg_ids = save_bigg_model(model_filename, universal_model_path, do_save=False, streaming=True)
     print(all_reactions_bigg_ids)
 
     # ecoli_model_path = "../Data/Escherichia coli str. K-12 substr. MG1655/iAF1260b.json"
@@ -0,0 +1,404 @@
+"""
+BoundsMatrixStore
+This code, provides a binary container for (reactions x experiments) bounds matrices, replacing the wide .csv files
+handed between the pipeline stages (L/U, lower/upper bounds, ...).
+
+A store is a folder named "<name>.bounds" containing:
+    1. "metadata.json": the data type, the shape, the reactions ids (ID index), the columns names,
+       and optional columns metadata
+    2. "chunk_<k>.npy": the columns [k * chunk_num_columns, (k + 1) * chunk_num_columns) in the column-major
+       (Fortran) order, so that each experiment column is contiguous on the disk.
+Chunks are opened with numpy.memmap (through numpy.load(mmap_mode='r')), so the downstream stages and the solver
+can slice individual experiment columns without loading the whole matrix.
+save_bounds_dataframe and read_bounds_dataframe let the pipeline stages switch between .csv files and stores, and
+BoundsMatrixStore.import_csv/export_csv convert the existing .csv files. A BoundsStoreView keeps the rows operations of
+the stages (selecting, placing, and setting rows) on one or more stores without reading their columns, which are then
+written chunk by chunk by save_bounds_view.
+"""
+
+import json
+import os
+import numpy as np
+import pandas as pd
+
+BOUNDS_STORE_EXTENSION = '.bounds'
+BOUNDS_STORE_VERSION = 1
+
+
+def is_bounds_store_path(path: str) -> bool:
+    """
+    :param path: A bounds filepath
+    :return: True if the path denotes a BoundsMatrixStore folder
+    """
+    return path.rstrip('/').endswith(BOUNDS_STORE_EXTENSION)
+
+
+def read_bounds_dataframe(path: str):
+    """
+    :param path: The path for a bounds .csv file, or a BoundsMatrixStore folder (read whole, see BoundsStoreView to
+                 keep the columns on the disk)
+    :return: The bounds as a DataFrame, with the 'ID' column followed by the experiments columns
+    """
+    if is_bounds_store_path(path):
+        return BoundsMatrixStore(path).to_dataframe()
+    return pd.read_csv(path)
+
+
+def save_bounds_dataframe(bounds_df, filepath_prefix: str, file_format: str = 'csv', dtype=np.float64,
+                          include_ids: bool = True) -> str:
+    """
+    :param bounds_df: A bounds DataFrame, with the 'ID' column followed by the experiments columns
+    :param filepath_prefix: The path to save the bounds, without the extension (e.g. folder + 'g_lower_bounds')
+    :param file_format: "csv" for a .csv file, or "binary" for a BoundsMatrixStore folder
+    :param dtype: The data type of the binary store, np.float64 or np.float32
+    :param include_ids: Whether to save the 'ID' column in the .csv file. The binary store always keeps the ids.
+    :return: The saved path
+    """
+    if file_format == 'binary':
+        store_path = filepath_prefix + BOUNDS_STORE_EXTENSION
+        BoundsMatrixStore.write_dataframe(bounds_df=bounds_df, store_path=store_path, dtype=dtype)
+        return store_path
+    if file_format != 'csv':
+        raise ValueError("file_format should be either \"csv\" or \"binary\"")
+    if not include_ids:
+        bounds_df = bounds_df.drop(columns=['ID'])
+    bounds_df.to_csv(filepath_prefix + '.csv', index=False)
+    return filepath_prefix + '.csv'
+
+
+def save_bounds_view(bounds_view, filepath_prefix: str, file_format: str = 'csv', dtype=np.float64,
+                     include_ids: bool = True) -> str:
+    """
+    :param bounds_view: A BoundsStoreView
+    :param filepath_prefix: The path to save the bounds, without the extension (e.g. folder + 'L')
+    :param file_format: "csv" for a .csv file, or "binary" for a BoundsMatrixStore folder, written chunk by chunk
+    :param dtype: The data type of the binary store, np.float64 or np.float32
+    :param include_ids: Whether to save the 'ID' column in the .csv file. The binary store always keeps the ids.
+    :return: The saved path
+    """
+    if file_format != 'binary':
+        return save_bounds_dataframe(bounds_df=bounds_view.to_dataframe(), filepath_prefix=filepath_prefix,
+                                     file_format=file_format, include_ids=include_ids)
+    store_path = filepath_prefix + BOUNDS_STORE_EXTENSION
+    if any(os.path.abspath(store.store_path) == os.path.abspath(store_path) for store in bounds_view.stores):
+        raise ValueError("The bounds store " + store_path + " cannot be overwritten by a view of itself")
+    BoundsMatrixStore.write(store_path=store_path, reactions_ids=bounds_view.reactions_ids,
+                            columns_names=bounds_view.columns_names, bounds_matrix=bounds_view, dtype=dtype)
+    return store_path
+
+
+class BoundsMatrixStore:
+    def __init__(self, store_path: str):
+        """
+        :param store_path: The path for an existing store folder (see BoundsMatrixStore.write)
+        """
+        self.store_path = store_path
+        with open(os.path.join(store_path, 'metadata.json'), 'r') as json_file:
+            self.metadata = json.load(json_file)
+        if self.metadata.get('version') != BOUNDS_STORE_VERSION:
+            raise ValueError("The bounds store " + store_path + " has an unsupported version")
+        self.dtype = np.dtype(self.metadata['dtype'])
+        self.reactions_ids = self.metadata['reactions_ids']
+        self.columns_names = self.metadata['columns_names']
+        self.columns_metadata = self.metadata.get('columns_metadata')
+        self.chunk_num_columns = self.metadata['chunk_num_columns']
+        self.reactions_index_map = {rxn_id: row_index for row_index, rxn_id in enumerate(self.reactions_ids)}
+        self.columns_index_map = {column_name: column_index
+                                  for column_index, column_name in enumerate(self.columns_names)}
+        self.chunks = {}
+
+    def get_shape(self) -> tuple:
+        return len(self.reactions_ids), len(self.columns_names)
+
+    def get_chunk(self, chunk_index: int):
+        """
+        :param chunk_index: The index of a chunk
+        :return: The (reactions x chunk columns) chunk, memory-mapped in read-only mode
+        """
+        if chunk_index not in self.chunks:
+            chunk_path = os.path.join(self.store_path, 'chunk_' + str(chunk_index) + '.npy')
+            self.chunks[chunk_index] = np.load(chunk_path, mmap_mode='r')
+        return self.chunks[chunk_index]
+
+    def get_column(self, column_index: int):
+        """
+        :param column_index: The index of an experiment column
+        :return: The bounds vector of the column, as a read-only memory-mapped view
+        """
+        chunk_index, local_column = divmod(column_index, self.chunk_num_columns)
+        return self.get_chunk(chunk_index)[:, local_column]
+
+    def get_column_by_name(self, column_name: str):
+        """
+        :param column_name: The name of an experiment column
+        :return: The bounds vector of the column, as a read-only memory-mapped view
+        """
+        return self.get_column(self.columns_index_map[column_name])
+
+    def get_columns(self, columns_indexes=None):
+        """
+        :param columns_indexes: Indexes of the desired columns, all the columns if None
+        :return: A (reactions x columns) array, read chunk by chunk
+        """
+        if columns_indexes is None:
+            columns_indexes = np.arange(len(self.columns_names))
+        columns_indexes = np.asarray(columns_indexes, dtype=np.int64)
+        bounds_matrix = np.empty((len(self.reactions_ids), len(columns_indexes)), dtype=self.dtype)
+        chunks_indexes, local_columns = np.divmod(columns_indexes, self.chunk_num_columns)
+        for chunk_index in np.unique(chunks_indexes):
+            is_in_chunk = chunks_indexes == chunk_index
+            bounds_matrix[:, is_in_chunk] = self.get_chunk(int(chunk_index))[:, local_columns[is_in_chunk]]
+        return bounds_matrix
+
+    def to_dataframe(self, columns_indexes=None):
+        """
+        :param columns_indexes: Indexes of the desired columns, all the columns if None
+        :return: A DataFrame in the format of the bounds .csv files: the 'ID' column followed by the columns
+        """
+        if columns_indexes is None:
+            columns_indexes = range(len(self.columns_names))
+        bounds_df = pd.DataFrame(self.get_columns(columns_indexes=columns_indexes),
+                                 columns=[self.columns_names[column_index] for column_index in columns_indexes])
+        bounds_df.insert(0, 'ID', self.reactions_ids)
+        return bounds_df
+
+    def export_csv(self, csv_filepath: str, include_ids: bool = True):
+        """
+        :param csv_filepath: The path to save the bounds as a .csv file
+        :param include_ids: Whether to save the 'ID' column (e.g. L.csv and U.csv are saved without it)
+        :return: -
+        """
+        bounds_df = self.to_dataframe()
+        if not include_ids:
+            bounds_df = bounds_df.drop(columns=['ID'])
+        bounds_df.to_csv(csv_filepath, index=False)
+
+    @classmethod
+    def import_csv(cls, csv_filepath: str, store_path: str, dtype=np.float64, chunk_num_columns: int = 1024,
+                   reactions_ids: list = None):
+        """
+        :param csv_filepath: The path for a bounds .csv file
+        :param store_path: The path for the store folder to be written
+        :param dtype: np.float64, or np.float32 for half the size
+        :param chunk_num_columns: Number of columns in each chunk
+        :param reactions_ids: List of the reactions ids of the rows, for a .csv file saved without the 'ID' column
+                              (e.g. L.csv and U.csv, whose rows follow reactions_index_map.json), or None to take
+                              them from the 'ID' column
+        :return: The written BoundsMatrixStore
+        """
+        bounds_df = pd.read_csv(csv_filepath)
+        if reactions_ids is not None:
+            if 'ID' in bounds_df.columns:
+                raise ValueError("The bounds file " + csv_filepath + " already has an 'ID' column")
+            if len(reactions_ids) != len(bounds_df):
+                raise ValueError("The bounds file " + csv_filepath + " has " + str(len(bounds_df)) + " rows, but " +
+                                 str(len(reactions_ids)) + " reactions ids are given")
+            bounds_df.insert(0, 'ID', list(reactions_ids))
+        elif 'ID' not in bounds_df.columns:
+            raise ValueError("The bounds file " + csv_filepath + " has no 'ID' column, the reactions_ids are required")
+        return cls.write_dataframe(bounds_df=bounds_df, store_path=store_path, dtype=dtype,
+                                   chunk_num_columns=chunk_num_columns)
+
+    @classmethod
+    def write_dataframe(cls, bounds_df, store_path: str, dtype=np.float64, chunk_num_columns: int = 1024,
+                        columns_metadata: dict = None):
+        """
+        :param bounds_df: A bounds DataFrame, with the 'ID' column followed by the experiments columns
+        :param store_path: The path for the store folder to be written
+        :param dtype: np.float64, or np.float32 for half the size
+        :param chunk_num_columns: Number of columns in each chunk
+        :param columns_metadata: Optional metadata of the columns, in the format of {key: list with one item per column}
+        :return: The written BoundsMatrixStore
+        """
+        columns_names = [column_name for column_name in bounds_df.columns if column_name != 'ID']
+        return cls.write(store_path=store_path,
+                         reactions_ids=bounds_df['ID'].tolist(),
+                         columns_names=columns_names,
+                         bounds_matrix=bounds_df[columns_names].to_numpy(dtype=float),
+                         dtype=dtype, chunk_num_columns=chunk_num_columns, columns_metadata=columns_metadata)
+
+    @classmethod
+    def write(cls, store_path: str, reactions_ids: list, columns_names: list, bounds_matrix,
+              dtype=np.float64, chunk_num_columns: int = 1024, columns_metadata: dict = None):
+        """
+        :param store_path: The path for the store folder to be written (should end with BOUNDS_STORE_EXTENSION)
+        :param reactions_ids: List of the reactions ids (rows)
+        :param columns_names: List of the experiments columns names
+        :param bounds_matrix: A (reactions x experiments) numpy array, or any bounds object with a
+                              to_dense(columns_indexes) method (e.g. SparseBounds.BaseDeltaBounds), which is then
+                              materialized chunk by chunk
+        :param dtype: np.float64, or np.float32 for half the size
+        :param chunk_num_columns: Number of columns in each chunk
+        :param columns_metadata: Optional metadata of the columns, in the format of {key: list with one item per column}
+        :return: The written BoundsMatrixStore
+        """
+        if not is_bounds_store_path(store_path):
+            raise ValueError("The bounds store path should end with " + BOUNDS_STORE_EXTENSION)
+        dtype = np.dtype(dtype)
+        if dtype not in (np.dtype(np.float64), np.dtype(np.float32)):
+            raise ValueError("Only float64 and float32 bounds stores are supported")
+        if not os.path.exists(store_path):
+            os.makedirs(store_path)
+        # The chunks of an overwritten store are removed, so that no stale chunk is left beyond the new columns
+        for filename in os.listdir(store_path):
+            if filename.startswith('chunk_') and filename.endswith('.npy'):
+                os.remove(os.path.join(store_path, filename))
+        num_columns = len(columns_names)
+        for chunk_index, chunk_start in enumerate(range(0, num_columns, chunk_num_columns)):
+            chunk_columns = np.arange(chunk_start, min(chunk_start + chunk_num_columns, num_columns))
+            if hasattr(bounds_matrix, 'to_dense'):
+                chunk_matrix = bounds_matrix.to_dense(columns_indexes=chunk_columns)
+            else:
+                chunk_matrix = bounds_matrix[:, chunk_columns]
+            np.save(os.path.join(store_path, 'chunk_' + str(chunk_index) + '.npy'),
+                    np.asfortranarray(chunk_matrix, dtype=dtype))
+        metadata = {'version': BOUNDS_STORE_VERSION,
+                    'dtype': dtype.name,
+                    'chunk_num_columns': chunk_num_columns,
+                    'reactions_ids': list(reactions_ids),
+                    'columns_names': list(columns_names),
+                    'columns_metadata': columns_metadata}
+        with open(os.path.join(store_path, 'metadata.json'), 'w') as json_file:
+            json.dump(metadata, json_file)
+        return cls(store_path)
+
+
+class BoundsStoreView:
+    def __init__(self, reactions_ids: list, stores: list, stores_rows: list, stores_defaults: list):
+        """
+        A view of the rows of one or more stores, placed side by side (the columns of the stores in order), whose
+        columns are only read (chunk by chunk) when materialized. It keeps the rows operations of
+        SparseBounds.BaseDeltaBounds (select_rows, place_rows, set_row_value, to_dense, concatenate), so that the
+        pipeline stages can handle .bounds stores without loading the whole matrices.
+        :param reactions_ids: List of the reactions ids (rows of the view)
+        :param stores: List of BoundsMatrixStore objects
+        :param stores_rows: For each store, the row index in the store of each row of the view, or -1 for a row taking
+                            its default value in all the columns of the store
+        :param stores_defaults: For each store, the default value of each row of the view
+        """
+        self.reactions_ids = list(reactions_ids)
+        self.reactions_index_map = {rxn_id: row_index for row_index, rxn_id in enumerate(self.reactions_ids)}
+        self.stores = list(stores)
+        self.stores_rows = [np.array(store_rows, dtype=np.int64) for store_rows in stores_rows]
+        self.stores_defaults = [np.array(store_defaults, dtype=float) for store_defaults in stores_defaults]
+        self.columns_names = [column_name for store in self.stores for column_name in store.columns_names]
+        # The index of the first column of each store in the view
+        self.stores_offsets = np.cumsum([0] + [len(store.columns_names) for store in self.stores])
+
+    @classmethod
+    def from_store(cls, store: BoundsMatrixStore):
+        """
+        :param store: A BoundsMatrixStore
+        :return: A view of all the rows of the store
+        """
+        num_rows = len(store.reactions_ids)
+        return cls(reactions_ids=store.reactions_ids, stores=[store], stores_rows=[np.arange(num_rows)],
+                   stores_defaults=[np.zeros(num_rows)])
+
+    def get_num_columns(self) -> int:
+        return len(self.columns_names)
+
+    def to_dense(self, columns_indexes=None):
+        """
+        :param columns_indexes: Indexes of the desired columns, all the columns if None
+        :return: A dense (reactions x columns) matrix, read from the chunks of the desired columns
+        """
+        if columns_indexes is None:
+            columns_indexes = np.arange(len(self.columns_names))
+        columns_indexes = np.asarray(columns_indexes, dtype=np.int64)
+        dense_matrix = np.empty((len(self.reactions_ids), len(columns_indexes)))
+        columns_stores = np.searchsorted(self.stores_offsets, columns_indexes, side='right') - 1
+        for store_index in np.unique(columns_stores):
+            is_in_store = columns_stores == store_index
+            store_rows = self.stores_rows[store_index]
+            is_placed = store_rows >= 0
+            store_matrix = self.stores[store_index].get_columns(
+                columns_indexes=columns_indexes[is_in_store] - self.stores_offsets[store_index])
+            store_dense = np.empty((len(self.reactions_ids), int(is_in_store.sum())))
+            store_dense[is_placed] = store_matrix[store_rows[is_placed]]
+            store_dense[~is_placed] = self.stores_defaults[store_index][~is_placed, np.newaxis]
+            dense_matrix[:, is_in_store] = store_dense
+        return dense_matrix
+
+    def get_column(self, column_index: int):
+        """
+        :param column_index: The index of a column
+        :return: The dense bounds vector of the column
+        """
+        return self.to_dense(columns_indexes=[column_index])[:, 0]
+
+    def to_dataframe(self, columns_indexes=None):
+        """
+        :param columns_indexes: Indexes of the desired columns, all the columns if None
+        :return: A DataFrame in the format of the bounds .csv files: the 'ID' column followed by the columns
+        """
+        if columns_indexes is None:
+            columns_indexes = range(len(self.columns_names))
+        bounds_df = pd.DataFrame(self.to_dense(columns_indexes=columns_indexes),
+                                 columns=[self.columns_names[column_index] for column_index in columns_indexes])
+        bounds_df.insert(0, 'ID', self.reactions_ids)
+        return bounds_df
+
+    def set_row_value(self, rxn_id: str, value: float):
+        """
+        This method, sets the bound of a reaction in all the columns (e.g. for the biomass reaction)
+        :param rxn_id: The reaction id
+        :param value: The new bound value
+        :return: -
+        """
+        row_index = self.reactions_index_map[rxn_id]
+        for store_rows, store_defaults in zip(self.stores_rows, self.stores_defaults):
+            store_rows[row_index] = -1
+            store_defaults[row_index] = value
+
+    def select_rows(self, rows_indexes):
+        """
+        :param rows_indexes: Indexes of the rows to be kept, in the order of the new rows
+        :return: The view of the selected rows (e.g. the reactions kept after pruning), as a new BoundsStoreView
+        """
+        rows_indexes = np.asarray(rows_indexes, dtype=np.int64)
+        return BoundsStoreView(reactions_ids=[self.reactions_ids[row_index] for row_index in rows_indexes],
+                               stores=self.stores,
+                               stores_rows=[store_rows[rows_indexes] for store_rows in self.stores_rows],
+                               stores_defaults=[store_defaults[rows_indexes]
+                                                for store_defaults in self.stores_defaults])
+
+    def place_rows(self, source_rows, target_rows, target_reactions_ids: list, target_default_vector):
+        """
+        This method, places the rows of this view onto another list of reactions (e.g. the template)
+        :param source_rows: Row indexes in this view
+        :param target_rows: The corresponding row indexes in the target_reactions_ids.
+                            If a target row is repeated, its last source row is effective.
+        :param target_reactions_ids: List of the target reactions ids
+        :param target_default_vector: Default bounds of the target reactions, for the rows not placed
+        :return: The placed rows, as a new BoundsStoreView
+        """
+        source_rows = np.asarray(source_rows, dtype=np.int64)
+        target_rows = np.asarray(target_rows, dtype=np.int64)
+        target_default_vector = np.asarray(target_default_vector, dtype=float)
+        placed_stores_rows = []
+        placed_stores_defaults = []
+        for store_rows, store_defaults in zip(self.stores_rows, self.stores_defaults):
+            placed_store_rows = np.full(len(target_reactions_ids), -1, dtype=np.int64)
+            placed_store_rows[target_rows] = store_rows[source_rows]
+            placed_store_defaults = target_default_vector.copy()
+            placed_store_defaults[target_rows] = store_defaults[source_rows]
+            placed_stores_rows.append(placed_store_rows)
+            placed_stores_defaults.append(placed_store_defaults)
+        return BoundsStoreView(reactions_ids=target_reactions_ids, stores=self.stores, stores_rows=placed_stores_rows,
+                               stores_defaults=placed_stores_defaults)
+
+    @classmethod
+    def concatenate(cls, views_list: list):
+        """
+        :param views_list: List of BoundsStoreView objects with identical reactions ids
+        :return: A BoundsStoreView with all the columns of views_list, in order
+        """
+        for bounds_view in views_list[1:]:
+            if bounds_view.reactions_ids != views_list[0].reactions_ids:
+                raise ValueError("Reactions of the merged bounds are not identical")
+        return cls(reactions_ids=views_list[0].reactions_ids,
+                   stores=[store for bounds_view in views_list for store in bounds_view.stores],
+                   stores_rows=[store_rows for bounds_view in views_list for store_rows in bounds_view.stores_rows],
+                   stores_defaults=[store_defaults for bounds_view in views_list
+                                    for store_defaults in bounds_view.stores_defaults])
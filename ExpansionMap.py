@@ -0,0 +1,119 @@
+"""
+ExpansionMap
+This code, keeps the map from the reactions of a reduced final data folder (see NetworkCompressor, and the pruning of
+BiomassFinalizer) back to the template reactions: the original fluxes are expansion_matrix @ reduced fluxes, where
+expansion_matrix is a sparse (template reactions x reduced reactions) matrix.
+    1. A removed (e.g. blocked or pruned) template reaction has an empty row.
+    2. A lumped template reaction has the ratio of its flux to the flux of its reduced reaction.
+    3. A template reaction collapsed with its duplicates (see DuplicateCollapser) gets an even share of the flux of
+       its collapsed reaction, and the number of the reactions sharing the flux is kept in original_shares.
+It is saved as "expansion_map.npz" in the reduced final data folder, which MulticolumnSolver loads automatically.
+"""
+
+import os
+import numpy as np
+import scipy.sparse
+
+EXPANSION_MAP_FILENAME = 'expansion_map.npz'
+
+
+class ExpansionMap:
+    def __init__(self, expansion_matrix, original_reactions_ids: list, original_existing_indexes,
+                 original_shares=None):
+        """
+        :param expansion_matrix: The sparse (template reactions x reduced reactions) expansion matrix
+        :param original_reactions_ids: The template reactions ids, in the template reactions_index_map order
+        :param original_existing_indexes: Indexes of the existing reactions among the template reactions
+        :param original_shares: Number of the duplicate reactions sharing the flux of each template reaction,
+                                all ones if None
+        """
+        self.expansion_matrix = scipy.sparse.csr_matrix(expansion_matrix)
+        self.original_reactions_ids = list(original_reactions_ids)
+        self.original_existing_indexes = np.asarray(original_existing_indexes, dtype=np.int64)
+        if original_shares is None:
+            original_shares = np.ones(len(self.original_reactions_ids), dtype=np.int64)
+        self.original_shares = np.asarray(original_shares, dtype=np.int64)
+
+    def expand_fluxes(self, fluxes):
+        """
+        :param fluxes: A (reduced reactions,) vector or a (reduced reactions x columns) matrix of fluxes
+        :return: The fluxes of the template reactions
+        """
+        return self.expansion_matrix @ fluxes
+
+    def get_penalty_weights(self, cardinality: bool = False, excluded_indexes=None):
+        """
+        :param cardinality: False for the weights of |v| (the sum of the members' |ratio|), or True for the weights of
+                            [v != 0] (the number of the members), counting the non-existing template reactions only
+        :param excluded_indexes: Indexes of the template reactions that are not penalized (e.g. the biomass), which
+                                 are excluded before the members are summed, so the rest of their groups stay penalized
+        :return: The penalty weights of the reduced reactions
+        """
+        original_weights = np.ones(len(self.original_reactions_ids))
+        original_weights[self.original_existing_indexes] = 0.0
+        if excluded_indexes is not None:
+            original_weights[np.asarray(excluded_indexes, dtype=np.int64)] = 0.0
+        member_matrix = abs(self.expansion_matrix)
+        if cardinality:
+            member_matrix = (member_matrix != 0).astype(np.float64)
+        return np.asarray(member_matrix.T @ original_weights).ravel()
+
+    def compose(self, reduction_matrix, reduced_shares=None):
+        """
+        :param reduction_matrix: The sparse (reduced reactions x further reduced reactions) expansion matrix of a
+                                 further reduction
+        :param reduced_shares: Number of the duplicate reactions sharing the flux of each reduced reaction in the
+                               further reduction (see DuplicateCollapser), all ones if None
+        :return: The ExpansionMap from the template reactions to the further reduced reactions
+        """
+        original_shares = self.original_shares.copy()
+        if reduced_shares is not None:
+            # Each template row maps to at most one reduced reaction
+            coo_expansion = self.expansion_matrix.tocoo()
+            original_shares[coo_expansion.row] *= np.asarray(reduced_shares, dtype=np.int64)[coo_expansion.col]
+        return ExpansionMap(expansion_matrix=self.expansion_matrix @ scipy.sparse.csr_matrix(reduction_matrix),
+                            original_reactions_ids=self.original_reactions_ids,
+                            original_existing_indexes=self.original_existing_indexes,
+                            original_shares=original_shares)
+
+    def save(self, folder_to_save: str):
+        """
+        :param folder_to_save: The reduced final data folder
+        :return: -
+        """
+        np.savez_compressed(os.path.join(folder_to_save, EXPANSION_MAP_FILENAME),
+                            data=self.expansion_matrix.data,
+                            indices=self.expansion_matrix.indices,
+                            indptr=self.expansion_matrix.indptr,
+                            shape=np.array(self.expansion_matrix.shape),
+                            original_reactions_ids=np.array(self.original_reactions_ids, dtype=str),
+                            original_existing_indexes=self.original_existing_indexes,
+                            original_shares=self.original_shares)
+
+    @classmethod
+    def load(cls, folder: str):
+        """
+        :param folder: A reduced final data folder
+        :return: The ExpansionMap of the folder, or None if the folder is not reduced
+        """
+        expansion_map_filepath = os.path.join(folder, EXPANSION_MAP_FILENAME)
+        if not os.path.exists(expansion_map_filepath):
+            return None
+        with np.load(expansion_map_filepath, allow_pickle=False) as npz_file:
+            expansion_matrix = scipy.sparse.csr_matrix((npz_file['data'], npz_file['indices'], npz_file['indptr']),
+                                                       shape=tuple(npz_file['shape']))
+            return cls(expansion_matrix=expansion_matrix,
+                       original_reactions_ids=npz_file['original_reactions_ids'].tolist(),
+                       original_existing_indexes=npz_file['original_existing_indexes'],
+                       original_shares=npz_file['original_shares'] if 'original_shares' in npz_file else None)
+
+    @classmethod
+    def make_identity(cls, reactions_ids: list, existing_indexes):
+        """
+        :param reactions_ids: The reactions ids of a (not reduced) final data folder
+        :param existing_indexes: Indexes of the existing reactions
+        :return: The identity ExpansionMap of the folder, to be composed with reductions
+        """
+        return cls(expansion_matrix=scipy.sparse.identity(len(reactions_ids), format='csr'),
+                   original_reactions_ids=reactions_ids,
+                   original_existing_indexes=existing_indexes)
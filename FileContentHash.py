@@ -0,0 +1,19 @@
+"""
+FileContentHash
+This code, hashes the content of an input file (e.g. a translation file), so that the caches and the saved indexes
+built from that file (see TranslationTable and ReactionsTranslation) can be validated against its current content.
+"""
+
+import hashlib
+
+
+def get_file_content_hash(filepath: str) -> str:
+    """
+    :param filepath: The path for a file
+    :return: The sha256 hex digest of the file content
+    """
+    content_hash = hashlib.sha256()
+    with open(filepath, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            content_hash.update(block)
+    return content_hash.hexdigest()
@@ -1,6 +1,9 @@
 # import xml.etree.ElementTree as ETree
 import json
+import os
 import numpy as np
+import scipy.sparse
+from GPR_Compiler import GPRCompiler
 # from difflib import SequenceMatcher
 
 
@@ -125,35 +128,122 @@ def get_gene_mask(knocked_out_reactions, all_reactions_ids_list):
 
 
 def make_knock_out_masks(all_reactions_ids_list, knock_outs_info, associations):
-    num_reactions = len(all_reactions_ids_list)
-    masks = []
+    # Dense float masks (1: kept, 0: knocked out), built through the indexed make_sparse_knock_out_matrix
+    knock_out_matrix = make_sparse_knock_out_matrix(all_reactions_ids_list, knock_outs_info, associations)
+    return 1.0 - knock_out_matrix.toarray()
+
+
+def make_genes_knocked_out_reactions(gene_associations):
+    # One pass over the associations compiled by GPRCompiler, instead of one pass per knocked-out gene
+    # (see get_knocked_out_reactions)
+    gpr_compiler = GPRCompiler()
+    for reaction_id, rec_associated_genes in gene_associations.items():
+        gpr_compiler.add_reaction(rxn_id=reaction_id, gpr_expression=rec_associated_genes)
+    genes_knocked_out_reactions = {}
+    always_knocked_out_reactions = []
+    for reaction_position, reaction_id in enumerate(gpr_compiler.reactions_ids):
+        if gpr_compiler.is_reaction_always_knocked_out(reaction_position):
+            always_knocked_out_reactions.append(reaction_id)
+            continue
+        for gene_index in gpr_compiler.get_reaction_knocker_out_genes(reaction_position):
+            genes_knocked_out_reactions.setdefault(gpr_compiler.genes_ids[gene_index], []).append(reaction_id)
+    return genes_knocked_out_reactions, always_knocked_out_reactions
+
+
+def make_reactions_index_map(all_reactions_ids_list):
+    # "R_rxn" --> indexes of "rxn" in all_reactions_ids_list (as in is_reaction_contained)
+    reactions_index_map = {}
+    for index, reaction_id in enumerate(all_reactions_ids_list):
+        reactions_index_map.setdefault("R_" + reaction_id, []).append(index)
+    return reactions_index_map
+
+
+def get_knocked_out_indexes(knocked_out_reactions, reactions_index_map):
+    knocked_out_indexes = set()
+    for knocked_id in knocked_out_reactions:
+        # Only the first two characters (R_) are excluded in is_reaction_contained
+        knocked_out_indexes.update(reactions_index_map.get("R_" + knocked_id[2:], []))
+    return sorted(knocked_out_indexes)
+
+
+def make_sparse_knock_out_matrix(all_reactions_ids_list, knock_outs_info, associations):
+    """
+    The indexed version of make_knock_out_masks.
+    :return: A sparse boolean (reactions x experiments) CSC matrix, True for the knocked-out reactions,
+             i.e. the complement of the masks. Genes without any knocked-out reaction are skipped.
+    """
+    reactions_index_map = make_reactions_index_map(all_reactions_ids_list)
+    genes_knocked_out_reactions, always_knocked_out_reactions = make_genes_knocked_out_reactions(associations)
+    rows_indexes = []
+    columns_indptr = [0]
     for knock_out_gene in knock_outs_info:
-        knocked_out_reactions = get_knocked_out_reactions(knock_out_gene, associations)
-        the_gene_mask = get_gene_mask(knocked_out_reactions, all_reactions_ids_list)
-        if sum(the_gene_mask) != num_reactions:
-            masks.append(the_gene_mask)
-    return np.transpose(np.array(masks))
+        knocked_out_reactions = genes_knocked_out_reactions.get(knock_out_gene, []) + always_knocked_out_reactions
+        knocked_out_indexes = get_knocked_out_indexes(knocked_out_reactions, reactions_index_map)
+        if knocked_out_indexes:
+            rows_indexes += knocked_out_indexes
+            columns_indptr.append(len(rows_indexes))
+    return scipy.sparse.csc_matrix((np.ones(len(rows_indexes), dtype=bool),
+                                    np.array(rows_indexes, dtype=np.int32),
+                                    np.array(columns_indptr, dtype=np.int32)),
+                                   shape=(len(all_reactions_ids_list), len(columns_indptr) - 1))
 
 
 def read_bound(bound_path):
-    with open(bound_path, 'r') as f:
-        lines = f.readlines()
-    vec = []
-    for line in lines[1:]:  # first line is num_lines
-        vec.append(float(line[:-1]))  # "\n" excluded
-    return vec
+    # l.txt/u.txt (first line is num_lines), or l.npy/u.npy (see BioDataParser.save_streamed_bigg_model)
+    if bound_path.endswith('.npy'):
+        return np.load(bound_path)
+    return np.loadtxt(bound_path, skiprows=1, ndmin=1)
+
+
+def read_universal_bound(universal_model_path, bound_name):
+    # The lossless binary bound (e.g. l.npy) is preferred over the text one (l.txt)
+    binary_bound_path = universal_model_path + '/' + bound_name + '.npy'
+    if os.path.exists(binary_bound_path):
+        return read_bound(binary_bound_path)
+    return read_bound(universal_model_path + '/' + bound_name + '.txt')
 
 
 def make_bound_by_masks(l, u, mask_matrix):
-    mask_shape = mask_matrix.shape
-    num_columns = mask_shape[1]
-    l_matrix = np.reshape(np.transpose(np.array([l] * num_columns)), mask_shape)
-    u_matrix = np.reshape(np.transpose(np.array([u] * num_columns)), mask_shape)
-    l_matrix = np.multiply(l_matrix, mask_matrix)
-    u_matrix = np.multiply(u_matrix, mask_matrix)
+    l_matrix = np.asarray(l, dtype=float)[:, np.newaxis] * mask_matrix
+    u_matrix = np.asarray(u, dtype=float)[:, np.newaxis] * mask_matrix
     return l_matrix, u_matrix
 
 
+def materialize_masked_bound(base_vector, knock_out_matrix, columns_indexes=None):
+    """
+    :param base_vector: The universal bound (l or u)
+    :param knock_out_matrix: The sparse boolean (reactions x experiments) matrix of make_sparse_knock_out_matrix
+    :param columns_indexes: Indexes of the desired experiments columns, all the columns if None
+    :return: The dense (reactions x columns) bound, with the knocked-out reactions set to 0
+    """
+    if columns_indexes is not None:
+        knock_out_matrix = knock_out_matrix[:, columns_indexes]
+    return np.where(knock_out_matrix.toarray(), 0.0, np.asarray(base_vector, dtype=float)[:, np.newaxis])
+
+
+def save_masked_bounds(l, u, knock_out_matrix, save_path):
+    # Lossless binary: the universal l and u plus the sparse knock-out matrix, instead of the dense L.txt and U.txt
+    knock_out_matrix = scipy.sparse.csc_matrix(knock_out_matrix)
+    np.savez_compressed(save_path,
+                        l=np.asarray(l, dtype=float),
+                        u=np.asarray(u, dtype=float),
+                        ko_indices=knock_out_matrix.indices,
+                        ko_indptr=knock_out_matrix.indptr,
+                        ko_shape=np.array(knock_out_matrix.shape))
+
+
+def load_masked_bounds(save_path):
+    """
+    :return: l, u, knock_out_matrix (see save_masked_bounds and materialize_masked_bound)
+    """
+    with np.load(save_path) as npz_file:
+        knock_out_matrix = scipy.sparse.csc_matrix((np.ones(len(npz_file['ko_indices']), dtype=bool),
+                                                    npz_file['ko_indices'],
+                                                    npz_file['ko_indptr']),
+                                                   shape=tuple(npz_file['ko_shape']))
+        return npz_file['l'], npz_file['u'], knock_out_matrix
+
+
 def save_bound_matrix(matrix, save_path):
     matrix_shape = matrix.shape
     shape_str = str(matrix_shape[0]) + " " + str(matrix_shape[1]) + "\n"
@@ -163,13 +253,21 @@ def save_bound_matrix(matrix, save_path):
 
 
 def save_knock_out_bounds(all_reactions_ids_list, gene_associations_path, knock_outs_path,
-                          universal_model_path, save_path):
+                          universal_model_path, save_path, bounds_format='txt'):
+    # bounds_format: 'txt' for the dense L.txt and U.txt, or 'binary' for the masked KO_bounds.npz
     with open(gene_associations_path, 'r') as f:
         associations = json.load(f)
     with open(knock_outs_path, 'r') as f:
         lines = f.readlines()
         knock_outs_info = get_knock_outs_gene_names(lines)
 
+    if bounds_format == 'binary':
+        knock_out_matrix = make_sparse_knock_out_matrix(all_reactions_ids_list, knock_outs_info, associations)
+        save_masked_bounds(read_universal_bound(universal_model_path, 'l'),
+                           read_universal_bound(universal_model_path, 'u'),
+                           knock_out_matrix, save_path + '/KO_bounds.npz')
+        return
+
     mask_matrix = make_knock_out_masks(all_reactions_ids_list, knock_outs_info, associations)
 
     l_universal = read_bound(universal_model_path + '/l.txt')
@@ -0,0 +1,343 @@
+"""
+GPR_Compiler.py
+
+This script, compiles the GPR expressions of all reactions (in the GPA format) into one shared and/or DAG
+over integer gene ids, so that the knocker-out genes of every reaction are found in a single bottom-up pass.
+
+Identical sub-expressions (e.g. the same enzyme complex catalyzing several reactions) are stored only once,
+nested operators of the same kind are flattened into n-ary nodes, and the children of each node are sorted,
+so the compiled form of "a and (b and c)" is the same node as "(c and a) and b".
+GPR rules in the string format are parsed into the GPA format by parse_gpr_rule, and multi-gene knock-outs of
+many strains are evaluated over the compiled DAG at once by GPRCompiler.evaluate_knock_outs.
+"""
+
+import itertools
+import numpy as np
+from scipy import sparse
+
+GPA_REF = 0
+GPA_AND = 1
+GPA_OR = 2
+GPA_OPERATORS_CODES = {"GPARef": GPA_REF, "GPAAnd": GPA_AND, "GPAOr": GPA_OR}
+GPR_RULE_SPECIAL_TOKENS = {"(": "(", ")": ")"}
+for _operator in ("and", "or"):  # All the case variants: and, AND, And, aNd, ...
+    for _letters in itertools.product(*[(letter, letter.upper()) for letter in _operator]):
+        GPR_RULE_SPECIAL_TOKENS["".join(_letters)] = _operator
+
+
+def make_gpa_operation(operator_key: str, items: list) -> dict:
+    """
+    :param operator_key: "GPAAnd" or "GPAOr"
+    :param items: List of GPA expressions joined by the operator
+    :return: A flattened n-ary GPA expression, e.g. {"GPAAnd": [a, {"GPAAnd": [b, c]}]} --> {"GPAAnd": [a, b, c]}
+    """
+    if len(items) == 1:
+        return items[0]
+    flat_items = []
+    for item in items:
+        if operator_key in item:
+            flat_items.extend(item[operator_key])
+        else:
+            flat_items.append(item)
+    return {operator_key: flat_items}
+
+
+def parse_gpr_rule(gpr_rule: str) -> dict:
+    """
+    This function, parses a GPR rule in a single pass over its tokens, with "and" preceding "or".
+    Operators are case-insensitive (and/AND/or/OR), parentheses can be nested arbitrarily, and extra
+    whitespaces are ignored.
+    :param gpr_rule: A str in a format like:
+            ( BSU29690 and BSU29700 and BSU29710 ) or ( BSU08060 and BSU08070 and BSU08090 ) or BSU26640
+    :return: A dict in the GPA format with flattened n-ary operators, like:
+                    {'GPAOr': [{'GPAAnd': [{'GPARef': 'BSU29690'}, {'GPARef': 'BSU29700'}, {'GPARef': 'BSU29710'}]},
+                               {'GPAAnd': [{'GPARef': 'BSU08060'}, {'GPARef': 'BSU08070'}, {'GPARef': 'BSU08090'}]},
+                               {'GPARef': 'BSU26640'}]
+                    }
+             An empty rule is returned as an empty dict.
+    """
+    tokens = gpr_rule.replace("(", " ( ").replace(")", " ) ").split()
+    if not tokens:
+        return {}
+    # Each open parentheses is a frame of [or_items, and_items]
+    frames = [[[], []]]
+    and_items = frames[-1][1]
+    expect_operand = True
+    for token in tokens:
+        token_kind = GPR_RULE_SPECIAL_TOKENS.get(token)
+        if token_kind is None:  # A gene id
+            if not expect_operand:
+                raise ValueError("Missing operator before " + token + " in the GPR rule: " + gpr_rule)
+            and_items.append({"GPARef": token})
+            expect_operand = False
+        elif token_kind == "(":
+            if not expect_operand:
+                raise ValueError("Missing operator before '(' in the GPR rule: " + gpr_rule)
+            frames.append([[], []])
+            and_items = frames[-1][1]
+        elif token_kind == ")":
+            if expect_operand or len(frames) == 1:
+                raise ValueError("Unexpected ')' in the GPR rule: " + gpr_rule)
+            or_items = frames.pop()[0]
+            or_items.append(make_gpa_operation("GPAAnd", and_items))
+            and_items = frames[-1][1]
+            and_items.append(make_gpa_operation("GPAOr", or_items))
+        else:  # and, or
+            if expect_operand:
+                raise ValueError("Unexpected operator " + token + " in the GPR rule: " + gpr_rule)
+            if token_kind == "or":
+                frames[-1][0].append(make_gpa_operation("GPAAnd", and_items))
+                and_items = frames[-1][1] = []
+            expect_operand = True
+    if expect_operand or len(frames) != 1:
+        raise ValueError("Incomplete GPR rule: " + gpr_rule)
+    or_items = frames[0][0]
+    or_items.append(make_gpa_operation("GPAAnd", and_items))
+    return make_gpa_operation("GPAOr", or_items)
+
+
+class GPRCompiler:
+    def __init__(self):
+        # ############ Genes interning ############
+        self.genes_ids = []  # gene_index --> gene_id
+        self.genes_index_map = {}  # gene_id --> gene_index
+        # ############ The and/or DAG ############
+        self.nodes_operators = []  # node_index --> operator code
+        self.nodes_children = []  # node_index --> tuple of children nodes (the gene_index for GPA_REF nodes)
+        self.nodes_index_map = {}  # (operator, children) --> node_index
+        # ############ Compiled reactions ############
+        self.reactions_ids = []
+        self.reactions_roots = []  # reaction position --> root node_index (None for an empty expression)
+        self.nodes_knocker_out_genes = None
+
+    def get_gene_index(self, gene_id: str) -> int:
+        """
+        :param gene_id: A gene id as it appears in the GPR expressions
+        :return: The integer id assigned to this gene (assigned on the first call)
+        """
+        gene_index = self.genes_index_map.get(gene_id)
+        if gene_index is None:
+            gene_index = len(self.genes_ids)
+            self.genes_index_map[gene_id] = gene_index
+            self.genes_ids.append(gene_id)
+        return gene_index
+
+    def add_node(self, operator: int, children: tuple) -> int:
+        """
+        :param operator: One of GPA_REF, GPA_AND, or GPA_OR
+        :param children: The gene_index (as a 1-tuple) for GPA_REF, or the children nodes for GPA_AND/GPA_OR
+        :return: The node_index of this (possibly already existing) node.
+                 Since a node is always added after its children, node indexes are in a topological order.
+        """
+        if operator != GPA_REF:
+            flat_children = set()
+            for child in children:
+                if self.nodes_operators[child] == operator:  # (a and (b and c)) --> (a and b and c)
+                    flat_children.update(self.nodes_children[child])
+                else:
+                    flat_children.add(child)
+            if len(flat_children) == 1:  # (a) --> a
+                return flat_children.pop()
+            children = tuple(sorted(flat_children))
+        node_key = (operator, children)
+        node_index = self.nodes_index_map.get(node_key)
+        if node_index is None:
+            node_index = len(self.nodes_operators)
+            self.nodes_index_map[node_key] = node_index
+            self.nodes_operators.append(operator)
+            self.nodes_children.append(children)
+        return node_index
+
+    def compile_expression(self, gpr_expression: dict):
+        """
+        :param gpr_expression: A dict in a format like:
+                    {"GPAOr":[{"GPARef":"ulaD"},{"GPARef":"sgbH"}]}
+        :return: The root node_index of the compiled expression, or None for an empty expression
+        """
+        if not gpr_expression:
+            return None
+        # Iterative post-order traversal, to avoid the recursion limit on deeply nested rules
+        results = []
+        stack = [(gpr_expression, False)]
+        while stack:
+            expression, is_expanded = stack.pop()
+            (id_key, expr), = expression.items()
+            if id_key not in GPA_OPERATORS_CODES:
+                raise KeyError("Your GPR format with key " + id_key + " is not standard")
+            operator = GPA_OPERATORS_CODES[id_key]
+            if operator == GPA_REF:
+                results.append(self.add_node(GPA_REF, (self.get_gene_index(expr),)))
+            elif is_expanded:
+                num_items = len(expr)
+                children = results[len(results) - num_items:]
+                del results[len(results) - num_items:]
+                results.append(self.add_node(operator, tuple(children)))
+            else:
+                stack.append((expression, True))
+                for item_expression in reversed(expr):
+                    stack.append((item_expression, False))
+        return results[0]
+
+    def add_reaction(self, rxn_id: str, gpr_expression: dict):
+        """
+        :param rxn_id: The id of the reaction
+        :param gpr_expression: The GPR expression of the reaction in the GPA format
+        :return: -. Compiles the expression and appends the reaction to self.reactions_ids
+        """
+        self.reactions_ids.append(rxn_id)
+        self.reactions_roots.append(self.compile_expression(gpr_expression))
+        self.nodes_knocker_out_genes = None
+
+    def find_knocker_out_genes(self):
+        """
+        This method, finds the knocker-out genes of all nodes in one bottom-up pass over the DAG:
+            GPARef: {gene}
+            GPAAnd: union of the children's knocker-out genes (shutting at least one item)
+            GPAOr: intersection of the children's knocker-out genes (shutting all items)
+        An empty GPAOr is shut by any gene, which is denoted by None.
+        :return: Filling self.nodes_knocker_out_genes with a frozenset (or None) per node
+        """
+        nodes_knocker_out_genes = []
+        for operator, children in zip(self.nodes_operators, self.nodes_children):
+            if operator == GPA_REF:
+                node_genes = frozenset(children)
+            elif operator == GPA_AND:
+                children_genes = [nodes_knocker_out_genes[child] for child in children]
+                if None in children_genes:
+                    node_genes = None
+                else:
+                    node_genes = frozenset().union(*children_genes)
+            else:
+                children_genes = [nodes_knocker_out_genes[child] for child in children
+                                  if nodes_knocker_out_genes[child] is not None]
+                if children_genes:
+                    node_genes = children_genes[0].intersection(*children_genes[1:])
+                else:
+                    node_genes = None
+            nodes_knocker_out_genes.append(node_genes)
+        self.nodes_knocker_out_genes = nodes_knocker_out_genes
+
+    def get_node_genes(self, node_index: int) -> set:
+        """
+        :param node_index: A node in the DAG
+        :return: The indexes of all genes appearing under this node
+        """
+        node_genes = set()
+        stack = [node_index]
+        while stack:
+            node = stack.pop()
+            if self.nodes_operators[node] == GPA_REF:
+                node_genes.update(self.nodes_children[node])
+            else:
+                stack.extend(self.nodes_children[node])
+        return node_genes
+
+    def get_reaction_knocker_out_genes(self, reaction_position: int) -> list:
+        """
+        :param reaction_position: The position of the reaction in self.reactions_ids
+        :return: A sorted list of the genes indexes which their knocking-out will knock-out the reaction
+        """
+        if self.nodes_knocker_out_genes is None:
+            self.find_knocker_out_genes()
+        root = self.reactions_roots[reaction_position]
+        if root is None:
+            return []
+        root_genes = self.nodes_knocker_out_genes[root]
+        if root_genes is None:
+            root_genes = self.get_node_genes(root)
+        return sorted(root_genes)
+
+    def is_reaction_always_knocked_out(self, reaction_position: int) -> bool:
+        """
+        :param reaction_position: The position of the reaction in self.reactions_ids
+        :return: Whether the reaction is shut off without knocking-out any gene (e.g. by an empty GPAOr)
+        """
+        if self.nodes_knocker_out_genes is None:
+            self.find_knocker_out_genes()
+        root = self.reactions_roots[reaction_position]
+        return root is not None and self.nodes_knocker_out_genes[root] is None
+
+    def make_genes_to_reactions_ko_dict(self) -> dict:
+        """
+        :return: A dict in the format of {gene_id : reactions_list}, in the which the reactions_list is the list
+                 of reactions which would be shut down if we knock-out the gene defined with the id gene_id.
+        """
+        genes_to_reactions_ko_dict = {}
+        for reaction_position, rxn_id in enumerate(self.reactions_ids):
+            for gene_index in self.get_reaction_knocker_out_genes(reaction_position):
+                gene_id = self.genes_ids[gene_index]
+                if gene_id == "":
+                    continue
+                if gene_id in genes_to_reactions_ko_dict:
+                    genes_to_reactions_ko_dict[gene_id].append(rxn_id)
+                else:
+                    genes_to_reactions_ko_dict[gene_id] = [rxn_id]
+        return genes_to_reactions_ko_dict
+
+    def make_deletion_matrix(self, strains_ko_genes: list):
+        """
+        :param strains_ko_genes: List of knocked-out genes lists, one list per strain, like:
+                                 [['BSU29690'], ['BSU29690', 'BSU08060'], ['BSU08060', 'BSU08070', 'BSU26640']]
+        :return: A sparse (strains x self.genes_ids) boolean deletion matrix.
+                 Genes which do not appear in any compiled GPR are ignored, since they can not shut any reaction.
+        """
+        strains_indexes = []
+        genes_indexes = []
+        for strain_index, ko_genes in enumerate(strains_ko_genes):
+            for ko_gene in ko_genes:
+                gene_index = self.genes_index_map.get(ko_gene)
+                if gene_index is not None:
+                    strains_indexes.append(strain_index)
+                    genes_indexes.append(gene_index)
+        return sparse.csr_matrix((np.ones(len(strains_indexes), dtype=bool), (strains_indexes, genes_indexes)),
+                                 shape=(len(strains_ko_genes), len(self.genes_ids)), dtype=bool)
+
+    def evaluate_knock_outs(self, deletion_matrix, strains_chunk_size: int = 4096):
+        """
+        This method, evaluates all compiled GPRs over all strains at once, visiting the DAG nodes in their
+        topological order with one vectorized boolean operation per node over a chunk of strains.
+        As in self.find_knocker_out_genes, an empty GPAOr is shut by any gene, i.e. in the strains with at least one
+        deleted gene.
+        :param deletion_matrix: A (strains x self.genes_ids) boolean matrix, dense or scipy.sparse,
+                                with True for each deleted gene of the strain (see self.make_deletion_matrix)
+        :param strains_chunk_size: Number of strains evaluated together, bounding the memory to
+                                   (num_nodes x strains_chunk_size) booleans
+        :return: A sparse (strains x self.reactions_ids) boolean matrix, with True for each shut-off reaction
+        """
+        num_strains = deletion_matrix.shape[0]
+        if deletion_matrix.shape[1] != len(self.genes_ids):
+            raise ValueError("The deletion_matrix should have one column per compiled gene")
+        # ############ Preparing the DAG as index arrays once ############
+        nodes_operators = np.array(self.nodes_operators, dtype=np.int8)
+        ref_nodes = np.flatnonzero(nodes_operators == GPA_REF)
+        ref_genes = np.array([self.nodes_children[node][0] for node in ref_nodes], dtype=np.int64)
+        operation_nodes = [(node, operator == GPA_AND, np.array(self.nodes_children[node], dtype=np.int64))
+                           for node, operator in enumerate(self.nodes_operators) if operator != GPA_REF]
+        gpr_reactions = np.array([reaction_position for reaction_position, root in enumerate(self.reactions_roots)
+                                  if root is not None], dtype=np.int64)
+        gpr_roots = np.array([root for root in self.reactions_roots if root is not None], dtype=np.int64)
+        # ################### Evaluating chunks of strains ###################
+        shut_strains = []
+        shut_reactions = []
+        for chunk_start in range(0, num_strains, strains_chunk_size):
+            chunk_deletions = deletion_matrix[chunk_start:chunk_start + strains_chunk_size]
+            if sparse.issparse(chunk_deletions):
+                chunk_deletions = chunk_deletions.toarray()
+            chunk_deletions = np.asarray(chunk_deletions, dtype=bool)
+            nodes_alive = np.empty((len(self.nodes_operators), chunk_deletions.shape[0]), dtype=bool)
+            nodes_alive[ref_nodes] = ~chunk_deletions[:, ref_genes].T
+            is_intact = ~chunk_deletions.any(axis=1)
+            for node, is_and, children in operation_nodes:
+                if not is_and and len(children) == 0:
+                    nodes_alive[node] = is_intact
+                elif is_and:
+                    np.logical_and.reduce(nodes_alive[children], axis=0, out=nodes_alive[node])
+                else:
+                    np.logical_or.reduce(nodes_alive[children], axis=0, out=nodes_alive[node])
+            reactions_positions, strains_positions = np.nonzero(~nodes_alive[gpr_roots])
+            shut_strains.append(strains_positions + chunk_start)
+            shut_reactions.append(gpr_reactions[reactions_positions])
+        shut_strains = np.concatenate(shut_strains) if shut_strains else np.zeros(0, dtype=np.int64)
+        shut_reactions = np.concatenate(shut_reactions) if shut_reactions else np.zeros(0, dtype=np.int64)
+        return sparse.csr_matrix((np.ones(len(shut_strains), dtype=bool), (shut_strains, shut_reactions)),
+                                 shape=(num_strains, len(self.reactions_ids)), dtype=bool)
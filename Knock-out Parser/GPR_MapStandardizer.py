@@ -10,63 +10,10 @@ defined with the id gene_id.
 """
 
 import json
-import pandas as pd
-
-
-def get_all_associated_genes(gpr_expression: dict) -> list:
-    """
-    :param gpr_expression: A dict in a format like:
-                    {"GPAOr":[{"GPARef":"ulaD"},{"GPARef":"sgbH"}]}
-    :return: All genes existing in the gpr_expression
-    """
-    all_associated_genes = []
-    for id_key, expr in gpr_expression.items():
-        if id_key == "GPARef":
-            all_associated_genes.append(expr)
-        else:
-            for gpr_item in expr:
-                all_associated_genes = all_associated_genes + get_all_associated_genes(gpr_item)
-    return list(set(all_associated_genes))
-
-
-def is_shutter_gene(gpr_expression: dict, gene_id: str) -> bool:
-    """
-
-    :param gpr_expression: A dict in a format like:
-                    {"GPAOr":[{"GPARef":"ulaD"},{"GPARef":"sgbH"}]}
-    :param gene_id: A gene existing in the gpr_expression
-    :return: True if the gene's knock-out will shut the expression, and False otherwise
-    """
-    for id_key, expr in gpr_expression.items():
-        if id_key == "GPARef":
-            return expr == gene_id
-        elif id_key == "GPAAnd":
-            for item_expression in expr:  # Shutting at least one item
-                if is_shutter_gene(gpr_expression=item_expression, gene_id=gene_id):
-                    return True
-            return False
-        elif id_key == "GPAOr":
-            for item_expression in expr:  # Shutting all item
-                if not is_shutter_gene(gpr_expression=item_expression, gene_id=gene_id):
-                    return False
-            return True
-        else:
-            print("Your GPR format with key " + id_key + " is not standard")
-            raise Exception
-
-
-def find_knocker_out_genes_from_gpa(gpr_expression: dict) -> list:
-    """
-    :param gpr_expression: A dict in a format like:
-                    {"GPAOr":[{"GPARef":"ulaD"},{"GPARef":"sgbH"}]}
-    :return: A list of gene which their knocking-out will knock-out the entire expression
-    """
-    all_associated_genes = get_all_associated_genes(gpr_expression)
-    knocker_out_genes = []
-    for gene_id in all_associated_genes:
-        if is_shutter_gene(gpr_expression=gpr_expression, gene_id=gene_id):
-            knocker_out_genes.append(gene_id)
-    return knocker_out_genes
+import time
+import warnings
+from TranslationTable import load_translation_dict
+from GPR_Compiler import GPRCompiler, make_gpa_operation, parse_gpr_rule
 
 
 def convert_rule_to_gpa(gpr_rule: str) -> dict:
@@ -74,55 +21,13 @@ def convert_rule_to_gpa(gpr_rule: str) -> dict:
     :param gpr_rule: A str in a format like:
             ( BSU29690 and BSU29700 and BSU29710 ) or ( BSU08060 and BSU08070 and BSU08090 ) or BSU26640
     :return: A dict in a format like:
-                    {'GPAOr': [{'GPARef': 'BSU28560'},
-                               {'GPAOr': [{'GPARef': 'BSU18250'},
-                                          {'GPAOr': [{'GPARef': 'BSU10360'},
-                                                     {'GPARef': 'BSU10270'}]
-                                          }]
-                                }]
+                    {'GPAOr': [{'GPAAnd': [{'GPARef': 'BSU29690'}, {'GPARef': 'BSU29700'}, {'GPARef': 'BSU29710'}]},
+                               {'GPAAnd': [{'GPARef': 'BSU08060'}, {'GPARef': 'BSU08070'}, {'GPARef': 'BSU08090'}]},
+                               {'GPARef': 'BSU26640'}]
                     }
+             See GPR_Compiler.parse_gpr_rule for the parsing details.
     """
-
-    # print(gpr_expression)
-    if gpr_rule[0:2] == '( ':
-        close_parentheses_idx = gpr_rule.index(")")
-
-        if len(gpr_rule) == close_parentheses_idx + 1:  # gpr_expression = "( ... )"
-            return convert_rule_to_gpa(gpr_rule[2:-2])
-        elif gpr_rule[close_parentheses_idx+1:close_parentheses_idx+5] == ' or ':
-            operator = "GPAOr"
-            second_term_start_idx = close_parentheses_idx + 5
-        elif gpr_rule[close_parentheses_idx+1:close_parentheses_idx+6] == ' and ':
-            operator = "GPAAnd"
-            second_term_start_idx = close_parentheses_idx + 6
-        else:
-            print("Undefined Operator")
-            raise Exception
-
-        first_parentheses_term = gpr_rule[2:close_parentheses_idx - 1]
-        first_member = convert_rule_to_gpa(first_parentheses_term)
-        second_term = gpr_rule[second_term_start_idx:]
-        second_member = convert_rule_to_gpa(second_term)
-        return {operator: [first_member, second_member]}
-
-    if ' ' in gpr_rule:
-        space_idx = gpr_rule.index(' ')
-        if gpr_rule[space_idx:space_idx + 4] == ' or ':
-            operator = "GPAOr"
-            second_term_start_idx = space_idx + 4
-        elif gpr_rule[space_idx:space_idx + 5] == ' and ':
-            operator = "GPAAnd"
-            second_term_start_idx = space_idx + 5
-        else:
-            print("Undefined Operator")
-            raise Exception
-        first_parentheses_term = gpr_rule[:space_idx]
-        first_member = convert_rule_to_gpa(first_parentheses_term)
-        second_term = gpr_rule[second_term_start_idx:]
-        second_member = convert_rule_to_gpa(second_term)
-        return {operator: [first_member, second_member]}
-    else:
-        return {"GPARef": gpr_rule}
+    return parse_gpr_rule(gpr_rule=gpr_rule)
 
 # ######################################################################################################
 
@@ -166,27 +71,17 @@ class GPRMapConverter:
 
     def make_translation_dict(self):
         """
-        This method, reads translation_file.csv from self.translation_filepath,
-            then makes the self.translation_dict dictionary with keys as reactions names in
-            self.input_reactions_nomenclature and values as reactions names in self.output_reactions_nomenclature
+        This method, loads the self.translation_dict dictionary from self.translation_filepath (see TranslationTable),
+            with keys as reactions names in self.input_reactions_nomenclature and values as reactions names in
+            self.output_reactions_nomenclature
         """
         if self.translation_filepath:
-            self.translation_dict = {}
-            translation_file = pd.read_csv(self.translation_filepath)
-            if self.input_reactions_nomenclature:
-                if self.input_reactions_nomenclature not in translation_file.columns:
-                    print("input_reactions_nomenclature does not exist in translation_file")  # ToDo: to Exception
-                    raise Exception
-            if self.output_reactions_nomenclature:
-                if self.output_reactions_nomenclature not in translation_file.columns:
-                    print("output_reactions_nomenclature does not exist in translation_file")
-                    raise Exception
-            for index, row in translation_file.iterrows():
-                key = row[self.input_reactions_nomenclature]
-                value = row[self.output_reactions_nomenclature]
-                self.translation_dict[key] = value
+            self.translation_dict = load_translation_dict(translation_filepath=self.translation_filepath,
+                                                          input_nomenclature=self.input_reactions_nomenclature,
+                                                          output_nomenclature=self.output_reactions_nomenclature)
 
-    def make_genes_to_reactions_ko_dict(self, filepath_to_save: str, gpr_type: str = "GPA"):
+    def make_genes_to_reactions_ko_dict(self, filepath_to_save: str, gpr_type: str = "GPA",
+                                        filepath_to_save_rules: str = None):
         """
         :param filepath_to_save: The path to save the final dictionary as a .json file.
         :param gpr_type: Defines the type of self.gene_assoc_data:
@@ -194,12 +89,17 @@ class GPRMapConverter:
                          {"R_KG6PDC": {"GPAOr":[{"GPARef":"ulaD"},{"GPARef":"sgbH"}]}}
                          "Rule": A dict in the format of e.g.:
                          {"ACTD2": "( BSU29690 and BSU29700 and BSU29710 ) or ( BSU08060 and BSU08070 and BSU08090 )"}
+        :param filepath_to_save_rules: If given, the GPR rules are also saved there in the GPA format with the
+                                       output reactions ids, to be used for multi-gene knock-outs in ReactionsKOMaker.
         :return: Saves the standard .json GPR file.
                  If self.translation_dict is None, the reactions ids will be the same with the ids in the
                  input self.gene_assoc_data data. Otherwise, they will be translated from
                  self.input_reactions_nomenclature into self.output_reactions_nomenclature.
+                 The GPRs of the input reactions translated into the same output reaction are joined by "or", since
+                 any of them can carry the output reaction (an empty GPR, with no knocker-out gene, stays empty).
         """
-        genes_to_reactions_ko_dict = {}
+        organism_rules = {}
+        start_time = time.time()
         for rxn_name, gpr_expression in self.gene_assoc_data.items():
             # ############### Translating the reaction name ###################
             output_rxn_name = rxn_name
@@ -209,7 +109,7 @@ class GPRMapConverter:
                 except KeyError:
                     print("The reaction " + rxn_name + " does not exist in the translation file")
                     raise Exception
-            # ############### Find knocker-out genes for this reaction ###################
+            # ############### Compiling the GPR of this reaction ###################
             if gpr_type == "GPA":
                 gpr_gpa_format = gpr_expression
             elif gpr_type == "Rule":
@@ -217,18 +117,30 @@ class GPRMapConverter:
             else:
                 print("gpr_type is not defined correctly")
                 raise Exception
-            knocker_out_genes = find_knocker_out_genes_from_gpa(gpr_expression=gpr_gpa_format)
-            if "" in knocker_out_genes:
-                knocker_out_genes.remove("")
-            # ############ Add this reaction to the corresponding knocker-out genes ################
-            for knocker_out_gene in knocker_out_genes:
-                if knocker_out_gene in genes_to_reactions_ko_dict.keys():
-                    genes_to_reactions_ko_dict[knocker_out_gene].append(output_rxn_name)
+            if output_rxn_name in organism_rules:
+                warnings.warn("Several reactions are translated into " + output_rxn_name +
+                              ", their GPRs are joined by \"or\"")
+                if organism_rules[output_rxn_name] and gpr_gpa_format:
+                    gpr_gpa_format = make_gpa_operation("GPAOr", [organism_rules[output_rxn_name], gpr_gpa_format])
                 else:
-                    genes_to_reactions_ko_dict[knocker_out_gene] = [output_rxn_name]
-            # #################################################################
+                    gpr_gpa_format = {}
+            organism_rules[output_rxn_name] = gpr_gpa_format
+        gpr_compiler = GPRCompiler()
+        for output_rxn_name, gpr_gpa_format in organism_rules.items():
+            gpr_compiler.add_reaction(rxn_id=output_rxn_name, gpr_expression=gpr_gpa_format)
+        compile_time = time.time()
+        # ############ Find knocker-out genes of all reactions in one pass ################
+        genes_to_reactions_ko_dict = gpr_compiler.make_genes_to_reactions_ko_dict()
+        finish_time = time.time()
+        print("GPR compilation: " + str(len(gpr_compiler.reactions_ids)) + " reactions, " +
+              str(len(gpr_compiler.genes_ids)) + " genes, " + str(len(gpr_compiler.nodes_operators)) +
+              " nodes in %.3f s" % (compile_time - start_time))
+        print("Knocker-out genes search: %.3f s" % (finish_time - compile_time))
         with open(filepath_to_save, 'w', encoding='utf-8') as f:
             json.dump(genes_to_reactions_ko_dict, f, ensure_ascii=False, indent=4)
+        if filepath_to_save_rules:
+            with open(filepath_to_save_rules, 'w', encoding='utf-8') as f:
+                json.dump(organism_rules, f, ensure_ascii=False, indent=4)
 
 
 # obj = GPRMapConverter(gene_assoc_data_filepath="../Data/Palsson B.Subtilis Reconstruction/Genes Associations.json",
@@ -6,6 +6,7 @@ used in further processes
 
 import json
 import pandas as pd
+from TranslationTable import load_translation_dict
 import warnings
 
 
@@ -57,25 +58,14 @@ class GenesKOStandardizer:
 
     def make_translation_dict(self):
         """
-        This method, reads translation_file.csv from self.translation_filepath,
-            then makes the self.translation_dict dictionary with keys as genes names in
-            self.input_genes_nomenclature and values as genes names in self.output_genes_nomenclature
+        This method, loads the self.translation_dict dictionary from self.translation_filepath (see TranslationTable),
+            with keys as genes names in self.input_genes_nomenclature and values as genes names in
+            self.output_genes_nomenclature
         """
         if self.translation_filepath:
-            self.translation_dict = {}
-            translation_file = pd.read_csv(self.translation_filepath)
-            if self.input_genes_nomenclature:
-                if self.input_genes_nomenclature not in translation_file.columns:
-                    print("input_reactions_nomenclature does not exist in translation_file")  # ToDo: to Exception
-                    raise Exception
-            if self.output_genes_nomenclature:
-                if self.output_genes_nomenclature not in translation_file.columns:
-                    print("output_reactions_nomenclature does not exist in translation_file")
-                    raise Exception
-            for index, row in translation_file.iterrows():
-                key = row[self.input_genes_nomenclature]
-                value = row[self.output_genes_nomenclature]
-                self.translation_dict[key] = value
+            self.translation_dict = load_translation_dict(translation_filepath=self.translation_filepath,
+                                                          input_nomenclature=self.input_genes_nomenclature,
+                                                          output_nomenclature=self.output_genes_nomenclature)
 
     def make_genes_ko_growth_dict(self, filepath_to_save):
         """
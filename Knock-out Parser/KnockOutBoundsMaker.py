@@ -13,13 +13,21 @@ and produces four .csv files as Growth Utilization Exchange Bounds:
 
 Note: If not "all" the reactions from an KO experiment are found in the reactions list,
       we ignore that experiment as partial shutting downs can be problematic.
+Note: make_growth_bounds_matrices and make_non_growth_bounds_matrices build the same bounds as
+      (reactions x experiments) numpy arrays, with the .csv files as an export option (export_bounds_matrices).
+      make_all_bounds makes all of them in a single pass over the experiments.
+      make_all_base_delta_bounds keeps them as one base vector per medium plus sparse KO deltas (see SparseBounds).
 For more information, see the document.
 """
 
 import json
 import warnings
+import numpy as np
 import pandas as pd
 import os
+from SparseBounds import BaseDeltaBounds
+from BoundsMatrixStore import save_bounds_dataframe
+from MediaBounds import make_bounds_dataframe, make_media_base_bounds
 
 
 def modify_ko_bounds(total_bounds, ko_rxns_ids):
@@ -42,6 +50,29 @@ def modify_ko_bounds(total_bounds, ko_rxns_ids):
     return all_reactions_found_flag, total_bounds
 
 
+def find_ko_rows_indexes(reactions_index_map: dict, ko_rxns_ids: list):
+    """
+    The index-based version of modify_ko_bounds.
+    :param reactions_index_map: A dict in the format of {rxn_id: rows_indexes} for all the reactions in the medium
+    :param ko_rxns_ids: List of reactions which are knocked-out in this specific experiment
+    :return: all_reactions_found_flag: True if all knocked-out reactions were found in the reactions_index_map,
+             to prevent misleading KO data generation
+             ko_rows_indexes: List of row indexes of the found knocked-out reactions (all the rows of a repeated
+             reaction id, as in modify_ko_bounds)
+    """
+    all_reactions_found_flag = True
+    ko_rows_indexes = []
+    for ko_rxn_id in ko_rxns_ids:
+        rows_indexes = reactions_index_map.get(ko_rxn_id)
+        if rows_indexes is None:
+            warning_text = "The reaction with ID " + ko_rxn_id + " does not exist in the list"
+            warnings.warn(warning_text)
+            all_reactions_found_flag = False
+        else:
+            ko_rows_indexes.extend(rows_indexes)
+    return all_reactions_found_flag, ko_rows_indexes
+
+
 class KnockOutBoundsMaker:
     def __init__(self, reactions_ko_filepath: str, media_filepath_dict: dict, internal_rxns_filepath: str):
         """
@@ -70,6 +101,21 @@ class KnockOutBoundsMaker:
         self.growth_upper_bounds = None
         self.non_growth_lower_bounds = None
         self.non_growth_upper_bounds = None
+        # ############ Index-based bounds matrices ############
+        self.all_reactions_ids = None
+        self.reactions_index_map = None
+        self.media_base_bounds = None
+        self.growth_lower_matrix = None
+        self.growth_upper_matrix = None
+        self.growth_columns_names = None
+        self.non_growth_lower_matrix = None
+        self.non_growth_upper_matrix = None
+        self.non_growth_columns_names = None
+        # ############ Base-plus-delta bounds ############
+        self.growth_lower_base_delta = None
+        self.growth_upper_base_delta = None
+        self.non_growth_lower_base_delta = None
+        self.non_growth_upper_base_delta = None
 
     def load_reactions_ko_list(self):
         """
@@ -189,23 +235,195 @@ class KnockOutBoundsMaker:
                     self.non_growth_upper_bounds['u' + new_column_name] = modified_bounds['Upper Bound'].tolist()
                     counter += 1
 
-    def save_all_bounds(self, folder_to_save: str):
+    def make_base_bounds_vectors(self):
+        """
+        This method, loads the media bounds once, and makes the base (internal + exchange) lower and upper
+        bounds vectors of each medium, with a hash index from the reactions ids into their rows (all the rows of a
+        repeated reaction id are knocked-out).
+        :return: -. Filling self.all_reactions_ids, self.reactions_index_map, and self.media_base_bounds
+        """
+        self.load_media_bounds()
+        self.all_reactions_ids, self.all_exchange_ids, self.media_base_bounds = make_media_base_bounds(
+            internal_rxns_df=self.internal_rxns_df, media_dict=self.media_dict,
+            exchanges_ids_list=self.all_exchange_ids)
+        self.reactions_index_map = {}
+        for row_index, rxn_id in enumerate(self.all_reactions_ids):
+            self.reactions_index_map.setdefault(rxn_id, []).append(row_index)
+
+    def route_ko_experiments(self, growth_statuses: tuple = (True, False)) -> dict:
+        """
+        This method, resolves the knocked-out rows of all valid experiments of self.reactions_ko_list in one pass,
+        routing each experiment into the columns of its growth status.
+        :param growth_statuses: The growth statuses to be routed, (True, False) for both growth and non-growth
+        :return: A dict in the format of {growth: (columns_media, ko_rows_indexes, ko_columns_indexes)}
+        """
+        if self.media_base_bounds is None:
+            self.make_base_bounds_vectors()
+        routed_experiments = {growth: ([], [], []) for growth in growth_statuses}
+        for ko_data in self.reactions_ko_list:
+            growth = bool(ko_data['growth'])
+            if growth not in routed_experiments.keys():
+                continue
+            if ko_data['medium'] not in self.media_base_bounds.keys():
+                warnings.warn("medium " + ko_data['medium'] + " not specified")
+                continue
+            is_valid, experiment_rows = find_ko_rows_indexes(reactions_index_map=self.reactions_index_map,
+                                                             ko_rxns_ids=ko_data['ko_rxns_ids'])
+            if is_valid:
+                columns_media, ko_rows_indexes, ko_columns_indexes = routed_experiments[growth]
+                ko_rows_indexes.extend(experiment_rows)
+                ko_columns_indexes.extend([len(columns_media)] * len(experiment_rows))
+                columns_media.append(ko_data['medium'])
+        return routed_experiments
+
+    def fill_bounds_matrices(self, columns_media: list, ko_rows_indexes: list, ko_columns_indexes: list) -> tuple:
+        """
+        This method, writes the routed experiments into preallocated (reactions x experiments) matrices:
+        each column starts from the base bounds of its medium, and all knocked-out reactions of all experiments
+        are set to 0 at once by fancy indexing.
+        :param columns_media: List of the medium name of each column
+        :param ko_rows_indexes: Row indexes of all knocked-out reactions
+        :param ko_columns_indexes: Column indexes of all knocked-out reactions
+        :return: lower_bounds_matrix, upper_bounds_matrix, and the list of experiments columns numbers
+        """
+        num_reactions = len(self.all_reactions_ids)
+        lower_bounds_matrix = np.empty((num_reactions, len(columns_media)))
+        upper_bounds_matrix = np.empty((num_reactions, len(columns_media)))
+        columns_media = np.array(columns_media, dtype=object)
+        for medium_name, (lower_bounds_vector, upper_bounds_vector) in self.media_base_bounds.items():
+            medium_columns = np.flatnonzero(columns_media == medium_name)
+            lower_bounds_matrix[:, medium_columns] = lower_bounds_vector[:, np.newaxis]
+            upper_bounds_matrix[:, medium_columns] = upper_bounds_vector[:, np.newaxis]
+        lower_bounds_matrix[ko_rows_indexes, ko_columns_indexes] = 0
+        upper_bounds_matrix[ko_rows_indexes, ko_columns_indexes] = 0
+        columns_numbers = [str(column_index + 1) for column_index in range(len(columns_media))]
+        return lower_bounds_matrix, upper_bounds_matrix, columns_numbers
+
+    def make_ko_bounds_matrices(self, growth: bool) -> tuple:
+        """
+        :param growth: True for growth experiments, and False for non-growth experiments
+        :return: lower_bounds_matrix, upper_bounds_matrix, and the list of experiments columns numbers
+                 (see self.fill_bounds_matrices)
+        """
+        routed_experiments = self.route_ko_experiments(growth_statuses=(growth,))
+        return self.fill_bounds_matrices(*routed_experiments[growth])
+
+    def make_growth_bounds_matrices(self):
+        """
+        The index-based version of make_growth_bounds
+        :return: -. Filling self.growth_lower_matrix, self.growth_upper_matrix, and self.growth_columns_names
+        """
+        self.growth_lower_matrix, self.growth_upper_matrix, self.growth_columns_names = \
+            self.make_ko_bounds_matrices(growth=True)
+
+    def make_non_growth_bounds_matrices(self):
+        """
+        The index-based version of make_non_growth_bounds
+        :return: -. Filling self.non_growth_lower_matrix, self.non_growth_upper_matrix,
+                    and self.non_growth_columns_names
+        """
+        self.non_growth_lower_matrix, self.non_growth_upper_matrix, self.non_growth_columns_names = \
+            self.make_ko_bounds_matrices(growth=False)
+
+    def export_bounds_matrices(self):
+        """
+        This method, exports the bounds matrices into the DataFrames used by self.save_all_bounds
+        :return: -. Filling self.growth_lower_bounds, self.growth_upper_bounds,
+                    self.non_growth_lower_bounds, and self.non_growth_upper_bounds
+        """
+        if self.growth_lower_matrix is not None:
+            self.growth_lower_bounds = make_bounds_dataframe(self.all_reactions_ids, self.growth_lower_matrix,
+                                                             ['l' + name for name in self.growth_columns_names])
+            self.growth_upper_bounds = make_bounds_dataframe(self.all_reactions_ids, self.growth_upper_matrix,
+                                                             ['u' + name for name in self.growth_columns_names])
+        if self.non_growth_lower_matrix is not None:
+            self.non_growth_lower_bounds = make_bounds_dataframe(
+                self.all_reactions_ids, self.non_growth_lower_matrix,
+                ['l' + name for name in self.non_growth_columns_names])
+            self.non_growth_upper_bounds = make_bounds_dataframe(
+                self.all_reactions_ids, self.non_growth_upper_matrix,
+                ['u' + name for name in self.non_growth_columns_names])
+
+    def make_all_bounds(self):
+        """
+        This method, makes growth and non-growth bounds together: the media are read once, the base bounds are
+        computed once per medium, and each experiment is routed into the growth or non-growth matrices in one pass.
+        :return: -. Filling the growth and non-growth matrices, and their exported DataFrames
+        """
+        self.make_base_bounds_vectors()
+        routed_experiments = self.route_ko_experiments(growth_statuses=(True, False))
+        self.growth_lower_matrix, self.growth_upper_matrix, self.growth_columns_names = \
+            self.fill_bounds_matrices(*routed_experiments[True])
+        self.non_growth_lower_matrix, self.non_growth_upper_matrix, self.non_growth_columns_names = \
+            self.fill_bounds_matrices(*routed_experiments[False])
+        self.export_bounds_matrices()
+
+    def make_base_delta_bounds(self, columns_media: list, ko_rows_indexes: list, ko_columns_indexes: list) -> tuple:
+        """
+        The base-plus-delta version of self.fill_bounds_matrices, with the same arguments.
+        :return: lower BaseDeltaBounds, upper BaseDeltaBounds
+        """
+        lower_base_delta = BaseDeltaBounds(reactions_ids=self.all_reactions_ids)
+        upper_base_delta = BaseDeltaBounds(reactions_ids=self.all_reactions_ids)
+        for medium_name, (lower_bounds_vector, upper_bounds_vector) in self.media_base_bounds.items():
+            lower_base_delta.add_base(base_name=medium_name, base_vector=lower_bounds_vector)
+            upper_base_delta.add_base(base_name=medium_name, base_vector=upper_bounds_vector)
+        columns_numbers = [str(column_index + 1) for column_index in range(len(columns_media))]
+        ko_values = np.zeros(len(ko_rows_indexes))
+        lower_base_delta.add_columns(columns_names=['l' + name for name in columns_numbers],
+                                     columns_bases_names=columns_media,
+                                     delta_rows=ko_rows_indexes, delta_columns=ko_columns_indexes,
+                                     delta_values=ko_values)
+        upper_base_delta.add_columns(columns_names=['u' + name for name in columns_numbers],
+                                     columns_bases_names=columns_media,
+                                     delta_rows=ko_rows_indexes, delta_columns=ko_columns_indexes,
+                                     delta_values=ko_values)
+        return lower_base_delta, upper_base_delta
+
+    def make_all_base_delta_bounds(self):
+        """
+        The base-plus-delta version of self.make_all_bounds, with no dense column materialized.
+        :return: -. Filling the growth and non-growth BaseDeltaBounds
+        """
+        self.make_base_bounds_vectors()
+        routed_experiments = self.route_ko_experiments(growth_statuses=(True, False))
+        self.growth_lower_base_delta, self.growth_upper_base_delta = \
+            self.make_base_delta_bounds(*routed_experiments[True])
+        self.non_growth_lower_base_delta, self.non_growth_upper_base_delta = \
+            self.make_base_delta_bounds(*routed_experiments[False])
+
+    def save_all_base_delta_bounds(self, folder_to_save: str):
+        """
+        :param folder_to_save: Folder path to save all four growth and non-growth base-plus-delta bounds (.npz)
+        :return: -
+        """
+        if not os.path.exists(folder_to_save):
+            os.makedirs(folder_to_save)
+        self.growth_lower_base_delta.save(folder_to_save + 'g_lower_bounds.npz')
+        self.growth_upper_base_delta.save(folder_to_save + 'g_upper_bounds.npz')
+        self.non_growth_lower_base_delta.save(folder_to_save + 'ng_lower_bounds.npz')
+        self.non_growth_upper_base_delta.save(folder_to_save + 'ng_upper_bounds.npz')
+
+    def save_all_bounds(self, folder_to_save: str, file_format: str = 'csv', binary_dtype=np.float64):
         """
         :param folder_to_save: Folder path to save all four growth and non-growth bound
+        :param file_format: "csv" for .csv files, or "binary" for BoundsMatrixStore folders (.bounds)
+        :param binary_dtype: The data type of the binary stores, np.float64 or np.float32
         :return: -
         """
         if not os.path.exists(folder_to_save):
             os.makedirs(folder_to_save)
-        self.growth_lower_bounds.to_csv(folder_to_save + 'g_lower_bounds.csv', index=False)
-        self.growth_upper_bounds.to_csv(folder_to_save + 'g_upper_bounds.csv', index=False)
-        self.non_growth_lower_bounds.to_csv(folder_to_save + 'ng_lower_bounds.csv', index=False)
-        self.non_growth_upper_bounds.to_csv(folder_to_save + 'ng_upper_bounds.csv', index=False)
+        for bounds_df, filename in [(self.growth_lower_bounds, 'g_lower_bounds'),
+                                    (self.growth_upper_bounds, 'g_upper_bounds'),
+                                    (self.non_growth_lower_bounds, 'ng_lower_bounds'),
+                                    (self.non_growth_upper_bounds, 'ng_upper_bounds')]:
+            save_bounds_dataframe(bounds_df=bounds_df, filepath_prefix=folder_to_save + filename,
+                                  file_format=file_format, dtype=binary_dtype)
 
 
 media_filepath_dict_ = {'LB_Rich_Medium': "../Data/Palsson B.Subtilis Reconstruction/LB_Medium_Bounds.csv"}
 obj = KnockOutBoundsMaker(reactions_ko_filepath="../../Data/Palsson B.Subtilis Reconstruction/Reactions KO Growth.json",
                           media_filepath_dict=media_filepath_dict_,
                           internal_rxns_filepath="../../Data/Palsson B.Subtilis Reconstruction/Internal_Rxns_Bounds.csv")
-obj.make_growth_bounds()
-obj.make_non_growth_bounds()
+obj.make_all_bounds()
 obj.save_all_bounds(folder_to_save="../Data/Palsson B.Subtilis Reconstruction/KO Bounds/")
@@ -1,20 +1,34 @@
 """
 ReactionsKOMaker.py
 This code, translates the genes knocking-out into reactions shutting off, using organism_GPR.json,
-and integrates it with the growth information in a specific medium saved in the GenesKO.json file
+and integrates it with the growth information in a specific medium saved in the GenesKO.json file.
+Multi-gene knock-outs (double/triple deletion strains) are evaluated from the organism GPR rules instead.
 """
 
 import json
+from GPR_Compiler import GPRCompiler
 
 
 class ReactionsKOMaker:
-    def __init__(self, organism_gpr_filepath, genes_ko_growth_filepath):
+    def __init__(self, organism_gpr_filepath, genes_ko_growth_filepath, organism_rules_filepath=None):
+        """
+        :param organism_gpr_filepath: The filepath for organism_GPR.json, in the format of {gene_id : reactions_list}
+        :param genes_ko_growth_filepath: The filepath for genes_ko_growth.json, e.g. list items:
+                                         {'ko_gene_id': 'BSU29690', 'medium': 'LB_Rich_Medium', 'growth': true}
+                                         or, for multi-gene knock-outs:
+                                         {'ko_genes_ids': ['BSU29690', 'BSU08060'], 'medium': ..., 'growth': ...}
+        :param organism_rules_filepath: The filepath for the organism GPR rules .json file, in the format of
+                                        {rxn_id: GPA expression} (see GPRMapConverter.make_genes_to_reactions_ko_dict),
+                                        needed only for make_multi_reactions_ko_growth
+        """
         self.organism_gpr_filepath = organism_gpr_filepath
         self.organism_gpr = None
         self.read_organism_gpr()
         self.genes_ko_growth_filepath = genes_ko_growth_filepath
         self.genes_ko_growth_list = None
         self.read_genes_ko_growth_file()
+        self.organism_rules_filepath = organism_rules_filepath
+        self.gpr_compiler = None
 
     def read_organism_gpr(self):
         """
@@ -30,6 +44,37 @@ class ReactionsKOMaker:
         with open(self.genes_ko_growth_filepath, 'r') as json_file:
             self.genes_ko_growth_list = json.load(json_file)
 
+    def compile_organism_rules(self):
+        """
+        This method, reads the organism GPR rules from self.organism_rules_filepath and compiles them
+        :return: -. Filling self.gpr_compiler
+        """
+        if self.organism_rules_filepath is None:
+            raise ValueError("organism_rules_filepath is needed for multi-gene knock-outs")
+        with open(self.organism_rules_filepath, 'r') as json_file:
+            organism_rules = json.load(json_file)
+        self.gpr_compiler = GPRCompiler()
+        for rxn_id, gpr_expression in organism_rules.items():
+            self.gpr_compiler.add_reaction(rxn_id=rxn_id, gpr_expression=gpr_expression)
+
+    def make_shut_off_matrix(self, strains_chunk_size: int = 4096):
+        """
+        :param strains_chunk_size: Number of strains evaluated together (see GPRCompiler.evaluate_knock_outs)
+        :return: A sparse (strains x self.gpr_compiler.reactions_ids) boolean matrix of shut-off reactions,
+                 with one strain per item of self.genes_ko_growth_list
+        """
+        if self.gpr_compiler is None:
+            self.compile_organism_rules()
+        strains_ko_genes = []
+        for ko_growth in self.genes_ko_growth_list:
+            if 'ko_genes_ids' in ko_growth:
+                strains_ko_genes.append(ko_growth['ko_genes_ids'])
+            else:
+                strains_ko_genes.append([ko_growth['ko_gene_id']])
+        deletion_matrix = self.gpr_compiler.make_deletion_matrix(strains_ko_genes=strains_ko_genes)
+        return self.gpr_compiler.evaluate_knock_outs(deletion_matrix=deletion_matrix,
+                                                     strains_chunk_size=strains_chunk_size)
+
     def make_reactions_ko_growth(self, filepath_to_save):
         """
         :param filepath_to_save: The path to save the .json file
@@ -49,6 +94,29 @@ class ReactionsKOMaker:
         with open(filepath_to_save, 'w', encoding='utf-8') as f:
             json.dump(reactions_ko_dicts, f, ensure_ascii=False, indent=4)
 
+    def make_multi_reactions_ko_growth(self, filepath_to_save, strains_chunk_size: int = 4096):
+        """
+        The multi-gene version of make_reactions_ko_growth, evaluating all strains at once by their GPR rules.
+        :param filepath_to_save: The path to save the .json file
+        :param strains_chunk_size: Number of strains evaluated together (see GPRCompiler.evaluate_knock_outs)
+        :return: Nothing, Saves the list of dictionaries as a .json file
+        """
+        shut_off_matrix = self.make_shut_off_matrix(strains_chunk_size=strains_chunk_size)
+        reactions_ids = self.gpr_compiler.reactions_ids
+        reactions_ko_dicts = []
+        for strain_index, ko_growth in enumerate(self.genes_ko_growth_list):
+            strain_row = slice(shut_off_matrix.indptr[strain_index], shut_off_matrix.indptr[strain_index + 1])
+            shut_reactions = [reactions_ids[rxn_index] for rxn_index in shut_off_matrix.indices[strain_row]]
+            if shut_reactions:
+                reactions_ko_dicts.append(
+                    {'ko_rxns_ids': shut_reactions,
+                     'medium': ko_growth['medium'],
+                     'growth': ko_growth['growth']}
+                )
+            # else, these genes do not shut off any reaction together
+        with open(filepath_to_save, 'w', encoding='utf-8') as f:
+            json.dump(reactions_ko_dicts, f, ensure_ascii=False, indent=4)
+
 
 obj = ReactionsKOMaker(organism_gpr_filepath="../../Data/Palsson B.Subtilis Reconstruction/Organism GPR.json",
                        genes_ko_growth_filepath="../../Data/Palsson B.Subtilis Reconstruction/Genes KO Growth.json")
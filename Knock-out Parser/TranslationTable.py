@@ -0,0 +1,89 @@
+"""
+TranslationTable.py
+This code, loads the {input_id: output_id} translation dictionaries of the genes/reactions translation files.
+
+A dictionary is built with vectorized column operations, and it is cached:
+    1. On the disk, as a pickle file in the cache_folder, keyed by the content hash of the translation file
+       and the chosen input/output columns.
+    2. In memory, so that all the standardizers of a process share one instance of each dictionary.
+The shared dictionaries should be treated as read-only.
+"""
+
+import hashlib
+import os
+import pickle
+import pandas as pd
+from FileContentHash import get_file_content_hash
+
+TRANSLATION_CACHE_FOLDER_NAME = '.translation_cache'
+
+# (file path, modification time, size, input column, output column) --> translation_dict
+_loaded_translation_dicts = {}
+
+
+def make_translation_dict_from_file(translation_filepath: str, input_nomenclature: str,
+                                    output_nomenclature: str) -> dict:
+    """
+    :param translation_filepath: The file path for translation_file.csv
+    :param input_nomenclature: The column name of the keys
+    :param output_nomenclature: The column name of the values
+    :return: translation_dict, in the format of {input_id: output_id}.
+             For repeated input ids, the last row is effective. Rows without an input id are dropped.
+    """
+    translation_file = pd.read_csv(translation_filepath)
+    if input_nomenclature not in translation_file.columns:
+        raise KeyError("input nomenclature " + str(input_nomenclature) + " does not exist in translation_file")
+    if output_nomenclature not in translation_file.columns:
+        raise KeyError("output nomenclature " + str(output_nomenclature) + " does not exist in translation_file")
+    translation_file = translation_file[translation_file[input_nomenclature].notna()]
+    return dict(zip(translation_file[input_nomenclature].tolist(), translation_file[output_nomenclature].tolist()))
+
+
+def load_translation_dict(translation_filepath: str, input_nomenclature: str, output_nomenclature: str,
+                          cache_folder: str = None) -> dict:
+    """
+    :param translation_filepath: The file path for translation_file.csv
+    :param input_nomenclature: The column name of the keys
+    :param output_nomenclature: The column name of the values
+    :param cache_folder: The folder for the on-disk cache. By default, a folder named TRANSLATION_CACHE_FOLDER_NAME
+                         next to the translation file.
+    :return: The shared translation_dict, in the format of {input_id: output_id}
+    """
+    file_stat = os.stat(translation_filepath)
+    memory_key = (os.path.abspath(translation_filepath), file_stat.st_mtime_ns, file_stat.st_size,
+                  input_nomenclature, output_nomenclature)
+    if memory_key in _loaded_translation_dicts:
+        return _loaded_translation_dicts[memory_key]
+    # ########################## On-disk cache ##########################
+    if cache_folder is None:
+        cache_folder = os.path.join(os.path.dirname(os.path.abspath(translation_filepath)),
+                                    TRANSLATION_CACHE_FOLDER_NAME)
+    cache_key = hashlib.sha256('\n'.join([get_file_content_hash(translation_filepath),
+                                          str(input_nomenclature),
+                                          str(output_nomenclature)]).encode('utf-8')).hexdigest()
+    cache_filepath = os.path.join(cache_folder, cache_key + '.pkl')
+    if os.path.exists(cache_filepath):
+        with open(cache_filepath, 'rb') as cache_file:
+            translation_dict = pickle.load(cache_file)
+    else:
+        translation_dict = make_translation_dict_from_file(translation_filepath=translation_filepath,
+                                                           input_nomenclature=input_nomenclature,
+                                                           output_nomenclature=output_nomenclature)
+        try:
+            if not os.path.exists(cache_folder):
+                os.makedirs(cache_folder)
+            with open(cache_filepath, 'wb') as cache_file:
+                pickle.dump(translation_dict, cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+        except OSError:
+            # A read-only data folder only disables the on-disk cache
+            pass
+    _loaded_translation_dicts[memory_key] = translation_dict
+    return translation_dict
+
+
+def clear_loaded_translation_dicts():
+    """
+    This function, clears the in-memory translation dictionaries (the on-disk cache is kept)
+    :return: -
+    """
+    _loaded_translation_dicts.clear()
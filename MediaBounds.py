@@ -0,0 +1,50 @@
+"""
+MediaBounds
+This code, keeps the helpers shared by the bounds makers of the experiments (KnockOutBoundsMaker and
+SourceUtilBoundsMaker): the base (internal + exchange) lower and upper bounds vectors of each medium, and the
+DataFrame export of a (reactions x experiments) bounds matrix.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def make_bounds_dataframe(reactions_ids: list, bounds_matrix, columns_names: list):
+    """
+    :param reactions_ids: List of the reactions ids (rows of the bounds_matrix)
+    :param bounds_matrix: A (reactions x experiments) numpy array
+    :param columns_names: List of the experiments columns names
+    :return: A DataFrame with the 'ID' column followed by the experiments columns
+    """
+    bounds_df = pd.DataFrame(bounds_matrix, columns=columns_names)
+    bounds_df.insert(0, 'ID', reactions_ids)
+    return bounds_df
+
+
+def make_media_base_bounds(internal_rxns_df, media_dict: dict, exchanges_ids_list: list = None):
+    """
+    This function, makes the base (internal + exchange) lower and upper bounds vectors of each medium.
+    :param internal_rxns_df: The DataFrame of the internal reactions bounds ('ID', 'Lower Bound', 'Upper Bound')
+    :param media_dict: A dictionary in the format of {'media_name': medium bounds DataFrame}
+    :param exchanges_ids_list: The list of the exchange reactions ids, if already known, or None to take it from the
+                               first medium
+    :return: all_reactions_ids: List of the internal reactions ids followed by the exchange reactions ids
+             exchanges_ids_list: List of the exchange reactions ids (same in all the media)
+             media_base_bounds: A dict in the format of {'media_name': (lower bounds vector, upper bounds vector)}
+    """
+    media_base_bounds = {}
+    internal_lower_bounds = internal_rxns_df['Lower Bound'].to_numpy(dtype=float)
+    internal_upper_bounds = internal_rxns_df['Upper Bound'].to_numpy(dtype=float)
+    for medium_name, medium_bounds in media_dict.items():
+        if exchanges_ids_list is None:
+            exchanges_ids_list = medium_bounds['ID'].tolist()
+        elif medium_bounds['ID'].tolist() != exchanges_ids_list:
+            print("Exchange reactions of media are not Identical")
+            raise Exception
+        lower_bounds_vector = np.concatenate([internal_lower_bounds,
+                                              medium_bounds['Lower Bound'].to_numpy(dtype=float)])
+        upper_bounds_vector = np.concatenate([internal_upper_bounds,
+                                              medium_bounds['Upper Bound'].to_numpy(dtype=float)])
+        media_base_bounds[medium_name] = (lower_bounds_vector, upper_bounds_vector)
+    all_reactions_ids = internal_rxns_df['ID'].tolist() + exchanges_ids_list
+    return all_reactions_ids, exchanges_ids_list, media_base_bounds
@@ -0,0 +1,236 @@
+"""
+DuplicateCollapser
+This code, collapses the duplicate reactions of a final data folder (e.g. the reactions of a merged template with the
+same stoichiometry under different IDs), and saves a reduced final data folder as NetworkCompressor does, plus
+"reaction_aliases.json", the alias table of the collapsed reactions.
+
+Each stoichiometry column is normalized by its first coefficient, so that the hash of the normalized column is
+invariant to scaling, and a reversed duplicate (e.g. A -> B and B -> A) gets the same hash with a negative scale.
+The reactions of a hash are checked coefficient by coefficient, and then split by their bounds: only the reactions
+whose scaled bounds (c_i [L_i, U_i], where c_i is the scale of the member i relative to the first member, the
+representative) are identical in all the growth and non-growth columns are collapsed. The flux of the collapsed
+reaction is sum_i c_i v_i, and its bounds in each column are n times the representative's bounds, for a group of n
+members. The collapse is exact: the flux of a collapsed reaction is expanded as an even share of c_i v_i for each
+member, which is within the member's own bounds in every column (see ExpansionMap.original_shares).
+
+To keep the growth objective exact, only duplicates with the same penalty weight per unit of the collapsed flux are
+collapsed (e.g. a non-existing duplicate of an existing reaction is kept as a separate reaction), and the protected
+reactions and the reactions whose bounds exclude a zero flux in any column are never collapsed. A collapsed group of
+non-existing reactions would count as all its members in the "cardinality" growth objective (its flux is shared by all
+of them), while the uncollapsed problem pays only for the members it uses, so the non-existing duplicates are not
+collapsed for a folder solved with the "cardinality" objective (see the cardinality parameter).
+"""
+
+import json
+import os
+import numpy as np
+import scipy.sparse
+from NetworkCompressor import NetworkCompressor
+
+HASH_DECIMALS = 9
+ALIASES_FILENAME = 'reaction_aliases.json'
+
+
+class DuplicateCollapser(NetworkCompressor):
+    def __init__(self,
+                 final_data_folder: str,
+                 biomass_template_id: str,
+                 protected_reactions_ids: list = None,
+                 columns_chunk_size: int = 1024,
+                 cardinality: bool = False):
+        """
+        :param final_data_folder: The folder of the final data (see BiomassFinalizer.save_final_data), or a reduced one
+        :param biomass_template_id: The ID for the biomass reaction in the template
+        :param protected_reactions_ids: IDs of other reactions to be kept out of the collapsed reactions
+        :param columns_chunk_size: Number of bounds columns processed at a time
+        :param cardinality: Whether the reduced folder is to be solved with the "cardinality" growth objective, so that
+                            only the duplicates of the existing reactions are collapsed
+        """
+        super().__init__(final_data_folder=final_data_folder, biomass_template_id=biomass_template_id,
+                         protected_reactions_ids=protected_reactions_ids, columns_chunk_size=columns_chunk_size)
+        self.cardinality = cardinality
+        # ############ The collapse: input reactions x collapsed reactions, with the members' scales ############
+        self.members_matrix = scipy.sparse.identity(len(self.reactions_ids), format='csc')
+        self.shares = np.ones(len(self.reactions_ids), dtype=np.int64)
+        self.aliases = {}
+
+    def get_column_key(self, rxn_index: int, penalty_weights):
+        """
+        :param rxn_index: The index of an input reaction
+        :param penalty_weights: The penalty weights of the input reactions
+        :return: (the hash key of the reaction's normalized column, the scale of its column), or (None, None) for an
+                 empty column
+        """
+        start, end = self.stoichiometry_matrix.indptr[rxn_index:rxn_index + 2]
+        if start == end:
+            return None, None
+        coefficients = self.stoichiometry_matrix.data[start:end]
+        scale = coefficients[0]
+        normalized_coefficients = np.round(coefficients / scale, HASH_DECIMALS) + 0.0
+        unit_weight = np.round(penalty_weights[rxn_index] / abs(scale), HASH_DECIMALS) + 0.0
+        key = hash((self.stoichiometry_matrix.indices[start:end].tobytes(), normalized_coefficients.tobytes(),
+                    unit_weight))
+        return key, scale
+
+    def is_duplicate(self, rxn_index: int, scale: float, representative_index: int, representative_scale: float):
+        """
+        :param rxn_index: The index of an input reaction
+        :param scale: The scale of its column
+        :param representative_index: The index of the representative of a duplicate group
+        :param representative_scale: The scale of the representative's column
+        :return: Whether the columns of the two input reactions are equal, up to their scales
+        """
+        first_column = self.stoichiometry_matrix[:, rxn_index] / scale
+        second_column = self.stoichiometry_matrix[:, representative_index] / representative_scale
+        return abs(first_column - second_column).max() <= 10.0 ** -HASH_DECIMALS
+
+    def find_duplicate_groups(self) -> list:
+        """
+        :return: List of the duplicate groups, each a list of (input reaction index, scale relative to the
+                 representative) pairs, starting with the representative
+        """
+        self.stoichiometry_matrix.sort_indices()
+        penalty_weights = self.input_expansion_map.get_penalty_weights()
+        is_candidate = ~self.is_protected & self.is_zero_feasible
+        if self.cardinality:
+            is_candidate &= penalty_weights == 0
+        buckets = {}
+        for rxn_index in np.flatnonzero(is_candidate):
+            key, scale = self.get_column_key(rxn_index, penalty_weights)
+            if key is None:
+                continue
+            # A bucket may hold more than one group when the keys collide
+            bucket_groups = buckets.setdefault(key, [])
+            for group in bucket_groups:
+                representative_index, representative_scale = group[0]
+                if self.is_duplicate(rxn_index, scale, representative_index, representative_scale):
+                    group.append((rxn_index, scale))
+                    break
+            else:
+                bucket_groups.append([(rxn_index, scale)])
+        duplicate_groups = []
+        for bucket_groups in buckets.values():
+            for group in bucket_groups:
+                if len(group) > 1:
+                    representative_scale = group[0][1]
+                    duplicate_groups.append([(rxn_index, scale / representative_scale) for rxn_index, scale in group])
+        return self.split_groups_by_bounds(duplicate_groups)
+
+    def split_groups_by_bounds(self, duplicate_groups: list) -> list:
+        """
+        :param duplicate_groups: List of the duplicate groups of the stoichiometry (see find_duplicate_groups)
+        :return: The duplicate groups split so that the scaled bounds of the members of a group are identical in all
+                 the growth and non-growth columns, each group starting with its representative
+        """
+        for lower_name, upper_name in [('L', 'U'), ('ng_L', 'ng_U')]:
+            if lower_name not in self.bounds:
+                continue
+            num_columns = self.bounds[lower_name].get_num_columns()
+            for chunk_start in range(0, num_columns, self.columns_chunk_size):
+                chunk_columns = np.arange(chunk_start, min(chunk_start + self.columns_chunk_size, num_columns))
+                chunk_lower = self.bounds[lower_name].get_columns(chunk_columns)
+                chunk_upper = self.bounds[upper_name].get_columns(chunk_columns)
+                split_groups = []
+                for duplicate_group in duplicate_groups:
+                    members = np.array([rxn_index for rxn_index, _ in duplicate_group])
+                    scales = np.array([scale for _, scale in duplicate_group])[:, np.newaxis]
+                    # A negative scale swaps the lower and upper bounds
+                    scaled_lower = np.where(scales > 0, chunk_lower[members], chunk_upper[members]) * scales
+                    scaled_upper = np.where(scales > 0, chunk_upper[members], chunk_lower[members]) * scales
+                    scaled_bounds = np.round(np.hstack([scaled_lower, scaled_upper]), HASH_DECIMALS) + 0.0
+                    _, bounds_classes = np.unique(scaled_bounds, axis=0, return_inverse=True)
+                    subgroups = {}
+                    for member, bounds_class in zip(duplicate_group, np.ravel(bounds_classes)):
+                        subgroups.setdefault(bounds_class, []).append(member)
+                    for subgroup in subgroups.values():
+                        if len(subgroup) > 1:
+                            representative_scale = subgroup[0][1]
+                            split_groups.append([(rxn_index, scale / representative_scale)
+                                                 for rxn_index, scale in subgroup])
+                duplicate_groups = split_groups
+        return sorted(duplicate_groups)
+
+    def compress(self) -> dict:
+        """
+        This method, collapses the duplicate reactions into their representatives
+        :return: A report with the numbers of the reactions before and after the collapse, and of the duplicate groups
+        """
+        duplicate_groups = self.find_duplicate_groups()
+        targets = np.arange(len(self.reactions_ids))
+        scales = np.ones(len(self.reactions_ids))
+        is_kept = np.ones(len(self.reactions_ids), dtype=bool)
+        self.shares = np.ones(len(self.reactions_ids), dtype=np.int64)
+        self.aliases = {}
+        for duplicate_group in duplicate_groups:
+            representative_index = duplicate_group[0][0]
+            self.shares[representative_index] = len(duplicate_group)
+            for rxn_index, scale in duplicate_group[1:]:
+                targets[rxn_index] = representative_index
+                scales[rxn_index] = scale
+                is_kept[rxn_index] = False
+                self.shares[rxn_index] = len(duplicate_group)
+            self.aliases[self.reactions_ids[representative_index]] = {self.reactions_ids[rxn_index]: float(scale)
+                                                                      for rxn_index, scale in duplicate_group[1:]}
+        new_indexes = np.full(len(self.reactions_ids), -1, dtype=np.int64)
+        new_indexes[is_kept] = np.arange(np.count_nonzero(is_kept))
+        self.members_matrix = scipy.sparse.csc_matrix((scales, (np.arange(len(self.reactions_ids)),
+                                                                new_indexes[targets])),
+                                                      shape=(len(self.reactions_ids), np.count_nonzero(is_kept)))
+        # Each member gets an even share of the collapsed flux: c_i v_i = w / n
+        self.reduction_matrix = scipy.sparse.csc_matrix((1.0 / (self.shares * scales),
+                                                         (np.arange(len(self.reactions_ids)), new_indexes[targets])),
+                                                        shape=self.members_matrix.shape)
+        self.groups_ids = [rxn_id for rxn_id, kept in zip(self.reactions_ids, is_kept) if kept]
+        self.groups_protected = self.is_protected[is_kept]
+        reduced_matrix = self.get_reduced_stoichiometry_matrix()
+        self.kept_metabolites[np.flatnonzero(self.kept_metabolites)[np.diff(reduced_matrix.indptr) == 0]] = False
+        return {'reactions': len(self.reactions_ids),
+                'duplicate_groups': len(duplicate_groups),
+                'reduced_reactions': len(self.groups_ids)}
+
+    def make_reduced_bounds(self, bounds_lower, bounds_upper) -> tuple:
+        """
+        :param bounds_lower: BoundsColumns of the lower bounds of the input reactions
+        :param bounds_upper: BoundsColumns of the upper bounds of the input reactions
+        :return: (lower bounds, upper bounds) of the collapsed reactions, as dense (reduced reactions x columns)
+                 arrays of the sums of the members' (identical) scaled bounds
+        """
+        positive_scales = scipy.sparse.csr_matrix(self.members_matrix.T.maximum(0))
+        negative_scales = scipy.sparse.csr_matrix(self.members_matrix.T.minimum(0))
+        num_columns = bounds_lower.get_num_columns()
+        reduced_lower = np.empty((len(self.groups_ids), num_columns))
+        reduced_upper = np.empty((len(self.groups_ids), num_columns))
+        for chunk_start in range(0, num_columns, self.columns_chunk_size):
+            chunk_columns = np.arange(chunk_start, min(chunk_start + self.columns_chunk_size, num_columns))
+            chunk_lower = bounds_lower.get_columns(chunk_columns)
+            chunk_upper = bounds_upper.get_columns(chunk_columns)
+            reduced_lower[:, chunk_columns] = positive_scales @ chunk_lower + negative_scales @ chunk_upper
+            reduced_upper[:, chunk_columns] = positive_scales @ chunk_upper + negative_scales @ chunk_lower
+        return reduced_lower, reduced_upper
+
+    def make_expansion_map(self):
+        """
+        :return: The ExpansionMap from the template reactions to the collapsed reactions, with the shares of the
+                 collapsed template reactions
+        """
+        return self.input_expansion_map.compose(self.reduction_matrix, reduced_shares=self.shares)
+
+    def save_compressed_data(self, folder_to_save: str, file_format: str = 'csv'):
+        """
+        This method, saves the reduced final data folder (see NetworkCompressor.save_compressed_data), and the alias
+        table, in the format of {representative ID: {alias ID: scale of the alias}}
+        :param folder_to_save: The folder to save the reduced final data
+        :param file_format: "csv" for .csv bounds, or "binary" for BoundsMatrixStore folders (.bounds)
+        :return: -
+        """
+        super().save_compressed_data(folder_to_save=folder_to_save, file_format=file_format)
+        with open(os.path.join(folder_to_save, ALIASES_FILENAME), 'w') as file:
+            json.dump(self.aliases, file, indent=2)
+
+
+if __name__ == '__main__':
+    collapser = DuplicateCollapser(final_data_folder="../Data/Palsson B.Subtilis Reconstruction/Microbial Final Data/",
+                                   biomass_template_id="Growth")
+    print(collapser.compress())
+    collapser.save_compressed_data(
+        folder_to_save="../Data/Palsson B.Subtilis Reconstruction/Microbial Collapsed Final Data/")
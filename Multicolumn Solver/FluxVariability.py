@@ -0,0 +1,319 @@
+"""
+FluxVariability
+This code, runs flux variability analysis (FVA) in all the columns of a MulticolumnSolver: the minimum and maximum
+flux of each requested reaction in each column (S v = 0, L_j <= v <= U_j), to check the reconstructed solutions.
+
+Each column keeps one LP model alive (see IncrementalSolver): the 2 x (requested reactions) LPs of a column only swap
+the objective, starting from the previous LP's basis, and the next column (in the bound deltas order) only changes the
+bounds deltas. The columns can be split into chunks solved by a pool of worker processes, which share the stoichiometry
+matrix, the bounds, and the result array (see ParallelSolver).
+
+The ranges are kept as one compact (requested reactions x columns x 2) array of [minimum, maximum] fluxes, with the
+growth columns first (the x1..xN order of final_csv.csv). The ranges of an infeasible column are NaN. For a reduced
+final data folder, the ranges are reported for the template reactions, as the expanded fluxes are (see ExpansionMap):
+a removed reaction carries no flux, and the ranges of a reaction collapsed with its duplicates (see DuplicateCollapser)
+are NaN, since only the sum of the duplicates' fluxes is solved.
+"""
+
+import os
+import numpy as np
+import scipy.sparse
+from concurrent.futures import ProcessPoolExecutor
+from IncrementalSolver import IncrementalProblemSolver, order_columns_by_deltas
+from MulticolumnSolver import SplitFluxProblem
+from ParallelSolver import attach_shared_array, create_shared_array, fill_shared_bounds
+
+# The state of a worker process, filled by initialize_variability_worker
+_worker_state = {}
+
+
+def solve_column_ranges(problem_solver, lower_bounds, upper_bounds, reactions_indexes):
+    """
+    :param problem_solver: An IncrementalProblemSolver of a SplitFluxProblem without penalty weights
+    :param lower_bounds: The lower bounds of the fluxes in the column
+    :param upper_bounds: The upper bounds of the fluxes in the column
+    :param reactions_indexes: Indexes of the reactions to be minimized and maximized
+    :return: A (reactions x 2) array of the [minimum, maximum] fluxes, NaN if the column is infeasible
+    """
+    lower_bounds = np.asarray(lower_bounds, dtype=np.float64)
+    upper_bounds = np.asarray(upper_bounds, dtype=np.float64)
+    column_ranges = np.full((len(reactions_indexes), 2), np.nan)
+    objective_vector = np.zeros(len(lower_bounds))
+    # The fluxes of the solved LPs that reach the lower or upper bounds of the reactions
+    is_at_lower = np.zeros(len(lower_bounds), dtype=bool)
+    is_at_upper = np.zeros(len(lower_bounds), dtype=bool)
+    is_checked = False
+    for range_index, rxn_index in enumerate(reactions_indexes):
+        if lower_bounds[rxn_index] == upper_bounds[rxn_index]:
+            # A fixed flux needs no LP, unless the column is infeasible
+            column_ranges[range_index] = lower_bounds[rxn_index]
+            continue
+        for bound_index, objective_sign in enumerate([1.0, -1.0]):
+            # A bound reached by the fluxes of a previous LP needs no LP
+            if bound_index == 0 and is_at_lower[rxn_index]:
+                column_ranges[range_index, bound_index] = lower_bounds[rxn_index]
+                continue
+            if bound_index == 1 and is_at_upper[rxn_index]:
+                column_ranges[range_index, bound_index] = upper_bounds[rxn_index]
+                continue
+            objective_vector[rxn_index] = objective_sign
+            problem_solver.set_objective(objective_vector=objective_vector)
+            status, objective_value, fluxes, _ = problem_solver.solve(lower_bounds, upper_bounds)
+            objective_vector[rxn_index] = 0.0
+            is_checked = True
+            if status == 'infeasible':
+                column_ranges[:] = np.nan
+                return column_ranges
+            if status == 'unbounded':
+                column_ranges[range_index, bound_index] = -objective_sign * np.inf
+            elif objective_value is not None:
+                column_ranges[range_index, bound_index] = objective_sign * objective_value
+            if status == 'optimal':
+                is_at_lower |= fluxes <= lower_bounds
+                is_at_upper |= fluxes >= upper_bounds
+    if not is_checked:
+        # All the requested fluxes are fixed, so the feasibility of the column is checked once
+        problem_solver.set_objective(objective_vector=objective_vector)
+        if problem_solver.solve(lower_bounds, upper_bounds)[0] == 'infeasible':
+            column_ranges[:] = np.nan
+    return column_ranges
+
+
+class FluxVariability:
+    def __init__(self, solver, reactions_ids: list = None):
+        """
+        :param solver: A MulticolumnSolver
+        :param reactions_ids: IDs of the reactions to be analyzed (template IDs for a reduced final data folder),
+                              all the reactions if None
+        """
+        self.solver = solver
+        if reactions_ids is None:
+            reactions_ids = solver.output_reactions_ids
+        self.reactions_ids = list(reactions_ids)
+        self.columns_names = list(solver.growth_lower_bounds.columns_names)
+        if solver.non_growth_lower_bounds is not None:
+            self.columns_names += solver.non_growth_lower_bounds.columns_names
+        # ############ The requested reactions in terms of the solved reactions ############
+        self.solved_indexes = None
+        self.requested_positions = None
+        self.requested_ratios = None
+        self.is_shared = None
+        self.make_solved_reactions()
+        self.ranges = np.full((len(self.reactions_ids), len(self.columns_names), 2), np.nan)
+
+    def make_solved_reactions(self):
+        """
+        This method, maps each requested reaction to a solved reaction and its ratio (v_requested = ratio * v_solved)
+        :return: -, filling self.solved_indexes (the unique solved reactions), self.requested_positions (the position
+                 of each requested reaction in self.solved_indexes, -1 for a removed or collapsed reaction),
+                 self.requested_ratios, and self.is_shared (the flags of the reactions collapsed with duplicates)
+        """
+        requested_indexes = np.full(len(self.reactions_ids), -1, dtype=np.int64)
+        self.requested_ratios = np.ones(len(self.reactions_ids))
+        self.is_shared = np.zeros(len(self.reactions_ids), dtype=bool)
+        expansion_map = self.solver.expansion_map
+        if expansion_map is None:
+            requested_indexes[:] = [self.solver.reactions_index_map[rxn_id] for rxn_id in self.reactions_ids]
+        else:
+            original_indexes = {rxn_id: rxn_index for rxn_index, rxn_id in
+                                enumerate(expansion_map.original_reactions_ids)}
+            expansion_matrix = expansion_map.expansion_matrix
+            for requested_index, rxn_id in enumerate(self.reactions_ids):
+                row_index = original_indexes[rxn_id]
+                start, end = expansion_matrix.indptr[row_index:row_index + 2]
+                # The flux of a collapsed reaction is only an even share of its group's flux
+                if expansion_map.original_shares[row_index] > 1:
+                    self.is_shared[requested_index] = True
+                elif start < end:
+                    requested_indexes[requested_index] = expansion_matrix.indices[start]
+                    self.requested_ratios[requested_index] = expansion_matrix.data[start]
+        if not (requested_indexes >= 0).any():
+            # With no solved reaction, the feasibility of the columns (and so the ranges) would be left unknown
+            raise ValueError("None of the requested reactions is solved (they are all removed or collapsed with "
+                             "duplicates), so no column can be analyzed: " + str(self.reactions_ids))
+        self.solved_indexes, solved_positions = np.unique(requested_indexes[requested_indexes >= 0],
+                                                          return_inverse=True)
+        self.requested_positions = np.full(len(self.reactions_ids), -1, dtype=np.int64)
+        self.requested_positions[requested_indexes >= 0] = solved_positions
+
+    def make_problem(self):
+        """
+        :return: The SplitFluxProblem of the FVA LPs, without penalty weights
+        """
+        return SplitFluxProblem(stoichiometry_matrix=self.solver.stoichiometry_matrix)
+
+    def get_columns_order(self):
+        """
+        :return: The order of solving all the columns (growth columns first), keeping the bound deltas small
+        """
+        num_growth_columns, _ = self.solver.get_num_columns()
+        columns_orders = [order_columns_by_deltas(self.solver.growth_lower_bounds, self.solver.growth_upper_bounds)]
+        if self.solver.non_growth_lower_bounds is not None:
+            columns_orders.append(num_growth_columns +
+                                  order_columns_by_deltas(self.solver.non_growth_lower_bounds,
+                                                          self.solver.non_growth_upper_bounds))
+        return np.concatenate(columns_orders)
+
+    def set_solved_ranges(self, solved_ranges):
+        """
+        This method, fills self.ranges from the ranges of the solved reactions
+        :param solved_ranges: A (solved reactions x columns x 2) array of the [minimum, maximum] fluxes
+        :return: -
+        """
+        is_solved = self.requested_positions >= 0
+        ratios = self.requested_ratios[is_solved][:, np.newaxis, np.newaxis]
+        requested_ranges = solved_ranges[self.requested_positions[is_solved]] * ratios
+        # A negative ratio swaps the minimum and maximum fluxes
+        requested_ranges = np.where(ratios < 0, requested_ranges[:, :, ::-1], requested_ranges)
+        self.ranges[is_solved] = requested_ranges
+        # The removed reactions carry no flux in the feasible columns, and the collapsed reactions are left NaN
+        is_feasible = ~np.isnan(solved_ranges).all(axis=(0, 2))
+        self.ranges[np.ix_(~is_solved & ~self.is_shared, is_feasible)] = 0.0
+
+    def get_column_bounds(self, column_index: int) -> tuple:
+        """
+        :param column_index: The index of a column (growth columns first)
+        :return: (lower bounds, upper bounds) of the column
+        """
+        num_growth_columns, _ = self.solver.get_num_columns()
+        if column_index < num_growth_columns:
+            return (self.solver.growth_lower_bounds.get_column(column_index),
+                    self.solver.growth_upper_bounds.get_column(column_index))
+        return (self.solver.non_growth_lower_bounds.get_column(column_index - num_growth_columns),
+                self.solver.non_growth_upper_bounds.get_column(column_index - num_growth_columns))
+
+    def analyze_all_columns(self, reorder_columns: bool = True):
+        """
+        This method, runs the FVA of all the columns in this process
+        :param reorder_columns: Whether to solve the columns in the bound deltas order
+        :return: -, filling self.ranges
+        """
+        columns_order = np.arange(len(self.columns_names))
+        if reorder_columns:
+            columns_order = self.get_columns_order()
+        problem_solver = IncrementalProblemSolver(problem=self.make_problem(),
+                                                  solver_options=self.solver.solver_options)
+        solved_ranges = np.full((len(self.solved_indexes), len(self.columns_names), 2), np.nan)
+        for column_index in columns_order:
+            lower_bounds, upper_bounds = self.get_column_bounds(column_index)
+            solved_ranges[:, column_index] = solve_column_ranges(problem_solver, lower_bounds, upper_bounds,
+                                                                 self.solved_indexes)
+        self.set_solved_ranges(solved_ranges)
+
+    def save(self, filepath: str):
+        """
+        :param filepath: The path to save the ranges as a .npz file (ranges, reactions_ids, columns_names)
+        :return: -
+        """
+        np.savez_compressed(filepath, ranges=self.ranges,
+                            reactions_ids=np.array(self.reactions_ids, dtype=str),
+                            columns_names=np.array(self.columns_names, dtype=str))
+
+    @staticmethod
+    def load(filepath: str) -> tuple:
+        """
+        :param filepath: The path of a .npz file saved by FluxVariability.save
+        :return: (the (reactions x columns x 2) ranges, reactions ids, columns names)
+        """
+        with np.load(filepath, allow_pickle=False) as npz_file:
+            return npz_file['ranges'], npz_file['reactions_ids'].tolist(), npz_file['columns_names'].tolist()
+
+
+def initialize_variability_worker(descriptors: dict, stoichiometry_shape: tuple, solved_indexes, solver_options):
+    """
+    This function, attaches a worker to the shared arrays, and makes its live FVA model
+    :param descriptors: The descriptors of the shared arrays, in the format of {array name: descriptor}
+    :param stoichiometry_shape: The shape of the stoichiometry matrix
+    :param solved_indexes: Indexes of the reactions to be minimized and maximized
+    :param solver_options: Options of the solver (see IncrementalProblemSolver)
+    :return: -
+    """
+    shared_arrays = {}
+    for array_name, descriptor in descriptors.items():
+        shared_block, shared_array = attach_shared_array(descriptor)
+        # The blocks are kept referenced for the lifetime of the worker
+        _worker_state.setdefault('shared_blocks', []).append(shared_block)
+        shared_arrays[array_name] = shared_array
+    stoichiometry_matrix = scipy.sparse.csr_matrix((shared_arrays['stoichiometry_data'],
+                                                    shared_arrays['stoichiometry_indices'],
+                                                    shared_arrays['stoichiometry_indptr']),
+                                                   shape=stoichiometry_shape)
+    _worker_state['problem_solver'] = IncrementalProblemSolver(
+        problem=SplitFluxProblem(stoichiometry_matrix=stoichiometry_matrix), solver_options=solver_options)
+    _worker_state['solved_indexes'] = solved_indexes
+    _worker_state['lower_bounds'] = shared_arrays['lower_bounds']
+    _worker_state['upper_bounds'] = shared_arrays['upper_bounds']
+    _worker_state['ranges'] = shared_arrays['ranges']
+
+
+def analyze_columns_chunk(columns_indexes: list) -> int:
+    """
+    This function, runs the FVA of a chunk of columns in a worker, and writes their ranges into the shared array
+    :param columns_indexes: Indexes of the columns (growth columns first), in the order of solving them
+    :return: Number of the analyzed columns
+    """
+    for column_index in columns_indexes:
+        _worker_state['ranges'][:, column_index] = solve_column_ranges(
+            _worker_state['problem_solver'], _worker_state['lower_bounds'][:, column_index],
+            _worker_state['upper_bounds'][:, column_index], _worker_state['solved_indexes'])
+    return len(columns_indexes)
+
+
+def analyze_all_columns_in_parallel(variability, num_workers: int = None, chunk_num_columns: int = 16):
+    """
+    This function, runs the FVA of all the columns with a pool of worker processes. Each chunk holds consecutive
+    columns of the bound deltas order, so that the columns of a chunk are warm-started from each other.
+    :param variability: A FluxVariability
+    :param num_workers: Number of worker processes, os.cpu_count() if None
+    :param chunk_num_columns: Number of columns in each scheduled task
+    :return: -, filling variability.ranges
+    """
+    if num_workers is None:
+        num_workers = os.cpu_count()
+    solver = variability.solver
+    num_columns = len(variability.columns_names)
+    stoichiometry_matrix = scipy.sparse.csr_matrix(solver.stoichiometry_matrix)
+    shared_blocks = []
+    shared_arrays = {}
+    descriptors = {}
+    try:
+        for array_name, source_array in [('stoichiometry_data', stoichiometry_matrix.data),
+                                         ('stoichiometry_indices', stoichiometry_matrix.indices),
+                                         ('stoichiometry_indptr', stoichiometry_matrix.indptr)]:
+            shared_block, shared_arrays[array_name], descriptors[array_name] = create_shared_array(
+                source_array.shape, source_array.dtype)
+            shared_blocks.append(shared_block)
+            shared_arrays[array_name][:] = source_array
+        for array_name, shape in [('lower_bounds', (len(solver.reactions_ids), num_columns)),
+                                  ('upper_bounds', (len(solver.reactions_ids), num_columns)),
+                                  ('ranges', (len(variability.solved_indexes), num_columns, 2))]:
+            shared_block, shared_arrays[array_name], descriptors[array_name] = create_shared_array(shape)
+            shared_blocks.append(shared_block)
+        shared_arrays['ranges'][:] = np.nan
+        fill_shared_bounds(solver, shared_arrays['lower_bounds'], shared_arrays['upper_bounds'], chunk_num_columns)
+        # ########################## Solving ##########################
+        columns_order = variability.get_columns_order().tolist()
+        columns_chunks = [columns_order[chunk_start:chunk_start + chunk_num_columns]
+                          for chunk_start in range(0, num_columns, chunk_num_columns)]
+        with ProcessPoolExecutor(max_workers=num_workers, initializer=initialize_variability_worker,
+                                 initargs=(descriptors, stoichiometry_matrix.shape, variability.solved_indexes,
+                                           solver.solver_options)) as executor:
+            for _ in executor.map(analyze_columns_chunk, columns_chunks):
+                pass
+        variability.set_solved_ranges(shared_arrays['ranges'].copy())
+    finally:
+        # The arrays on the blocks should be released before closing them
+        shared_arrays.clear()
+        for shared_block in shared_blocks:
+            shared_block.close()
+            shared_block.unlink()
+
+
+if __name__ == '__main__':
+    from MulticolumnSolver import MulticolumnSolver
+    solver = MulticolumnSolver(final_data_folder="../Data/Palsson B.Subtilis Reconstruction/Microbial Final Data/",
+                               biomass_template_id="Growth",
+                               biomass_growth_threshold=1e-1)
+    variability = FluxVariability(solver=solver, reactions_ids=["Growth"])
+    analyze_all_columns_in_parallel(variability)
+    variability.save(filepath="../Data/Palsson B.Subtilis Reconstruction/Results/flux_variability.npz")
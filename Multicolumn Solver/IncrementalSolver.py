@@ -0,0 +1,265 @@
+"""
+IncrementalSolver
+This code, solves the columns of a MulticolumnSolver incrementally: one LP model is kept alive for the growth columns
+(and one for the non-growth columns), and only the bounds that differ from the previous column are changed, so that
+HiGHS restarts the simplex from the previous basis instead of solving each column from scratch.
+
+Consecutive columns are ordered to keep these bound deltas small: the columns' deviations from the typical bounds
+(the row-wise median) are sorted from the most common ones (e.g. the medium exchanges) to the rarest ones (e.g. the
+knocked-out reactions), and the columns are sorted lexicographically by them, so that the columns of a medium are
+solved together. The deviations are collected chunk by chunk as sparse arrays, and each column's bounds are fetched
+only when the column is solved, so the bounds are never materialized as a whole.
+
+The warm-started path needs the optional highspy package. Without it (and for the MILP "cardinality" objective),
+each column falls back to a cold solve through scipy.optimize.milp.
+"""
+
+import time
+import numpy as np
+
+try:
+    import highspy
+except ImportError:
+    highspy = None
+
+
+def order_columns_by_deltas(bounds_lower, bounds_upper, columns_chunk_size: int = 1024):
+    """
+    :param bounds_lower: The BoundsColumns of the lower bounds (see MulticolumnSolver.BoundsColumns)
+    :param bounds_upper: The BoundsColumns of the upper bounds
+    :param columns_chunk_size: Number of bounds columns materialized at a time
+    :return: The order of the columns (an array of column indexes), keeping the bound deltas between consecutive
+             columns small
+    """
+    num_columns = bounds_lower.get_num_columns()
+    if num_columns == 0:
+        return np.zeros(0, dtype=np.int64)
+    # The typical bounds are the row-wise median of up to columns_chunk_size evenly spaced columns (all the columns
+    # if they fit in a chunk)
+    sample_columns = np.unique(np.linspace(0, num_columns - 1, min(num_columns, columns_chunk_size)).astype(np.int64))
+    reference_lower = np.median(bounds_lower.get_columns(sample_columns), axis=1)[:, np.newaxis]
+    reference_upper = np.median(bounds_upper.get_columns(sample_columns), axis=1)[:, np.newaxis]
+    # The deviations from the typical bounds, as (column, row, lower, upper) COO arrays
+    deviations_parts = []
+    for chunk_start in range(0, num_columns, columns_chunk_size):
+        chunk_columns = np.arange(chunk_start, min(chunk_start + columns_chunk_size, num_columns))
+        chunk_lower = bounds_lower.get_columns(chunk_columns)
+        chunk_upper = bounds_upper.get_columns(chunk_columns)
+        rows, columns = np.nonzero((chunk_lower != reference_lower) | (chunk_upper != reference_upper))
+        deviations_parts.append((chunk_columns[columns], np.column_stack([rows, chunk_lower[rows, columns],
+                                                                           chunk_upper[rows, columns]])))
+    deviations_columns = np.concatenate([columns for columns, _ in deviations_parts])
+    deviations = np.concatenate([deviations for _, deviations in deviations_parts])
+    # Each distinct (row, lower, upper) deviation is ranked from the most common one to the rarest one
+    deviations_order = np.lexsort((deviations[:, 2], deviations[:, 1], deviations[:, 0]))
+    sorted_deviations = deviations[deviations_order]
+    is_distinct = np.ones(len(deviations), dtype=bool)
+    is_distinct[1:] = (sorted_deviations[1:] != sorted_deviations[:-1]).any(axis=1)
+    deviations_ids = np.empty(len(deviations), dtype=np.int64)
+    deviations_ids[deviations_order] = np.cumsum(is_distinct) - 1
+    deviations_counts = np.bincount(deviations_ids)
+    deviations_ranks = np.empty(len(deviations_counts), dtype=np.int64)
+    deviations_ranks[np.lexsort((np.arange(len(deviations_counts)), -deviations_counts))] = \
+        np.arange(len(deviations_counts))
+    # The key of a column is its deviations from the most common one to the rarest one, and the columns are sorted
+    # lexicographically by them. The ids of the distinct deviations keep the (row, lower, upper) order.
+    keys_order = np.lexsort((deviations_ranks[deviations_ids], deviations_columns))
+    sorted_ids = deviations_ids[keys_order]
+    keys_starts = np.searchsorted(deviations_columns[keys_order], np.arange(num_columns + 1))
+    columns_keys = [sorted_ids[keys_starts[column_index]:keys_starts[column_index + 1]].tolist()
+                    for column_index in range(num_columns)]
+    return np.array(sorted(range(num_columns), key=columns_keys.__getitem__), dtype=np.int64)
+
+
+def count_changed_bounds(lower_bounds, upper_bounds, columns_order) -> int:
+    """
+    :param lower_bounds: A dense (reactions x columns) lower bounds matrix
+    :param upper_bounds: A dense (reactions x columns) upper bounds matrix
+    :param columns_order: The order of solving the columns
+    :return: The total number of the bounds changed between consecutive columns in the columns_order
+    """
+    ordered_lower = lower_bounds[:, columns_order]
+    ordered_upper = upper_bounds[:, columns_order]
+    return int(np.count_nonzero((ordered_lower[:, 1:] != ordered_lower[:, :-1]) |
+                                (ordered_upper[:, 1:] != ordered_upper[:, :-1])))
+
+
+class IncrementalProblemSolver:
+    def __init__(self, problem, solver_options: dict = None):
+        """
+        :param problem: A MulticolumnSolver.SplitFluxProblem
+        :param solver_options: Options of scipy.optimize.milp. time_limit, presolve, and disp are passed to highspy.
+        """
+        self.problem = problem
+        self.solver_options = solver_options
+        self.is_incremental = highspy is not None and not problem.cardinality
+        self.highs = None
+        self.variables_lower = None
+        self.variables_upper = None
+        self.objective_vector = None
+        self.penalty_weights = None
+
+    def make_highs_model(self, variables_lower, variables_upper):
+        """
+        This method, makes the highspy model of self.problem with the bounds of the first column
+        :param variables_lower: The lower bounds of the variables
+        :param variables_upper: The upper bounds of the variables
+        :return: -
+        """
+        equality_matrix = self.problem.equality_matrix
+        self.highs = highspy.Highs()
+        solver_options = self.solver_options or {}
+        self.highs.setOptionValue('output_flag', bool(solver_options.get('disp', False)))
+        if solver_options.get('time_limit') is not None:
+            self.highs.setOptionValue('time_limit', float(solver_options['time_limit']))
+        if 'presolve' in solver_options:
+            self.highs.setOptionValue('presolve', 'on' if solver_options['presolve'] else 'off')
+        lp = highspy.HighsLp()
+        lp.num_col_ = equality_matrix.shape[1]
+        lp.num_row_ = equality_matrix.shape[0]
+        lp.col_cost_ = self.problem.make_objective(objective_vector=self.objective_vector,
+                                                   penalty_weights=self.penalty_weights)
+        lp.col_lower_ = variables_lower
+        lp.col_upper_ = variables_upper
+        lp.row_lower_ = np.zeros(equality_matrix.shape[0])
+        lp.row_upper_ = np.zeros(equality_matrix.shape[0])
+        lp.a_matrix_.format_ = highspy.MatrixFormat.kColwise
+        lp.a_matrix_.start_ = equality_matrix.indptr
+        lp.a_matrix_.index_ = equality_matrix.indices
+        lp.a_matrix_.value_ = equality_matrix.data
+        self.highs.passModel(lp)
+
+    def set_objective(self, objective_vector=None, penalty_weights=None):
+        """
+        This method, swaps the objective of the live model, keeping its basis
+        :param objective_vector: The linear objective of the fluxes, self.problem.objective_vector if None
+        :param penalty_weights: The penalty weights, self.problem.penalty_weights if None
+        :return: -
+        """
+        self.objective_vector = objective_vector
+        self.penalty_weights = penalty_weights
+        if self.highs is not None:
+            variables_objective = self.problem.make_objective(objective_vector=objective_vector,
+                                                              penalty_weights=penalty_weights)
+            self.highs.changeColsCost(len(variables_objective), np.arange(len(variables_objective), dtype=np.int32),
+                                      variables_objective)
+
+    def get_status(self) -> str:
+        """
+        :return: The status of the last highspy solve, in the terms of MulticolumnSolver.SOLVE_STATUSES
+        """
+        model_status = self.highs.getModelStatus()
+        if model_status == highspy.HighsModelStatus.kOptimal:
+            return 'optimal'
+        if model_status == highspy.HighsModelStatus.kInfeasible:
+            return 'infeasible'
+        if model_status == highspy.HighsModelStatus.kUnbounded:
+            return 'unbounded'
+        if model_status in (highspy.HighsModelStatus.kTimeLimit, highspy.HighsModelStatus.kIterationLimit):
+            return 'limit'
+        return 'error'
+
+    def solve_cold(self, lower_bounds, upper_bounds) -> tuple:
+        """
+        :param lower_bounds: The lower bounds of the fluxes in a column
+        :param upper_bounds: The upper bounds of the fluxes in a column
+        :return: (status, objective value, fluxes) of a cold solve through scipy.optimize.milp
+        """
+        return self.problem.solve(lower_bounds=lower_bounds, upper_bounds=upper_bounds,
+                                  objective_vector=self.objective_vector, penalty_weights=self.penalty_weights,
+                                  solver_options=self.solver_options)
+
+    def solve(self, lower_bounds, upper_bounds) -> tuple:
+        """
+        This method, solves a column by changing the bounds of the live model from the previous column
+        :param lower_bounds: The lower bounds of the fluxes in the column
+        :param upper_bounds: The upper bounds of the fluxes in the column
+        :return: (status, objective value, fluxes, number of changed bounds of the variables)
+        """
+        lower_bounds = np.asarray(lower_bounds, dtype=np.float64)
+        upper_bounds = np.asarray(upper_bounds, dtype=np.float64)
+        variables_lower, variables_upper = self.problem.make_variables_bounds(lower_bounds, upper_bounds)
+        if not self.is_incremental:
+            status, objective_value, fluxes = self.solve_cold(lower_bounds, upper_bounds)
+            return status, objective_value, fluxes, len(variables_lower)
+        if self.highs is None:
+            self.make_highs_model(variables_lower, variables_upper)
+            changed_indexes = np.arange(len(variables_lower))
+        else:
+            changed_indexes = np.flatnonzero((variables_lower != self.variables_lower) |
+                                             (variables_upper != self.variables_upper))
+            if len(changed_indexes):
+                self.highs.changeColsBounds(len(changed_indexes), changed_indexes.astype(np.int32),
+                                            variables_lower[changed_indexes], variables_upper[changed_indexes])
+        self.variables_lower, self.variables_upper = variables_lower, variables_upper
+        self.highs.run()
+        if self.highs.getModelStatus() == highspy.HighsModelStatus.kUnboundedOrInfeasible:
+            # Presolve cannot tell these apart, so the column is settled by a cold solve
+            status, objective_value, fluxes = self.solve_cold(lower_bounds, upper_bounds)
+            return status, objective_value, fluxes, len(changed_indexes)
+        status = self.get_status()
+        if status not in ('optimal', 'limit'):
+            return status, None, None, len(changed_indexes)
+        objective_value = self.highs.getInfo().objective_function_value
+        fluxes = self.problem.get_fluxes(np.array(self.highs.getSolution().col_value))
+        return status, objective_value, fluxes, len(changed_indexes)
+
+
+def solve_all_columns_incrementally(solver, reorder_columns: bool = True, compare_cold_start: bool = False) -> dict:
+    """
+    This function, solves all the columns of the solver incrementally
+    :param solver: A MulticolumnSolver
+    :param reorder_columns: Whether to order the columns by order_columns_by_deltas (the results keep the x1..xN
+                            order of the columns either way)
+    :param compare_cold_start: Whether to also time the cold-start path (MulticolumnSolver.solve_all_columns)
+    :return: -, filling solver.fluxes and solver.columns_summary as MulticolumnSolver.solve_all_columns does,
+             and returning a report with the solve times (and the savings against the cold-start path)
+    """
+    report = {'warm_started': highspy is not None and not solver.growth_problem.cardinality}
+    if compare_cold_start:
+        start_time = time.perf_counter()
+        solver.solve_all_columns()
+        report['cold_start_seconds'] = time.perf_counter() - start_time
+    num_growth_columns, num_non_growth_columns = solver.get_num_columns()
+    solver.fluxes = np.zeros((len(solver.reactions_ids), num_growth_columns + num_non_growth_columns))
+    columns_results = [None] * (num_growth_columns + num_non_growth_columns)
+    bounds_sets = [(solver.growth_problem, solver.growth_lower_bounds, solver.growth_upper_bounds, 0, 1.0)]
+    if num_non_growth_columns:
+        bounds_sets.append((solver.non_growth_problem, solver.non_growth_lower_bounds,
+                            solver.non_growth_upper_bounds, num_growth_columns, -1.0))
+    num_changed_bounds = 0
+    solve_seconds = 0.0
+    for problem, bounds_lower, bounds_upper, column_offset, objective_sign in bounds_sets:
+        columns_order = np.arange(bounds_lower.get_num_columns())
+        if reorder_columns:
+            columns_order = order_columns_by_deltas(bounds_lower, bounds_upper)
+        problem_solver = IncrementalProblemSolver(problem=problem, solver_options=solver.solver_options)
+        start_time = time.perf_counter()
+        for column_index in columns_order:
+            if solver.is_unreachable(column_offset + column_index):
+                columns_results[column_offset + column_index] = ('unreachable', None)
+                continue
+            status, objective_value, fluxes, num_changed = problem_solver.solve(bounds_lower.get_column(column_index),
+                                                                                bounds_upper.get_column(column_index))
+            if fluxes is not None:
+                solver.fluxes[:, column_offset + column_index] = fluxes
+            if objective_value is not None:
+                objective_value = objective_sign * objective_value
+            columns_results[column_offset + column_index] = (status, objective_value)
+            num_changed_bounds += num_changed
+        solve_seconds += time.perf_counter() - start_time
+    summary_rows = []
+    for column_index, (status, objective_value) in enumerate(columns_results):
+        is_growth = column_index < num_growth_columns
+        if is_growth:
+            column_name = solver.growth_lower_bounds.columns_names[column_index]
+        else:
+            column_name = solver.non_growth_lower_bounds.columns_names[column_index - num_growth_columns]
+        summary_rows.append(solver.make_summary_row(column_index, column_name, is_growth, status, objective_value))
+    solver.finalize_results(summary_rows)
+    report['num_columns'] = len(columns_results)
+    report['mean_changed_bounds'] = num_changed_bounds / max(len(columns_results), 1)
+    report['solve_seconds'] = solve_seconds
+    if compare_cold_start:
+        report['saved_fraction'] = 1.0 - solve_seconds / report['cold_start_seconds']
+    return report
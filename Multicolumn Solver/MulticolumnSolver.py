@@ -0,0 +1,538 @@
+"""
+MulticolumnSolver
+This code, solves the multi-column flux problem on the final data of BiomassFinalizer.save_final_data in Python,
+replacing the Julia/GLPK notebook (MulticolumnFBA.ipynb). The LPs (and MILPs) are solved by HiGHS through
+scipy.optimize.milp.
+
+Each experiment column j is solved over the same stoichiometry matrix S, which is built once:
+    1. growth columns: minimize the sum of |v_i| over the non-existing (template) reactions,
+       s.t. S v = 0 and L_j <= v <= U_j (the biomass lower bound in L is the growth threshold),
+       or minimize the number of the used non-existing reactions with the "cardinality" objective (MILP).
+    2. non-growth columns: maximize v_biomass, s.t. S v = 0 and ng_L_j <= v <= ng_U_j.
+       The column is consistent if the maximum biomass is below the growth threshold (or the LP is infeasible).
+|v_i| of a penalized reaction is modeled by splitting v_i into a forward and a backward variable, so that the
+columns differ only in the bounds of the variables.
+The fluxes are saved in "final_csv.csv" in the layout of the notebook's output (read by ActiveNetworkVisualizer),
+plus an "ID" column: one row per reaction in the reactions_index_map order, and the columns x1, ..., xN (growth
+columns first).
+A reduced final data folder (see NetworkCompressor) is solved on its reduced reactions, and its fluxes are expanded
+back to the template reactions by its "expansion_map.npz" (see ExpansionMap).
+Optionally, the columns where the biomass precursors are not reachable from the open exchanges (see NetworkScope) are
+settled without solving, with the "unreachable" status: a growth column is inconsistent, and a non-growth column is
+consistent. The check needs the recycled cofactors as seeds, otherwise it flags columns the LP can solve.
+"""
+
+import json
+import os
+import warnings
+import numpy as np
+import pandas as pd
+import scipy.sparse
+from scipy.optimize import Bounds, LinearConstraint, milp
+from SparseBounds import BaseDeltaBounds
+from BoundsMatrixStore import BoundsMatrixStore, is_bounds_store_path
+from StoichiometryMatrix import load_stoichiometry_matrix
+from NetworkScope import NetworkScope
+from ExpansionMap import ExpansionMap
+
+BOUNDS_FILE_EXTENSIONS = ['.npz', '.bounds', '.csv']
+SOLVE_STATUSES = {0: 'optimal', 1: 'limit', 2: 'infeasible', 3: 'unbounded', 4: 'error'}
+
+
+def find_bounds_filepath(folder: str, bounds_name: str) -> str:
+    """
+    :param folder: The final data folder
+    :param bounds_name: The name of the bounds without the extension (e.g. "L", "ng_U")
+    :return: The path of the saved bounds (.npz, .bounds, or .csv), None if they are not saved
+    """
+    for extension in BOUNDS_FILE_EXTENSIONS:
+        bounds_filepath = os.path.join(folder, bounds_name + extension)
+        if os.path.exists(bounds_filepath):
+            return bounds_filepath
+    return None
+
+
+class BoundsColumns:
+    def __init__(self, bounds, columns_names: list):
+        """
+        :param bounds: A (reactions x columns) numpy array, a BoundsMatrixStore, or a BaseDeltaBounds
+        :param columns_names: Names of the columns
+        """
+        self.bounds = bounds
+        self.columns_names = list(columns_names)
+
+    def get_num_columns(self) -> int:
+        return len(self.columns_names)
+
+    def get_column(self, column_index: int):
+        """
+        :param column_index: The index of a column
+        :return: The dense bounds vector of the column
+        """
+        if isinstance(self.bounds, np.ndarray):
+            return self.bounds[:, column_index]
+        return np.asarray(self.bounds.get_column(column_index), dtype=np.float64)
+
+    def get_columns(self, columns_indexes=None):
+        """
+        :param columns_indexes: Indexes of the desired columns, all the columns if None
+        :return: A dense (reactions x columns) matrix
+        """
+        if columns_indexes is None:
+            columns_indexes = np.arange(len(self.columns_names))
+        if isinstance(self.bounds, np.ndarray):
+            return self.bounds[:, columns_indexes]
+        if isinstance(self.bounds, BaseDeltaBounds):
+            return self.bounds.to_dense(columns_indexes=columns_indexes)
+        return self.bounds.get_columns(columns_indexes=columns_indexes).astype(np.float64)
+
+    @classmethod
+    def load(cls, bounds_filepath: str):
+        """
+        :param bounds_filepath: The path for L/U (or ng_L/ng_U) as a .npz, .bounds, or .csv file
+        :return: The loaded BoundsColumns. The rows follow reactions_index_map.
+        """
+        if bounds_filepath.endswith('.npz'):
+            bounds = BaseDeltaBounds.load(bounds_filepath)
+            return cls(bounds=bounds, columns_names=bounds.columns_names)
+        if is_bounds_store_path(bounds_filepath):
+            bounds = BoundsMatrixStore(bounds_filepath)
+            return cls(bounds=bounds, columns_names=bounds.columns_names)
+        bounds_df = pd.read_csv(bounds_filepath)
+        if 'ID' in bounds_df.columns:
+            bounds_df = bounds_df.drop(columns=['ID'])
+        return cls(bounds=bounds_df.to_numpy(dtype=np.float64), columns_names=bounds_df.columns.tolist())
+
+
+class SplitFluxProblem:
+    def __init__(self, stoichiometry_matrix, objective_vector=None, penalty_weights=None, cardinality: bool = False):
+        """
+        This class, keeps the matrices of the column problem
+            min objective_vector . v + sum_i penalty_weights_i |v_i|   s.t.  S v = 0,  lower <= v <= upper,
+        which are shared by all the columns. Each penalized v_i is split into v_i = p_i - q_i with p_i, q_i >= 0.
+        :param stoichiometry_matrix: The (metabolites x reactions) scipy.sparse stoichiometry matrix
+        :param objective_vector: The linear objective of the fluxes (zero if None)
+        :param penalty_weights: The weights of |v_i| (zero if None)
+        :param cardinality: If True, the penalty is sum_i penalty_weights_i [v_i != 0], modeled by binary variables
+        """
+        self.stoichiometry_matrix = scipy.sparse.csc_matrix(stoichiometry_matrix)
+        self.num_reactions = self.stoichiometry_matrix.shape[1]
+        if objective_vector is None:
+            objective_vector = np.zeros(self.num_reactions)
+        if penalty_weights is None:
+            penalty_weights = np.zeros(self.num_reactions)
+        self.objective_vector = np.asarray(objective_vector, dtype=np.float64)
+        self.penalty_weights = np.asarray(penalty_weights, dtype=np.float64)
+        self.cardinality = cardinality
+        self.penalized_indexes = np.flatnonzero(self.penalty_weights)
+        self.num_penalized = len(self.penalized_indexes)
+        self.equality_matrix = None
+        self.integrality = None
+        self.make_problem_matrices()
+
+    def get_num_variables(self) -> int:
+        return self.num_reactions + self.num_penalized * (2 if self.cardinality else 1)
+
+    def make_problem_matrices(self):
+        """
+        This method, makes the equality matrix [S, -S_penalized (, 0)] over the variables [p (v), q (, z)]
+        and the integrality of the variables. They are made once and reused for all the columns.
+        :return: -
+        """
+        num_metabolites = self.stoichiometry_matrix.shape[0]
+        blocks = [self.stoichiometry_matrix, -self.stoichiometry_matrix[:, self.penalized_indexes]]
+        self.integrality = np.zeros(self.get_num_variables(), dtype=np.uint8)
+        if self.cardinality:
+            blocks.append(scipy.sparse.csc_matrix((num_metabolites, self.num_penalized)))
+            self.integrality[self.num_reactions + self.num_penalized:] = 1
+        self.equality_matrix = scipy.sparse.hstack(blocks, format='csc')
+
+    def make_objective(self, objective_vector=None, penalty_weights=None):
+        """
+        :param objective_vector: The linear objective of the fluxes, self.objective_vector if None
+        :param penalty_weights: The weights of the penalized reactions, self.penalty_weights if None.
+                                Only the reactions of self.penalized_indexes can be penalized.
+        :return: The objective coefficients of the variables
+        """
+        if objective_vector is None:
+            objective_vector = self.objective_vector
+        if penalty_weights is None:
+            penalty_weights = self.penalty_weights
+        penalized_objective = objective_vector[self.penalized_indexes]
+        penalized_weights = penalty_weights[self.penalized_indexes]
+        variables_objective = np.zeros(self.get_num_variables())
+        variables_objective[:self.num_reactions] = objective_vector
+        if self.cardinality:
+            variables_objective[self.num_reactions:self.num_reactions + self.num_penalized] = -penalized_objective
+            variables_objective[self.num_reactions + self.num_penalized:] = penalized_weights
+        else:
+            variables_objective[self.penalized_indexes] += penalized_weights
+            variables_objective[self.num_reactions:] = penalized_weights - penalized_objective
+        return variables_objective
+
+    def make_variables_bounds(self, lower_bounds, upper_bounds) -> tuple:
+        """
+        :param lower_bounds: The lower bounds of the fluxes in a column
+        :param upper_bounds: The upper bounds of the fluxes in a column
+        :return: (lower bounds, upper bounds) of the variables
+        """
+        variables_lower = np.zeros(self.get_num_variables())
+        variables_upper = np.ones(self.get_num_variables())
+        variables_lower[:self.num_reactions] = lower_bounds
+        variables_upper[:self.num_reactions] = upper_bounds
+        penalized_lower = lower_bounds[self.penalized_indexes]
+        penalized_upper = upper_bounds[self.penalized_indexes]
+        variables_lower[self.penalized_indexes] = np.maximum(penalized_lower, 0.0)
+        variables_upper[self.penalized_indexes] = np.maximum(penalized_upper, 0.0)
+        backward_slice = slice(self.num_reactions, self.num_reactions + self.num_penalized)
+        variables_lower[backward_slice] = np.maximum(-penalized_upper, 0.0)
+        variables_upper[backward_slice] = np.maximum(-penalized_lower, 0.0)
+        return variables_lower, variables_upper
+
+    def make_constraints(self, lower_bounds, upper_bounds) -> list:
+        """
+        :param lower_bounds: The lower bounds of the fluxes in a column
+        :param upper_bounds: The upper bounds of the fluxes in a column
+        :return: The list of scipy LinearConstraints of the column: S v = 0, and p + q - M z <= 0 for cardinality
+        """
+        constraints = [LinearConstraint(self.equality_matrix, 0.0, 0.0)]
+        if self.cardinality:
+            big_m = np.maximum(np.abs(lower_bounds[self.penalized_indexes]),
+                               np.abs(upper_bounds[self.penalized_indexes]))
+            penalized_range = np.arange(self.num_penalized)
+            indicator_matrix = scipy.sparse.csr_matrix(
+                (np.concatenate([np.ones(2 * self.num_penalized), -big_m]),
+                 (np.tile(penalized_range, 3),
+                  np.concatenate([self.penalized_indexes,
+                                  self.num_reactions + penalized_range,
+                                  self.num_reactions + self.num_penalized + penalized_range]))),
+                shape=(self.num_penalized, self.get_num_variables()))
+            constraints.append(LinearConstraint(indicator_matrix, -np.inf, 0.0))
+        return constraints
+
+    def get_fluxes(self, variables_values):
+        """
+        :param variables_values: Values of the variables
+        :return: The fluxes v = p - q
+        """
+        fluxes = np.array(variables_values[:self.num_reactions], dtype=np.float64)
+        fluxes[self.penalized_indexes] -= variables_values[self.num_reactions:self.num_reactions + self.num_penalized]
+        return fluxes
+
+    def solve(self, lower_bounds, upper_bounds, objective_vector=None, penalty_weights=None,
+              solver_options: dict = None) -> tuple:
+        """
+        :param lower_bounds: The lower bounds of the fluxes in a column
+        :param upper_bounds: The upper bounds of the fluxes in a column
+        :param objective_vector: The linear objective of the fluxes, self.objective_vector if None
+        :param penalty_weights: The penalty weights, self.penalty_weights if None
+        :param solver_options: Options of scipy.optimize.milp (e.g. {'time_limit': 60})
+        :return: (status, objective value, fluxes). The objective value and fluxes are None without a solution.
+        """
+        lower_bounds = np.asarray(lower_bounds, dtype=np.float64)
+        upper_bounds = np.asarray(upper_bounds, dtype=np.float64)
+        variables_lower, variables_upper = self.make_variables_bounds(lower_bounds, upper_bounds)
+        result = milp(c=self.make_objective(objective_vector=objective_vector, penalty_weights=penalty_weights),
+                      constraints=self.make_constraints(lower_bounds, upper_bounds),
+                      integrality=self.integrality,
+                      bounds=Bounds(variables_lower, variables_upper),
+                      options=solver_options)
+        if result.x is None:
+            return SOLVE_STATUSES[result.status], None, None
+        return SOLVE_STATUSES[result.status], result.fun, self.get_fluxes(result.x)
+
+
+class MulticolumnSolver:
+    def __init__(self,
+                 final_data_folder: str,
+                 biomass_template_id: str,
+                 biomass_growth_threshold: float = 1e-6,
+                 growth_objective: str = 'l1',
+                 flux_tolerance: float = 1e-9,
+                 solver_options: dict = None):
+        """
+        :param final_data_folder: The folder of the final data (see BiomassFinalizer.save_final_data)
+        :param biomass_template_id: The ID for the biomass reaction in the template
+        :param biomass_growth_threshold: The minimum biomass production rate for organism's growth
+        :param growth_objective: "l1" to minimize the sum of |v| of the non-existing reactions (LP),
+                                 or "cardinality" to minimize their number (MILP)
+        :param flux_tolerance: Fluxes with smaller absolute values are saved as zero
+        :param solver_options: Options of scipy.optimize.milp (e.g. {'time_limit': 60, 'presolve': True})
+        """
+        if growth_objective not in ('l1', 'cardinality'):
+            raise ValueError("growth_objective should be either \"l1\" or \"cardinality\"")
+        self.final_data_folder = final_data_folder
+        self.biomass_template_id = biomass_template_id
+        self.biomass_growth_threshold = biomass_growth_threshold
+        self.growth_objective = growth_objective
+        self.flux_tolerance = flux_tolerance
+        self.solver_options = solver_options
+        # ###############################################
+        self.reactions_index_map = None
+        self.reactions_ids = None
+        self.metabolites_index_map = None
+        self.existing_reactions_indexes = None
+        self.expansion_map = None
+        self.output_reactions_ids = None
+        self.load_index_maps()
+        self.biomass_index = self.reactions_index_map[biomass_template_id]
+        # ###############################################
+        self.stoichiometry_matrix = None
+        self.load_stoichiometry_matrix()
+        # ###############################################
+        self.growth_lower_bounds = None
+        self.growth_upper_bounds = None
+        self.non_growth_lower_bounds = None
+        self.non_growth_upper_bounds = None
+        self.load_bounds()
+        # ###############################################
+        self.growth_problem = None
+        self.non_growth_problem = None
+        self.make_problems()
+        # ###############################################
+        self.unreachable_columns = None
+        self.fluxes = None
+        self.columns_summary = None
+
+    def load_index_maps(self):
+        """
+        This method, loads reactions_index_map.json, metabolites_index_map.json, and existing_reactions.json
+        from self.final_data_folder
+        :return: -
+        """
+        with open(os.path.join(self.final_data_folder, 'reactions_index_map.json'), 'r') as json_file:
+            self.reactions_index_map = json.load(json_file)
+        with open(os.path.join(self.final_data_folder, 'metabolites_index_map.json'), 'r') as json_file:
+            self.metabolites_index_map = json.load(json_file)
+        with open(os.path.join(self.final_data_folder, 'existing_reactions.json'), 'r') as json_file:
+            self.existing_reactions_indexes = np.array(json.load(json_file), dtype=np.int64)
+        self.reactions_ids = [None] * len(self.reactions_index_map)
+        for rxn_id, rxn_index in self.reactions_index_map.items():
+            self.reactions_ids[rxn_index] = rxn_id
+        self.expansion_map = ExpansionMap.load(self.final_data_folder)
+        self.output_reactions_ids = self.reactions_ids
+        if self.expansion_map is not None:
+            self.output_reactions_ids = self.expansion_map.original_reactions_ids
+
+    def load_stoichiometry_matrix(self):
+        """
+        This method, loads S.npz (or the S.csv triplets) from self.final_data_folder, once for all the columns
+        :return: -
+        """
+        stoichiometry_filepath = os.path.join(self.final_data_folder, 'S.npz')
+        if not os.path.exists(stoichiometry_filepath):
+            stoichiometry_filepath = os.path.join(self.final_data_folder, 'S.csv')
+        self.stoichiometry_matrix = load_stoichiometry_matrix(
+            stoichiometry_filepath, matrix_format='csc',
+            shape=(len(self.metabolites_index_map), len(self.reactions_index_map)))
+
+    def load_bounds(self):
+        """
+        This method, loads L and U, and ng_L and ng_U if they are saved, from self.final_data_folder
+        :return: -
+        """
+        self.growth_lower_bounds = BoundsColumns.load(find_bounds_filepath(self.final_data_folder, 'L'))
+        self.growth_upper_bounds = BoundsColumns.load(find_bounds_filepath(self.final_data_folder, 'U'))
+        if self.growth_lower_bounds.get_num_columns() != self.growth_upper_bounds.get_num_columns():
+            raise ValueError("L and U have different numbers of columns")
+        non_growth_lower_filepath = find_bounds_filepath(self.final_data_folder, 'ng_L')
+        non_growth_upper_filepath = find_bounds_filepath(self.final_data_folder, 'ng_U')
+        if non_growth_lower_filepath and non_growth_upper_filepath:
+            self.non_growth_lower_bounds = BoundsColumns.load(non_growth_lower_filepath)
+            self.non_growth_upper_bounds = BoundsColumns.load(non_growth_upper_filepath)
+            if self.non_growth_lower_bounds.get_num_columns() != self.non_growth_upper_bounds.get_num_columns():
+                raise ValueError("ng_L and ng_U have different numbers of columns")
+
+    def make_growth_penalty_weights(self):
+        """
+        :return: The penalty weights of the growth columns: 1 for the non-existing reactions, except the biomass.
+                 For a reduced folder, the weights of the template reactions (except the template biomass) are
+                 summed over the reduced reactions, so the reactions lumped into the biomass stay penalized.
+        """
+        if self.expansion_map is not None:
+            if self.growth_objective == 'cardinality':
+                is_non_existing = np.ones(len(self.expansion_map.original_reactions_ids), dtype=bool)
+                is_non_existing[self.expansion_map.original_existing_indexes] = False
+                if (self.expansion_map.original_shares[is_non_existing] > 1).any():
+                    warnings.warn("The folder has collapsed non-existing duplicates, which count as all their members "
+                                  "in the \"cardinality\" objective (see DuplicateCollapser)")
+            return self.expansion_map.get_penalty_weights(
+                cardinality=self.growth_objective == 'cardinality',
+                excluded_indexes=[self.expansion_map.original_reactions_ids.index(self.biomass_template_id)])
+        penalty_weights = np.ones(len(self.reactions_ids))
+        penalty_weights[self.existing_reactions_indexes] = 0.0
+        penalty_weights[self.biomass_index] = 0.0
+        return penalty_weights
+
+    def make_problems(self):
+        """
+        This method, makes the growth and non-growth problems over self.stoichiometry_matrix
+        :return: -
+        """
+        self.growth_problem = SplitFluxProblem(stoichiometry_matrix=self.stoichiometry_matrix,
+                                               penalty_weights=self.make_growth_penalty_weights(),
+                                               cardinality=self.growth_objective == 'cardinality')
+        biomass_objective = np.zeros(len(self.reactions_ids))
+        biomass_objective[self.biomass_index] = -1.0
+        self.non_growth_problem = SplitFluxProblem(stoichiometry_matrix=self.stoichiometry_matrix,
+                                                   objective_vector=biomass_objective)
+
+    def get_num_columns(self) -> tuple:
+        """
+        :return: (number of growth columns, number of non-growth columns)
+        """
+        num_non_growth_columns = 0
+        if self.non_growth_lower_bounds is not None:
+            num_non_growth_columns = self.non_growth_lower_bounds.get_num_columns()
+        return self.growth_lower_bounds.get_num_columns(), num_non_growth_columns
+
+    def find_unreachable_columns(self, seed_metabolites_ids: list, columns_chunk_size: int = 1024):
+        """
+        This method, flags the columns where the biomass cannot fire, since some of its precursors are not reachable
+        from the open exchanges of the column (see NetworkScope). The flagged columns are not solved.
+        :param seed_metabolites_ids: IDs of the metabolites reachable in all the columns: a metabolite of each cycle
+                                     not fed by the exchanges, e.g. one of each recycled cofactor pair (atp/adp,
+                                     nad/nadh, nadp/nadph)
+        :param columns_chunk_size: Number of bounds columns expanded at a time
+        :return: -, filling self.unreachable_columns as a boolean array of all the columns (growth columns first)
+        """
+        if not seed_metabolites_ids:
+            raise ValueError("The seed metabolites (e.g. the recycled cofactors) are required for the reachability "
+                             "check, without them it flags the columns that grow through cofactor cycles")
+        network_scope = NetworkScope(stoichiometry_matrix=self.stoichiometry_matrix,
+                                     seed_metabolites_indexes=[self.metabolites_index_map[met_id]
+                                                               for met_id in seed_metabolites_ids])
+        columns_flags = []
+        bounds_pairs = [(self.growth_lower_bounds, self.growth_upper_bounds)]
+        if self.non_growth_lower_bounds is not None:
+            bounds_pairs.append((self.non_growth_lower_bounds, self.non_growth_upper_bounds))
+        for bounds_lower, bounds_upper in bounds_pairs:
+            for chunk_start in range(0, bounds_lower.get_num_columns(), columns_chunk_size):
+                chunk_columns = np.arange(chunk_start, min(chunk_start + columns_chunk_size,
+                                                           bounds_lower.get_num_columns()))
+                columns_flags.append(network_scope.find_unreachable_columns(bounds_lower.get_columns(chunk_columns),
+                                                                            bounds_upper.get_columns(chunk_columns),
+                                                                            self.biomass_index))
+        self.unreachable_columns = np.concatenate(columns_flags)
+
+    def is_unreachable(self, column_index: int) -> bool:
+        """
+        :param column_index: The index of a column (growth columns first)
+        :return: Whether the column is flagged by self.find_unreachable_columns
+        """
+        return self.unreachable_columns is not None and bool(self.unreachable_columns[column_index])
+
+    def solve_growth_column(self, column_index: int) -> tuple:
+        """
+        :param column_index: The index of a growth column
+        :return: (status, objective value, fluxes)
+        """
+        return self.growth_problem.solve(lower_bounds=self.growth_lower_bounds.get_column(column_index),
+                                         upper_bounds=self.growth_upper_bounds.get_column(column_index),
+                                         solver_options=self.solver_options)
+
+    def solve_non_growth_column(self, column_index: int) -> tuple:
+        """
+        :param column_index: The index of a non-growth column
+        :return: (status, maximum biomass, fluxes)
+        """
+        status, objective_value, fluxes = self.non_growth_problem.solve(
+            lower_bounds=self.non_growth_lower_bounds.get_column(column_index),
+            upper_bounds=self.non_growth_upper_bounds.get_column(column_index),
+            solver_options=self.solver_options)
+        if objective_value is not None:
+            objective_value = -objective_value
+        return status, objective_value, fluxes
+
+    def is_consistent(self, is_growth: bool, status: str, objective_value: float) -> bool:
+        """
+        :param is_growth: Whether the column is a growth column
+        :param status: The solve status of the column
+        :param objective_value: The objective value of the column (the maximum biomass for non-growth columns)
+        :return: Whether the column's solution agrees with its growth data
+        """
+        if is_growth:
+            return status == 'optimal'
+        if status in ('infeasible', 'unreachable'):
+            return True
+        return status == 'optimal' and objective_value < self.biomass_growth_threshold
+
+    def solve_all_columns(self):
+        """
+        This method, solves all the growth columns, and then all the non-growth columns,
+        except the columns flagged by self.find_unreachable_columns
+        :return: -, filling self.fluxes as a (reactions x columns) array,
+                 and self.columns_summary as a DataFrame with one row per column
+        """
+        num_growth_columns, num_non_growth_columns = self.get_num_columns()
+        self.fluxes = np.zeros((len(self.reactions_ids), num_growth_columns + num_non_growth_columns))
+        summary_rows = []
+        for column_index in range(num_growth_columns + num_non_growth_columns):
+            is_growth = column_index < num_growth_columns
+            if is_growth:
+                column_name = self.growth_lower_bounds.columns_names[column_index]
+            else:
+                column_name = self.non_growth_lower_bounds.columns_names[column_index - num_growth_columns]
+            if self.is_unreachable(column_index):
+                status, objective_value, fluxes = 'unreachable', None, None
+            elif is_growth:
+                status, objective_value, fluxes = self.solve_growth_column(column_index)
+            else:
+                status, objective_value, fluxes = self.solve_non_growth_column(column_index - num_growth_columns)
+            if fluxes is not None:
+                self.fluxes[:, column_index] = fluxes
+            summary_rows.append(self.make_summary_row(column_index, column_name, is_growth, status, objective_value))
+        self.finalize_results(summary_rows)
+
+    def make_summary_row(self, column_index: int, column_name: str, is_growth: bool, status: str,
+                         objective_value: float) -> dict:
+        """
+        :return: The summary of a solved column, as a row of self.columns_summary
+        """
+        return {'column': 'x' + str(column_index + 1),
+                'name': column_name,
+                'growth': is_growth,
+                'status': status,
+                'objective': objective_value,
+                'consistent': self.is_consistent(is_growth, status, objective_value)}
+
+    def finalize_results(self, summary_rows: list):
+        """
+        This method, expands the fluxes of a reduced folder to the template reactions (self.output_reactions_ids),
+        zeros the fluxes below self.flux_tolerance, and makes self.columns_summary
+        :param summary_rows: The summary rows of all the columns, in order
+        :return: -
+        """
+        if self.expansion_map is not None:
+            self.fluxes = np.asarray(self.expansion_map.expand_fluxes(self.fluxes))
+        self.fluxes[np.abs(self.fluxes) < self.flux_tolerance] = 0.0
+        self.columns_summary = pd.DataFrame(summary_rows,
+                                            columns=['column', 'name', 'growth', 'status', 'objective', 'consistent'])
+
+    def save_results(self, folder_to_save: str):
+        """
+        This method, saves the results in the folder_to_save:
+            1. "final_csv.csv": the fluxes, with one row per reaction (reactions_index_map order, or the template
+                                reactions order of a reduced folder), the "ID" column of the reactions ids, and
+                                the columns x1, ..., xN
+            2. "columns_summary.csv": the column names, the solve statuses, the objective values,
+                                      and the consistency with the growth data
+        :param folder_to_save: The folder to save the results
+        :return: -
+        """
+        if not os.path.exists(folder_to_save):
+            os.makedirs(folder_to_save)
+        fluxes_df = pd.DataFrame(self.fluxes,
+                                 columns=['x' + str(column_index + 1) for column_index in range(self.fluxes.shape[1])])
+        # The rows of a reduced folder follow the template reactions, not the folder's reactions_index_map
+        fluxes_df.insert(0, 'ID', self.output_reactions_ids)
+        fluxes_df.to_csv(os.path.join(folder_to_save, 'final_csv.csv'), index=False)
+        self.columns_summary.to_csv(os.path.join(folder_to_save, 'columns_summary.csv'), index=False)
+
+
+if __name__ == '__main__':
+    solver = MulticolumnSolver(final_data_folder="../Data/Palsson B.Subtilis Reconstruction/Microbial Final Data/",
+                               biomass_template_id="Growth",
+                               biomass_growth_threshold=1e-1)
+    solver.solve_all_columns()
+    solver.save_results(folder_to_save="../Data/Palsson B.Subtilis Reconstruction/Results/")
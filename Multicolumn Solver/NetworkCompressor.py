@@ -0,0 +1,343 @@
+"""
+NetworkCompressor
+This code, compresses a final data folder (see BiomassFinalizer.save_final_data) before solving, and saves a reduced
+final data folder with the same files plus "expansion_map.npz" (see ExpansionMap), so that MulticolumnSolver solves
+the smaller problem and reports the fluxes of the template reactions.
+
+The union bounds of a reaction are its widest bounds over all the growth and non-growth columns. Rounds of the
+following reductions are applied until none of them changes the network:
+    1. Blocked reactions: reactions with zero union bounds, reactions of a metabolite with a single reaction, and
+       reactions of a dead-end metabolite (a metabolite that, by the union bounds, can only be produced or only be
+       consumed) are removed. Optionally, the reactions that cannot carry flux in the union LP are removed as well.
+    2. Fully coupled reactions: the two reactions of a metabolite with exactly two reactions have proportional fluxes
+       (s_p v_p + s_q v_q = 0), so q is lumped into p with v_q = (-s_p / s_q) v_p, and the metabolite is removed.
+Metabolites without reactions are removed. The biomass reaction (and the protected reactions) are never removed,
+and are kept as the representatives of their lumped reactions. Reactions whose bounds exclude a zero flux in any column
+are never removed either, so that the infeasible columns stay infeasible.
+In each column, the bounds of a lumped reaction are the intersection of its members' bounds divided by their ratios.
+"""
+
+import json
+import os
+import numpy as np
+import pandas as pd
+import scipy.sparse
+from BoundsMatrixStore import BoundsMatrixStore
+from StoichiometryMatrix import load_stoichiometry_matrix, save_stoichiometry_matrix
+from ExpansionMap import ExpansionMap
+from MulticolumnSolver import BoundsColumns, SplitFluxProblem, find_bounds_filepath
+from IncrementalSolver import IncrementalProblemSolver
+
+COEFFICIENT_TOLERANCE = 1e-12
+BOUNDS_NAMES = ['L', 'U', 'ng_L', 'ng_U']
+
+
+def find_lp_blocked_reactions(stoichiometry_matrix, lower_bounds, upper_bounds, candidates_indexes,
+                              flux_tolerance: float = 1e-9):
+    """
+    :param stoichiometry_matrix: The (metabolites x reactions) scipy.sparse stoichiometry matrix
+    :param lower_bounds: The lower bounds of the reactions (e.g. the union bounds of all the columns)
+    :param upper_bounds: The upper bounds of the reactions
+    :param candidates_indexes: Indexes of the reactions to be checked
+    :param flux_tolerance: Reactions with smaller maximum and minimum fluxes are blocked
+    :return: A boolean array flagging the candidates that cannot carry flux in the LP (S v = 0, lower <= v <= upper),
+             by maximizing and minimizing each of them on one warm-started model
+    """
+    problem_solver = IncrementalProblemSolver(problem=SplitFluxProblem(stoichiometry_matrix=stoichiometry_matrix))
+    num_reactions = stoichiometry_matrix.shape[1]
+    is_blocked = np.zeros(num_reactions, dtype=bool)
+    for rxn_index in candidates_indexes:
+        can_carry_flux = False
+        for objective_sign in [-1.0, 1.0]:
+            objective_vector = np.zeros(num_reactions)
+            objective_vector[rxn_index] = objective_sign
+            problem_solver.set_objective(objective_vector=objective_vector)
+            status, objective_value, _, _ = problem_solver.solve(lower_bounds, upper_bounds)
+            # Only an optimal zero flux in both directions blocks the reaction
+            if status != 'optimal' or abs(objective_value) > flux_tolerance:
+                can_carry_flux = True
+                break
+        is_blocked[rxn_index] = not can_carry_flux
+    return is_blocked
+
+
+class NetworkCompressor:
+    def __init__(self,
+                 final_data_folder: str,
+                 biomass_template_id: str,
+                 protected_reactions_ids: list = None,
+                 columns_chunk_size: int = 1024):
+        """
+        :param final_data_folder: The folder of the final data (see BiomassFinalizer.save_final_data), or a reduced one
+        :param biomass_template_id: The ID for the biomass reaction in the template
+        :param protected_reactions_ids: IDs of other reactions to be kept as reduced reactions
+        :param columns_chunk_size: Number of bounds columns processed at a time
+        """
+        self.final_data_folder = final_data_folder
+        self.columns_chunk_size = columns_chunk_size
+        # ###############################################
+        with open(os.path.join(final_data_folder, 'reactions_index_map.json'), 'r') as json_file:
+            reactions_index_map = json.load(json_file)
+        with open(os.path.join(final_data_folder, 'metabolites_index_map.json'), 'r') as json_file:
+            metabolites_index_map = json.load(json_file)
+        with open(os.path.join(final_data_folder, 'existing_reactions.json'), 'r') as json_file:
+            existing_reactions_indexes = json.load(json_file)
+        self.reactions_ids = sorted(reactions_index_map, key=reactions_index_map.get)
+        self.metabolites_ids = sorted(metabolites_index_map, key=metabolites_index_map.get)
+        self.stoichiometry_matrix = load_stoichiometry_matrix(
+            os.path.join(final_data_folder, 'S.npz'), matrix_format='csc',
+            shape=(len(self.metabolites_ids), len(self.reactions_ids)))
+        self.input_expansion_map = ExpansionMap.load(final_data_folder)
+        if self.input_expansion_map is None:
+            self.input_expansion_map = ExpansionMap.make_identity(self.reactions_ids, existing_reactions_indexes)
+        # ###############################################
+        self.bounds = {}
+        for bounds_name in BOUNDS_NAMES:
+            bounds_filepath = find_bounds_filepath(final_data_folder, bounds_name)
+            if bounds_filepath:
+                self.bounds[bounds_name] = BoundsColumns.load(bounds_filepath)
+        self.union_lower_bounds = None
+        self.union_upper_bounds = None
+        self.is_zero_feasible = None
+        self.make_union_bounds()
+        # ###############################################
+        self.is_protected = np.zeros(len(self.reactions_ids), dtype=bool)
+        for rxn_id in [biomass_template_id] + list(protected_reactions_ids or []):
+            self.is_protected[reactions_index_map[rxn_id]] = True
+        # ############ The reduction: input reactions x reduced reactions ############
+        self.reduction_matrix = scipy.sparse.identity(len(self.reactions_ids), format='csc')
+        self.groups_ids = list(self.reactions_ids)
+        self.groups_protected = self.is_protected.copy()
+        self.groups_removable = ~self.is_protected & self.is_zero_feasible
+        self.groups_lower_bounds = self.union_lower_bounds.copy()
+        self.groups_upper_bounds = self.union_upper_bounds.copy()
+        self.kept_metabolites = np.ones(len(self.metabolites_ids), dtype=bool)
+
+    def make_union_bounds(self):
+        """
+        This method, makes the widest bounds of each reaction over all the growth and non-growth columns,
+        and flags the reactions that can have a zero flux in all the columns
+        :return: -, filling self.union_lower_bounds, self.union_upper_bounds, and self.is_zero_feasible
+        """
+        self.union_lower_bounds = np.full(len(self.reactions_ids), np.inf)
+        self.union_upper_bounds = np.full(len(self.reactions_ids), -np.inf)
+        self.is_zero_feasible = np.ones(len(self.reactions_ids), dtype=bool)
+        for bounds_name, bounds in self.bounds.items():
+            for chunk_start in range(0, bounds.get_num_columns(), self.columns_chunk_size):
+                chunk_columns = np.arange(chunk_start, min(chunk_start + self.columns_chunk_size,
+                                                           bounds.get_num_columns()))
+                chunk_bounds = bounds.get_columns(chunk_columns)
+                if bounds_name.endswith('L'):
+                    self.union_lower_bounds = np.minimum(self.union_lower_bounds, chunk_bounds.min(axis=1))
+                    self.is_zero_feasible &= (chunk_bounds <= 0).all(axis=1)
+                else:
+                    self.union_upper_bounds = np.maximum(self.union_upper_bounds, chunk_bounds.max(axis=1))
+                    self.is_zero_feasible &= (chunk_bounds >= 0).all(axis=1)
+
+    def get_reduced_stoichiometry_matrix(self):
+        """
+        :return: The (kept metabolites x reduced reactions) stoichiometry matrix, without the cancelled coefficients
+        """
+        reduced_matrix = scipy.sparse.csr_matrix(self.stoichiometry_matrix[self.kept_metabolites, :] @
+                                                 self.reduction_matrix)
+        reduced_matrix.data[np.abs(reduced_matrix.data) < COEFFICIENT_TOLERANCE] = 0.0
+        reduced_matrix.eliminate_zeros()
+        return reduced_matrix
+
+    def find_blocked_groups(self, reduced_matrix):
+        """
+        :param reduced_matrix: The output of self.get_reduced_stoichiometry_matrix
+        :return: A boolean array flagging the reduced reactions blocked by their bounds or by their metabolites
+        """
+        lower_bounds = self.groups_lower_bounds
+        upper_bounds = self.groups_upper_bounds
+        is_blocked = (lower_bounds == 0) & (upper_bounds == 0)
+        coo_matrix = reduced_matrix.tocoo()
+        is_active = ~is_blocked[coo_matrix.col]
+        rows = coo_matrix.row[is_active]
+        cols = coo_matrix.col[is_active]
+        coefficients = coo_matrix.data[is_active]
+        can_produce = ((coefficients > 0) & (upper_bounds[cols] > 0)) | ((coefficients < 0) & (lower_bounds[cols] < 0))
+        can_consume = ((coefficients > 0) & (lower_bounds[cols] < 0)) | ((coefficients < 0) & (upper_bounds[cols] > 0))
+        num_rows = reduced_matrix.shape[0]
+        rows_sizes = np.bincount(rows, minlength=num_rows)
+        is_dead_end = (rows_sizes == 1) | \
+                      (np.bincount(rows, weights=can_produce, minlength=num_rows) == 0) | \
+                      (np.bincount(rows, weights=can_consume, minlength=num_rows) == 0)
+        is_blocked[cols[is_dead_end[rows]]] = True
+        return is_blocked & self.groups_removable
+
+    def find_coupled_pairs(self, reduced_matrix, is_blocked) -> list:
+        """
+        :param reduced_matrix: The output of self.get_reduced_stoichiometry_matrix
+        :param is_blocked: The output of self.find_blocked_groups
+        :return: List of disjoint (representative, member, ratio) triplets of the fully coupled reduced reactions,
+                 with v_member = ratio * v_representative
+        """
+        coupled_pairs = []
+        is_paired = is_blocked.copy()
+        rows_sizes = np.diff(reduced_matrix.indptr)
+        for row_index in np.flatnonzero(rows_sizes == 2):
+            start = reduced_matrix.indptr[row_index]
+            (representative, member), (representative_coefficient, member_coefficient) = \
+                reduced_matrix.indices[start:start + 2], reduced_matrix.data[start:start + 2]
+            if is_paired[representative] or is_paired[member]:
+                continue
+            if self.groups_protected[member]:
+                if self.groups_protected[representative]:
+                    continue
+                representative, member = member, representative
+                representative_coefficient, member_coefficient = member_coefficient, representative_coefficient
+            coupled_pairs.append((representative, member, -representative_coefficient / member_coefficient))
+            is_paired[representative] = True
+            is_paired[member] = True
+        return coupled_pairs
+
+    def apply_reduction_round(self, is_blocked, coupled_pairs: list):
+        """
+        This method, removes the blocked reduced reactions and lumps the coupled pairs
+        :param is_blocked: Flags of the blocked reduced reactions
+        :param coupled_pairs: List of (representative, member, ratio) triplets
+        :return: -
+        """
+        num_groups = len(self.groups_ids)
+        is_kept = ~is_blocked
+        targets = np.arange(num_groups)
+        ratios = np.ones(num_groups)
+        lower_bounds = self.groups_lower_bounds.copy()
+        upper_bounds = self.groups_upper_bounds.copy()
+        for representative, member, ratio in coupled_pairs:
+            is_kept[member] = False
+            targets[member] = representative
+            ratios[member] = ratio
+            member_lower, member_upper = sorted([self.groups_lower_bounds[member] / ratio,
+                                                 self.groups_upper_bounds[member] / ratio])
+            lower_bounds[representative] = max(lower_bounds[representative], member_lower)
+            upper_bounds[representative] = min(upper_bounds[representative], member_upper)
+        new_indexes = np.full(num_groups, -1, dtype=np.int64)
+        new_indexes[is_kept] = np.arange(np.count_nonzero(is_kept))
+        is_mapped = ~is_blocked
+        transform_matrix = scipy.sparse.csc_matrix((ratios[is_mapped],
+                                                    (np.flatnonzero(is_mapped), new_indexes[targets[is_mapped]])),
+                                                   shape=(num_groups, np.count_nonzero(is_kept)))
+        self.reduction_matrix = scipy.sparse.csc_matrix(self.reduction_matrix @ transform_matrix)
+        self.groups_ids = [group_id for group_id, kept in zip(self.groups_ids, is_kept) if kept]
+        for representative, member, _ in coupled_pairs:
+            self.groups_removable[representative] &= self.groups_removable[member]
+        self.groups_protected = self.groups_protected[is_kept]
+        self.groups_removable = self.groups_removable[is_kept]
+        self.groups_lower_bounds = lower_bounds[is_kept]
+        self.groups_upper_bounds = upper_bounds[is_kept]
+
+    def find_lp_blocked_groups(self, reduced_matrix, flux_tolerance: float = 1e-9):
+        """
+        :param reduced_matrix: The output of self.get_reduced_stoichiometry_matrix
+        :param flux_tolerance: Reduced reactions with smaller maximum and minimum fluxes are blocked
+        :return: A boolean array flagging the reduced reactions that cannot carry flux in the union LP
+                 (S v = 0, union bounds), see find_lp_blocked_reactions
+        """
+        return find_lp_blocked_reactions(stoichiometry_matrix=reduced_matrix,
+                                         lower_bounds=self.groups_lower_bounds,
+                                         upper_bounds=self.groups_upper_bounds,
+                                         candidates_indexes=np.flatnonzero(self.groups_removable),
+                                         flux_tolerance=flux_tolerance)
+
+    def compress(self, check_blocked_by_lp: bool = False) -> dict:
+        """
+        This method, applies the reduction rounds until the network does not change
+        :param check_blocked_by_lp: Whether to also remove the reactions that cannot carry flux in the union LP
+                                    (two LPs per remaining reaction)
+        :return: A report with the numbers of the reactions and metabolites before and after the compression
+        """
+        report = {'reactions': len(self.groups_ids), 'metabolites': int(np.count_nonzero(self.kept_metabolites))}
+        check_by_lp = check_blocked_by_lp
+        while True:
+            reduced_matrix = self.get_reduced_stoichiometry_matrix()
+            is_blocked = self.find_blocked_groups(reduced_matrix)
+            coupled_pairs = self.find_coupled_pairs(reduced_matrix, is_blocked)
+            if not is_blocked.any() and not coupled_pairs:
+                self.kept_metabolites[np.flatnonzero(self.kept_metabolites)[np.diff(reduced_matrix.indptr) == 0]] = \
+                    False
+                if not check_by_lp:
+                    break
+                # The LP check runs once, on the topologically reduced network
+                check_by_lp = False
+                is_blocked = self.find_lp_blocked_groups(reduced_matrix)
+            self.apply_reduction_round(is_blocked, coupled_pairs)
+        report['reduced_reactions'] = len(self.groups_ids)
+        report['reduced_metabolites'] = int(np.count_nonzero(self.kept_metabolites))
+        return report
+
+    def make_reduced_bounds(self, bounds_lower, bounds_upper) -> tuple:
+        """
+        :param bounds_lower: BoundsColumns of the lower bounds of the input reactions
+        :param bounds_upper: BoundsColumns of the upper bounds of the input reactions
+        :return: (lower bounds, upper bounds) of the reduced reactions, as dense (reduced reactions x columns) arrays
+        """
+        coo_reduction = self.reduction_matrix.tocoo()
+        members_order = np.argsort(coo_reduction.col, kind='stable')
+        members = coo_reduction.row[members_order]
+        ratios = coo_reduction.data[members_order][:, np.newaxis]
+        groups_starts = np.searchsorted(coo_reduction.col[members_order], np.arange(len(self.groups_ids)))
+        num_columns = bounds_lower.get_num_columns()
+        reduced_lower = np.empty((len(self.groups_ids), num_columns))
+        reduced_upper = np.empty((len(self.groups_ids), num_columns))
+        for chunk_start in range(0, num_columns, self.columns_chunk_size):
+            chunk_columns = np.arange(chunk_start, min(chunk_start + self.columns_chunk_size, num_columns))
+            scaled_lower = bounds_lower.get_columns(chunk_columns)[members] / ratios
+            scaled_upper = bounds_upper.get_columns(chunk_columns)[members] / ratios
+            is_reversed = ratios < 0
+            members_lower = np.where(is_reversed, scaled_upper, scaled_lower)
+            members_upper = np.where(is_reversed, scaled_lower, scaled_upper)
+            reduced_lower[:, chunk_columns] = np.maximum.reduceat(members_lower, groups_starts, axis=0)
+            reduced_upper[:, chunk_columns] = np.minimum.reduceat(members_upper, groups_starts, axis=0)
+        return reduced_lower, reduced_upper
+
+    def make_expansion_map(self):
+        """
+        :return: The ExpansionMap from the template reactions to the reduced reactions
+        """
+        return self.input_expansion_map.compose(self.reduction_matrix)
+
+    def save_compressed_data(self, folder_to_save: str, file_format: str = 'csv'):
+        """
+        This method, saves the reduced final data folder: S.npz, L/U (and ng_L/ng_U), reactions_index_map.json,
+        metabolites_index_map.json, existing_reactions.json (the reduced reactions of only existing template
+        reactions), and expansion_map.npz
+        :param folder_to_save: The folder to save the reduced final data
+        :param file_format: "csv" for .csv bounds, or "binary" for BoundsMatrixStore folders (.bounds)
+        :return: -
+        """
+        if not os.path.exists(folder_to_save):
+            os.makedirs(folder_to_save)
+        expansion_map = self.make_expansion_map()
+        save_stoichiometry_matrix(self.get_reduced_stoichiometry_matrix(), os.path.join(folder_to_save, 'S.npz'))
+        for lower_name, upper_name in [('L', 'U'), ('ng_L', 'ng_U')]:
+            if lower_name not in self.bounds:
+                continue
+            reduced_bounds = self.make_reduced_bounds(self.bounds[lower_name], self.bounds[upper_name])
+            for bounds_name, bounds_matrix in zip([lower_name, upper_name], reduced_bounds):
+                columns_names = self.bounds[bounds_name].columns_names
+                if file_format == 'binary':
+                    BoundsMatrixStore.write(store_path=os.path.join(folder_to_save, bounds_name + '.bounds'),
+                                            reactions_ids=self.groups_ids, columns_names=columns_names,
+                                            bounds_matrix=bounds_matrix)
+                else:
+                    pd.DataFrame(bounds_matrix, columns=columns_names).to_csv(
+                        os.path.join(folder_to_save, bounds_name + '.csv'), index=False)
+        with open(os.path.join(folder_to_save, 'reactions_index_map.json'), 'w') as file:
+            json.dump({group_id: group_index for group_index, group_id in enumerate(self.groups_ids)}, file)
+        kept_metabolites_ids = [met_id for met_id, kept in zip(self.metabolites_ids, self.kept_metabolites) if kept]
+        with open(os.path.join(folder_to_save, 'metabolites_index_map.json'), 'w') as file:
+            json.dump({met_id: met_index for met_index, met_id in enumerate(kept_metabolites_ids)}, file)
+        with open(os.path.join(folder_to_save, 'existing_reactions.json'), 'w') as file:
+            json.dump(np.flatnonzero(expansion_map.get_penalty_weights() == 0).tolist(), file)
+        expansion_map.save(folder_to_save)
+
+
+if __name__ == '__main__':
+    compressor = NetworkCompressor(final_data_folder="../Data/Palsson B.Subtilis Reconstruction/Microbial Final Data/",
+                                   biomass_template_id="Growth")
+    print(compressor.compress())
+    compressor.save_compressed_data(
+        folder_to_save="../Data/Palsson B.Subtilis Reconstruction/Microbial Compressed Final Data/")
@@ -0,0 +1,192 @@
+"""
+ParallelSolver
+This code, solves the columns of a MulticolumnSolver with a pool of worker processes.
+
+The column problems share the stoichiometry matrix, so nothing large is pickled per task:
+    1. The CSR arrays of S (data, indices, indptr), the stacked (reactions x columns) lower and upper bounds of the
+       growth and non-growth columns, and the (reactions x columns) result fluxes are placed in shared memory
+       (multiprocessing.shared_memory) once.
+    2. Each worker attaches to them in its initializer, and builds its own growth and non-growth problems once.
+    3. Columns are scheduled in chunks of column indexes. A worker writes the fluxes of its columns directly into
+       the shared result array, and returns only the statuses and objective values.
+"""
+
+import os
+import numpy as np
+import scipy.sparse
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from MulticolumnSolver import SplitFluxProblem
+
+# The state of a worker process, filled by initialize_worker
+_worker_state = {}
+
+
+def create_shared_array(shape: tuple, dtype=np.float64) -> tuple:
+    """
+    :param shape: The shape of the array
+    :param dtype: The data type of the array
+    :return: (the SharedMemory block, the numpy array on it, the descriptor to attach to it in other processes)
+    """
+    dtype = np.dtype(dtype)
+    num_bytes = max(int(np.prod(shape)) * dtype.itemsize, 1)
+    shared_block = shared_memory.SharedMemory(create=True, size=num_bytes)
+    shared_array = np.ndarray(shape, dtype=dtype, buffer=shared_block.buf)
+    return shared_block, shared_array, (shared_block.name, tuple(shape), dtype.str)
+
+
+def attach_shared_array(descriptor: tuple) -> tuple:
+    """
+    :param descriptor: The descriptor made by create_shared_array
+    :return: (the SharedMemory block, the numpy array on it)
+    """
+    name, shape, dtype = descriptor
+    # The pool workers share the resource tracker of the creating process, which unlinks the blocks
+    shared_block = shared_memory.SharedMemory(name=name)
+    return shared_block, np.ndarray(shape, dtype=np.dtype(dtype), buffer=shared_block.buf)
+
+
+def initialize_worker(descriptors: dict, problems_settings: dict):
+    """
+    This function, attaches a worker to the shared arrays, and makes its growth and non-growth problems
+    :param descriptors: The descriptors of the shared arrays, in the format of {array name: descriptor}
+    :param problems_settings: The settings of the problems (see make_problems_settings)
+    :return: -
+    """
+    shared_arrays = {}
+    for array_name, descriptor in descriptors.items():
+        shared_block, shared_array = attach_shared_array(descriptor)
+        # The blocks are kept referenced for the lifetime of the worker
+        _worker_state.setdefault('shared_blocks', []).append(shared_block)
+        shared_arrays[array_name] = shared_array
+    stoichiometry_matrix = scipy.sparse.csr_matrix((shared_arrays['stoichiometry_data'],
+                                                    shared_arrays['stoichiometry_indices'],
+                                                    shared_arrays['stoichiometry_indptr']),
+                                                   shape=problems_settings['stoichiometry_shape'])
+    _worker_state['growth_problem'] = SplitFluxProblem(stoichiometry_matrix=stoichiometry_matrix,
+                                                       penalty_weights=problems_settings['penalty_weights'],
+                                                       cardinality=problems_settings['cardinality'])
+    _worker_state['non_growth_problem'] = SplitFluxProblem(stoichiometry_matrix=stoichiometry_matrix,
+                                                           objective_vector=problems_settings['biomass_objective'])
+    _worker_state['lower_bounds'] = shared_arrays['lower_bounds']
+    _worker_state['upper_bounds'] = shared_arrays['upper_bounds']
+    _worker_state['fluxes'] = shared_arrays['fluxes']
+    _worker_state['num_growth_columns'] = problems_settings['num_growth_columns']
+    _worker_state['solver_options'] = problems_settings['solver_options']
+
+
+def solve_columns_chunk(columns_indexes: list) -> list:
+    """
+    This function, solves a chunk of columns in a worker, and writes their fluxes into the shared result array
+    :param columns_indexes: Indexes of the columns (growth columns first, then the non-growth columns)
+    :return: List of (column index, status, objective value) of the columns
+    """
+    chunk_results = []
+    for column_index in columns_indexes:
+        is_growth = column_index < _worker_state['num_growth_columns']
+        problem = _worker_state['growth_problem'] if is_growth else _worker_state['non_growth_problem']
+        status, objective_value, fluxes = problem.solve(lower_bounds=_worker_state['lower_bounds'][:, column_index],
+                                                        upper_bounds=_worker_state['upper_bounds'][:, column_index],
+                                                        solver_options=_worker_state['solver_options'])
+        if fluxes is not None:
+            _worker_state['fluxes'][:, column_index] = fluxes
+        if objective_value is not None and not is_growth:
+            objective_value = -objective_value
+        chunk_results.append((column_index, status, objective_value))
+    return chunk_results
+
+
+def make_problems_settings(solver) -> dict:
+    """
+    :param solver: A MulticolumnSolver
+    :return: The settings the workers need to make the same problems as the solver
+    """
+    num_growth_columns, _ = solver.get_num_columns()
+    return {'stoichiometry_shape': solver.stoichiometry_matrix.shape,
+            'penalty_weights': solver.growth_problem.penalty_weights,
+            'cardinality': solver.growth_problem.cardinality,
+            'biomass_objective': solver.non_growth_problem.objective_vector,
+            'num_growth_columns': num_growth_columns,
+            'solver_options': solver.solver_options}
+
+
+def fill_shared_bounds(solver, lower_bounds, upper_bounds, chunk_num_columns: int):
+    """
+    This function, copies the growth and non-growth bounds of the solver into the shared bounds arrays,
+    chunk by chunk, so that the dense matrices are never held twice
+    :param solver: A MulticolumnSolver
+    :param lower_bounds: The shared (reactions x columns) lower bounds array
+    :param upper_bounds: The shared (reactions x columns) upper bounds array
+    :param chunk_num_columns: Number of columns copied at a time
+    :return: -
+    """
+    column_offset = 0
+    bounds_pairs = [(solver.growth_lower_bounds, solver.growth_upper_bounds)]
+    if solver.non_growth_lower_bounds is not None:
+        bounds_pairs.append((solver.non_growth_lower_bounds, solver.non_growth_upper_bounds))
+    for bounds_lower, bounds_upper in bounds_pairs:
+        num_columns = bounds_lower.get_num_columns()
+        for chunk_start in range(0, num_columns, chunk_num_columns):
+            chunk_columns = np.arange(chunk_start, min(chunk_start + chunk_num_columns, num_columns))
+            lower_bounds[:, column_offset + chunk_columns] = bounds_lower.get_columns(chunk_columns)
+            upper_bounds[:, column_offset + chunk_columns] = bounds_upper.get_columns(chunk_columns)
+        column_offset += num_columns
+
+
+def solve_all_columns_in_parallel(solver, num_workers: int = None, chunk_num_columns: int = 16):
+    """
+    This function, solves all the columns of the solver with a pool of worker processes
+    :param solver: A MulticolumnSolver
+    :param num_workers: Number of worker processes, os.cpu_count() if None
+    :param chunk_num_columns: Number of columns in each scheduled task
+    :return: -, filling solver.fluxes and solver.columns_summary, as MulticolumnSolver.solve_all_columns does
+    """
+    if num_workers is None:
+        num_workers = os.cpu_count()
+    num_growth_columns, num_non_growth_columns = solver.get_num_columns()
+    num_columns = num_growth_columns + num_non_growth_columns
+    stoichiometry_matrix = scipy.sparse.csr_matrix(solver.stoichiometry_matrix)
+    shared_blocks = []
+    shared_arrays = {}
+    descriptors = {}
+    try:
+        for array_name, source_array in [('stoichiometry_data', stoichiometry_matrix.data),
+                                         ('stoichiometry_indices', stoichiometry_matrix.indices),
+                                         ('stoichiometry_indptr', stoichiometry_matrix.indptr)]:
+            shared_block, shared_arrays[array_name], descriptors[array_name] = create_shared_array(
+                source_array.shape, source_array.dtype)
+            shared_blocks.append(shared_block)
+            shared_arrays[array_name][:] = source_array
+        for array_name in ['lower_bounds', 'upper_bounds', 'fluxes']:
+            shared_block, shared_arrays[array_name], descriptors[array_name] = create_shared_array(
+                (len(solver.reactions_ids), num_columns))
+            shared_blocks.append(shared_block)
+        shared_arrays['fluxes'][:] = 0.0
+        fill_shared_bounds(solver, shared_arrays['lower_bounds'], shared_arrays['upper_bounds'], chunk_num_columns)
+        # ########################## Solving ##########################
+        solved_columns = [column_index for column_index in range(num_columns)
+                          if not solver.is_unreachable(column_index)]
+        columns_chunks = [solved_columns[chunk_start:chunk_start + chunk_num_columns]
+                          for chunk_start in range(0, len(solved_columns), chunk_num_columns)]
+        columns_results = [('unreachable', None)] * num_columns
+        with ProcessPoolExecutor(max_workers=num_workers, initializer=initialize_worker,
+                                 initargs=(descriptors, make_problems_settings(solver))) as executor:
+            for chunk_results in executor.map(solve_columns_chunk, columns_chunks):
+                for column_index, status, objective_value in chunk_results:
+                    columns_results[column_index] = (status, objective_value)
+        solver.fluxes = shared_arrays['fluxes'].copy()
+    finally:
+        # The arrays on the blocks should be released before closing them
+        shared_arrays.clear()
+        for shared_block in shared_blocks:
+            shared_block.close()
+            shared_block.unlink()
+    summary_rows = []
+    for column_index, (status, objective_value) in enumerate(columns_results):
+        is_growth = column_index < num_growth_columns
+        if is_growth:
+            column_name = solver.growth_lower_bounds.columns_names[column_index]
+        else:
+            column_name = solver.non_growth_lower_bounds.columns_names[column_index - num_growth_columns]
+        summary_rows.append(solver.make_summary_row(column_index, column_name, is_growth, status, objective_value))
+    solver.finalize_results(summary_rows)
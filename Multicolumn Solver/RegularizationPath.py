@@ -0,0 +1,192 @@
+"""
+RegularizationPath
+This code, sweeps the sparsity weight (lambda) of the reconstruction objective over a grid, so that lambda can be
+picked from one run instead of N independent cold solves.
+
+For each growth column j and each lambda of the grid:
+    min  -v_biomass + lambda * sum_i |v_i| over the non-existing reactions,   s.t.  S v = 0,  L_j <= v <= U_j
+The active set of a (lambda, column) point is its non-existing reactions with non-zero fluxes. The union of the
+active sets over the growth columns is the reconstructed network of that lambda, on which the non-growth columns are
+checked (the maximum biomass with the other non-existing reactions blocked should stay below the growth threshold).
+
+One model is kept alive (see IncrementalSolver): each growth column sweeps the grid by swapping the objective only,
+starting from the previous point's basis, and moves to the next column by changing only the bounds deltas.
+
+The path is saved compactly as a .npz file: the objective values and biomass fluxes of the (lambda x columns) points,
+and the active sets as one CSR-like (indptr, indices) pair of the reactions indexes.
+"""
+
+import numpy as np
+import pandas as pd
+from IncrementalSolver import IncrementalProblemSolver, order_columns_by_deltas
+from MulticolumnSolver import SOLVE_STATUSES, SplitFluxProblem
+
+STATUSES_CODES = {status: status_code for status_code, status in SOLVE_STATUSES.items()}
+
+
+class RegularizationPath:
+    def __init__(self, penalty_grid, columns_names: list, reactions_ids: list):
+        """
+        :param penalty_grid: The lambda values of the path
+        :param columns_names: Names of the growth columns
+        :param reactions_ids: The reactions ids, in the reactions_index_map order
+        """
+        self.penalty_grid = np.asarray(penalty_grid, dtype=np.float64)
+        self.columns_names = list(columns_names)
+        self.reactions_ids = list(reactions_ids)
+        num_points = (len(self.penalty_grid), len(self.columns_names))
+        self.objective_values = np.full(num_points, np.nan)
+        self.biomass_fluxes = np.full(num_points, np.nan)
+        self.statuses_codes = np.full(num_points, STATUSES_CODES['error'], dtype=np.int8)
+        # Active reactions indexes of the point (k, j) are active_indices[active_indptr[p]:active_indptr[p + 1]],
+        # with p = k * number of columns + j
+        self.active_indptr = np.zeros(num_points[0] * num_points[1] + 1, dtype=np.int64)
+        self.active_indices = np.zeros(0, dtype=np.int32)
+        # Number of the consistent non-growth columns of each lambda (-1 if they are not checked)
+        self.non_growth_consistent_counts = np.full(num_points[0], -1, dtype=np.int64)
+
+    def set_active_sets(self, points_active_indexes: list):
+        """
+        :param points_active_indexes: The active reactions indexes of the points, in the (lambda, column) order
+        :return: -
+        """
+        points_sizes = [len(active_indexes) for active_indexes in points_active_indexes]
+        self.active_indptr = np.concatenate([[0], np.cumsum(points_sizes)]).astype(np.int64)
+        self.active_indices = np.zeros(0, dtype=np.int32)
+        if points_active_indexes:
+            self.active_indices = np.concatenate(points_active_indexes).astype(np.int32)
+
+    def get_active_reactions_indexes(self, penalty_index: int, column_index: int):
+        """
+        :param penalty_index: The index of a lambda in self.penalty_grid
+        :param column_index: The index of a growth column
+        :return: The indexes of the active non-existing reactions of the point
+        """
+        point_index = penalty_index * len(self.columns_names) + column_index
+        return self.active_indices[self.active_indptr[point_index]:self.active_indptr[point_index + 1]]
+
+    def get_union_active_reactions_indexes(self, penalty_index: int):
+        """
+        :param penalty_index: The index of a lambda in self.penalty_grid
+        :return: The indexes of the non-existing reactions active in any growth column of the lambda
+        """
+        start = self.active_indptr[penalty_index * len(self.columns_names)]
+        end = self.active_indptr[(penalty_index + 1) * len(self.columns_names)]
+        return np.unique(self.active_indices[start:end])
+
+    def get_union_active_reactions(self, penalty_index: int) -> list:
+        """
+        :param penalty_index: The index of a lambda in self.penalty_grid
+        :return: The ids of the non-existing reactions active in any growth column of the lambda
+        """
+        return [self.reactions_ids[rxn_index] for rxn_index in self.get_union_active_reactions_indexes(penalty_index)]
+
+    def get_summary(self):
+        """
+        :return: A DataFrame with one row per lambda: the total objective, the number of the optimal growth columns,
+                 the size of the union active set, and the number of the consistent non-growth columns
+        """
+        return pd.DataFrame({'lambda': self.penalty_grid,
+                             'objective': np.nansum(self.objective_values, axis=1),
+                             'optimal_columns': (self.statuses_codes == STATUSES_CODES['optimal']).sum(axis=1),
+                             'num_active_reactions': [len(self.get_union_active_reactions_indexes(penalty_index))
+                                                      for penalty_index in range(len(self.penalty_grid))],
+                             'non_growth_consistent': self.non_growth_consistent_counts})
+
+    def save(self, filepath: str):
+        """
+        :param filepath: The path to save the path as a .npz file
+        :return: -
+        """
+        np.savez_compressed(filepath,
+                            penalty_grid=self.penalty_grid,
+                            columns_names=np.array(self.columns_names, dtype=str),
+                            reactions_ids=np.array(self.reactions_ids, dtype=str),
+                            objective_values=self.objective_values,
+                            biomass_fluxes=self.biomass_fluxes,
+                            statuses_codes=self.statuses_codes,
+                            active_indptr=self.active_indptr,
+                            active_indices=self.active_indices,
+                            non_growth_consistent_counts=self.non_growth_consistent_counts)
+
+    @classmethod
+    def load(cls, filepath: str):
+        """
+        :param filepath: The path of a .npz file saved by RegularizationPath.save
+        :return: The loaded RegularizationPath
+        """
+        with np.load(filepath, allow_pickle=False) as npz_file:
+            path = cls(penalty_grid=npz_file['penalty_grid'],
+                       columns_names=npz_file['columns_names'].tolist(),
+                       reactions_ids=npz_file['reactions_ids'].tolist())
+            path.objective_values = npz_file['objective_values']
+            path.biomass_fluxes = npz_file['biomass_fluxes']
+            path.statuses_codes = npz_file['statuses_codes']
+            path.active_indptr = npz_file['active_indptr']
+            path.active_indices = npz_file['active_indices']
+            path.non_growth_consistent_counts = npz_file['non_growth_consistent_counts']
+        return path
+
+
+def check_non_growth_columns(solver, union_active_indexes, problem_solver) -> int:
+    """
+    :param solver: A MulticolumnSolver
+    :param union_active_indexes: The indexes of the non-existing reactions kept in the reconstructed network
+    :param problem_solver: An IncrementalProblemSolver of solver.non_growth_problem
+    :return: The number of the non-growth columns consistent with the reconstructed network
+    """
+    is_blocked = solver.growth_problem.penalty_weights > 0
+    is_blocked[union_active_indexes] = False
+    num_consistent = 0
+    for column_index in range(solver.non_growth_lower_bounds.get_num_columns()):
+        lower_bounds = np.array(solver.non_growth_lower_bounds.get_column(column_index), dtype=np.float64)
+        upper_bounds = np.array(solver.non_growth_upper_bounds.get_column(column_index), dtype=np.float64)
+        lower_bounds[is_blocked] = 0.0
+        upper_bounds[is_blocked] = 0.0
+        status, objective_value, _, _ = problem_solver.solve(lower_bounds, upper_bounds)
+        if objective_value is not None:
+            objective_value = -objective_value
+        num_consistent += solver.is_consistent(False, status, objective_value)
+    return num_consistent
+
+
+def solve_regularization_path(solver, penalty_grid, check_non_growth: bool = True):
+    """
+    :param solver: A MulticolumnSolver (its growth_objective should be "l1")
+    :param penalty_grid: The lambda values of the path, swept in the given order
+    :param check_non_growth: Whether to check the non-growth columns on the union active set of each lambda
+    :return: The RegularizationPath
+    """
+    if solver.growth_problem.cardinality:
+        raise ValueError("The regularization path needs the \"l1\" growth objective")
+    penalty_grid = np.asarray(penalty_grid, dtype=np.float64)
+    num_columns = solver.growth_lower_bounds.get_num_columns()
+    path = RegularizationPath(penalty_grid=penalty_grid, columns_names=solver.growth_lower_bounds.columns_names,
+                              reactions_ids=solver.reactions_ids)
+    biomass_objective = solver.non_growth_problem.objective_vector
+    penalty_weights = solver.growth_problem.penalty_weights
+    path_problem = SplitFluxProblem(stoichiometry_matrix=solver.stoichiometry_matrix,
+                                    objective_vector=biomass_objective, penalty_weights=penalty_weights)
+    problem_solver = IncrementalProblemSolver(problem=path_problem, solver_options=solver.solver_options)
+    points_active_indexes = [np.zeros(0, dtype=np.int64)] * (len(penalty_grid) * num_columns)
+    for column_index in order_columns_by_deltas(solver.growth_lower_bounds, solver.growth_upper_bounds):
+        lower_bounds = solver.growth_lower_bounds.get_column(column_index)
+        upper_bounds = solver.growth_upper_bounds.get_column(column_index)
+        for penalty_index, penalty in enumerate(penalty_grid):
+            problem_solver.set_objective(objective_vector=biomass_objective, penalty_weights=penalty * penalty_weights)
+            status, objective_value, fluxes, _ = problem_solver.solve(lower_bounds, upper_bounds)
+            path.statuses_codes[penalty_index, column_index] = STATUSES_CODES[status]
+            if fluxes is None:
+                continue
+            path.objective_values[penalty_index, column_index] = objective_value
+            path.biomass_fluxes[penalty_index, column_index] = fluxes[solver.biomass_index]
+            is_active = (np.abs(fluxes) >= solver.flux_tolerance) & (penalty_weights > 0)
+            points_active_indexes[penalty_index * num_columns + column_index] = np.flatnonzero(is_active)
+    path.set_active_sets(points_active_indexes)
+    if check_non_growth and solver.non_growth_lower_bounds is not None:
+        non_growth_solver = IncrementalProblemSolver(problem=solver.non_growth_problem,
+                                                     solver_options=solver.solver_options)
+        for penalty_index in range(len(penalty_grid)):
+            path.non_growth_consistent_counts[penalty_index] = check_non_growth_columns(
+                solver, path.get_union_active_reactions_indexes(penalty_index), non_growth_solver)
+    return path
@@ -0,0 +1,142 @@
+"""
+NetworkScope
+This code, computes the scope of a network (network expansion) in many bounds columns at once: the metabolites that
+can be produced from the open exchanges (and the seed metabolites) of a column, and the reactions that can fire.
+
+A reaction can fire in a direction allowed by the column's bounds (forward if upper > 0, backward if lower < 0) once
+all its substrates in that direction are in the scope, and then adds its products to the scope. An exchange reaction
+has no substrates in its uptake direction, so the open exchanges start the expansion. The expansion is repeated until
+the scope does not change.
+
+The columns are packed as bitsets (64 columns per np.uint64 word), so that a step of the expansion is one AND-reduction
+over the substrates of each reaction and one OR-reduction over the producing reactions of each metabolite, for all the
+columns together.
+Since the expansion only fires a reaction once all its substrates are in the scope, it misses the fluxes of the cycles
+that are not fed by the exchanges, such as the recycling of the cofactors: with glc + atp -> g6p + adp and
+g6p + adp -> atp + pyr, the LP makes pyr from glc at a steady state, but atp never enters the scope. So the seeds
+should hold a metabolite of each such cycle (e.g. one of each recycled cofactor pair: atp/adp, nad/nadh,
+nadp/nadph); otherwise a metabolite outside the scope may still be made by the LP, whether the network is
+mass-balanced or not.
+"""
+
+import numpy as np
+import scipy.sparse
+
+WORD_BITS = 64
+
+
+def pack_columns(is_set):
+    """
+    :param is_set: A boolean (rows x columns) array
+    :return: The (rows x words) np.uint64 bitsets of the rows, where the bit j of a row is its column j
+    """
+    is_set = np.asarray(is_set, dtype=bool)
+    num_words = -(-is_set.shape[1] // WORD_BITS)
+    packed_bytes = np.packbits(is_set, axis=1, bitorder='little')
+    padded_bytes = np.zeros((is_set.shape[0], num_words * 8), dtype=np.uint8)
+    padded_bytes[:, :packed_bytes.shape[1]] = packed_bytes
+    return padded_bytes.view(np.uint64)
+
+
+def unpack_columns(bitsets, num_columns: int):
+    """
+    :param bitsets: The (rows x words) np.uint64 bitsets made by pack_columns
+    :param num_columns: Number of the columns
+    :return: The boolean (rows x columns) array
+    """
+    packed_bytes = np.ascontiguousarray(bitsets).view(np.uint8)
+    return np.unpackbits(packed_bytes, axis=1, count=num_columns, bitorder='little').astype(bool)
+
+
+def reduce_rows_segments(ufunc, values, indptr, empty_value):
+    """
+    :param ufunc: np.bitwise_and or np.bitwise_or
+    :param values: The (entries x words) bitsets of the CSR entries
+    :param indptr: The CSR indptr of the segments
+    :param empty_value: The bitset of an empty segment
+    :return: The (segments x words) reductions of the segments
+    """
+    segments_sizes = np.diff(indptr)
+    reduced = np.full((len(segments_sizes), values.shape[1]), empty_value, dtype=np.uint64)
+    is_nonempty = segments_sizes > 0
+    if is_nonempty.any():
+        reduced[is_nonempty] = ufunc.reduceat(values, indptr[:-1][is_nonempty], axis=0)
+    return reduced
+
+
+class NetworkScope:
+    def __init__(self, stoichiometry_matrix, seed_metabolites_indexes):
+        """
+        :param stoichiometry_matrix: The (metabolites x reactions) scipy.sparse stoichiometry matrix
+        :param seed_metabolites_indexes: Indexes of the metabolites in the scope of all the columns (e.g. one of each
+                                         recycled cofactor pair)
+        """
+        stoichiometry_matrix = scipy.sparse.csr_matrix(stoichiometry_matrix)
+        self.num_metabolites, self.num_reactions = stoichiometry_matrix.shape
+        self.seed_metabolites_indexes = np.asarray(seed_metabolites_indexes, dtype=np.int64)
+        # ############ The directions: the forward reactions, and then the backward reactions ############
+        consumed = stoichiometry_matrix.multiply(stoichiometry_matrix < 0)
+        produced = stoichiometry_matrix.multiply(stoichiometry_matrix > 0)
+        # (directions x metabolites) substrates, and (metabolites x directions) products
+        self.substrates_matrix = scipy.sparse.csr_matrix(scipy.sparse.vstack([consumed.T, produced.T]) != 0)
+        self.products_matrix = scipy.sparse.csr_matrix(scipy.sparse.hstack([produced, consumed]) != 0)
+        self.substrates_matrix.sort_indices()
+        self.products_matrix.sort_indices()
+
+    def make_allowed_directions(self, lower_bounds, upper_bounds):
+        """
+        :param lower_bounds: A dense (reactions x columns) lower bounds array
+        :param upper_bounds: A dense (reactions x columns) upper bounds array
+        :return: The (directions x words) bitsets of the directions allowed by the bounds
+        """
+        return pack_columns(np.vstack([np.asarray(upper_bounds) > 0, np.asarray(lower_bounds) < 0]))
+
+    def expand(self, lower_bounds, upper_bounds) -> tuple:
+        """
+        This method, expands the scopes of the columns until they do not change
+        :param lower_bounds: A dense (reactions x columns) lower bounds array
+        :param upper_bounds: A dense (reactions x columns) upper bounds array
+        :return: ((metabolites x words) bitsets of the scopes, (directions x words) bitsets of the fired directions)
+        """
+        allowed_directions = self.make_allowed_directions(lower_bounds, upper_bounds)
+        all_columns = ~np.uint64(0)
+        scopes = np.zeros((self.num_metabolites, allowed_directions.shape[1]), dtype=np.uint64)
+        scopes[self.seed_metabolites_indexes] = all_columns
+        while True:
+            fired_directions = reduce_rows_segments(np.bitwise_and, scopes[self.substrates_matrix.indices],
+                                                    self.substrates_matrix.indptr, all_columns) & allowed_directions
+            new_scopes = scopes | reduce_rows_segments(np.bitwise_or, fired_directions[self.products_matrix.indices],
+                                                       self.products_matrix.indptr, np.uint64(0))
+            if np.array_equal(new_scopes, scopes):
+                return scopes, fired_directions
+            scopes = new_scopes
+
+    def get_reachable_metabolites(self, lower_bounds, upper_bounds):
+        """
+        :param lower_bounds: A dense (reactions x columns) lower bounds array
+        :param upper_bounds: A dense (reactions x columns) upper bounds array
+        :return: A boolean (metabolites x columns) array of the metabolites in the scopes of the columns
+        """
+        scopes, _ = self.expand(lower_bounds, upper_bounds)
+        return unpack_columns(scopes, np.shape(lower_bounds)[1])
+
+    def get_reachable_reactions(self, lower_bounds, upper_bounds):
+        """
+        :param lower_bounds: A dense (reactions x columns) lower bounds array
+        :param upper_bounds: A dense (reactions x columns) upper bounds array
+        :return: A boolean (reactions x columns) array of the reactions that can fire (in any direction) in the columns
+        """
+        _, fired_directions = self.expand(lower_bounds, upper_bounds)
+        fired_reactions = fired_directions[:self.num_reactions] | fired_directions[self.num_reactions:]
+        return unpack_columns(fired_reactions, np.shape(lower_bounds)[1])
+
+    def find_unreachable_columns(self, lower_bounds, upper_bounds, rxn_index: int):
+        """
+        :param lower_bounds: A dense (reactions x columns) lower bounds array
+        :param upper_bounds: A dense (reactions x columns) upper bounds array
+        :param rxn_index: The index of a reaction (e.g. the biomass)
+        :return: A boolean array flagging the columns where the reaction cannot fire forward, since some of its
+                 substrates (e.g. the biomass precursors) are not reachable
+        """
+        _, fired_directions = self.expand(lower_bounds, upper_bounds)
+        return ~unpack_columns(fired_directions[[rxn_index]], np.shape(lower_bounds)[1])[0]
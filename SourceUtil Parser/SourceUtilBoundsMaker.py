@@ -9,13 +9,19 @@ and produces four .csv files as Growth Utilization Exchange Bounds:
     3. non-growth lower bounds
     4. non-growth upper bounds.
 
+make_all_bounds makes all four of them in a single pass over the sources utilization data, and
+make_all_base_delta_bounds keeps them as one base vector per medium plus sparse uptake deltas (see SparseBounds).
 For more information, see the document.
 """
 
 import json
 import warnings
+import numpy as np
 import pandas as pd
 import os
+from SparseBounds import BaseDeltaBounds
+from BoundsMatrixStore import save_bounds_dataframe
+from MediaBounds import make_bounds_dataframe, make_media_base_bounds
 
 
 def find_exchange_by_name(metabolite_name, all_exchange_names):
@@ -73,6 +79,15 @@ class SourceUtilBoundsMaker:
         self.growth_upper_bounds = None
         self.non_growth_lower_bounds = None
         self.non_growth_upper_bounds = None
+        # ############ Index-based bounds ############
+        self.all_reactions_ids = None
+        self.reactions_index_map = None
+        self.exchanges_index_map = None
+        self.media_base_bounds = None
+        self.growth_lower_base_delta = None
+        self.growth_upper_base_delta = None
+        self.non_growth_lower_base_delta = None
+        self.non_growth_upper_base_delta = None
 
     def load_sources_util(self):
         """
@@ -189,19 +204,139 @@ class SourceUtilBoundsMaker:
                 self.non_growth_upper_bounds['u' + new_column_name] = total_bounds_df['Upper Bound'].tolist()
                 counter += 1
 
-    def save_all_bounds(self, folder_to_save):
+    def make_base_bounds_vectors(self):
+        """
+        This method, loads the media bounds once, and makes the base (internal + exchange) lower and upper
+        bounds vectors of each medium, with a hash index from the reactions ids into the rows.
+        :return: -. Filling self.all_reactions_ids, self.reactions_index_map, and self.media_base_bounds
+        """
+        self.load_media_bounds()
+        self.all_reactions_ids, self.exchanges_ids_list, self.media_base_bounds = make_media_base_bounds(
+            internal_rxns_df=self.internal_rxns_df, media_dict=self.media_dict,
+            exchanges_ids_list=self.exchanges_ids_list)
+        self.reactions_index_map = {rxn_id: row_index for row_index, rxn_id in enumerate(self.all_reactions_ids)}
+        # Exchange rows are looked up among the exchanges only, like modify_uptakes
+        num_internals = len(self.internal_rxns_df)
+        self.exchanges_index_map = {rxn_id: num_internals + exchange_index
+                                    for exchange_index, rxn_id in enumerate(self.exchanges_ids_list)}
+
+    def route_sources_experiments(self) -> dict:
+        """
+        This method, resolves the uptake rows of all experiments of self.sources_util in one pass,
+        routing each experiment into the columns of its growth status.
+        :return: A dict in the format of
+                 {growth: (columns_media, columns_names, uptake_rows_indexes, uptake_columns_indexes)}
+        """
+        if self.media_base_bounds is None:
+            self.make_base_bounds_vectors()
+        routed_experiments = {True: ([], [], [], []), False: ([], [], [], [])}
+        for source_data in self.sources_util:
+            if source_data['medium'] not in self.media_base_bounds.keys():
+                warnings.warn("medium " + source_data['medium'] + " not specified")
+                continue
+            columns_media, columns_names, uptake_rows_indexes, uptake_columns_indexes = \
+                routed_experiments[bool(source_data['growth'])]
+            for source_id in source_data['sources_id']:
+                exchange_id = find_exchange_by_name(source_id, self.exchanges_index_map)
+                uptake_rows_indexes.append(self.exchanges_index_map[exchange_id])
+                uptake_columns_indexes.append(len(columns_media))
+            confidence_str = '1'
+            if 'confidence_sc' in source_data.keys():
+                confidence_str = str(source_data['confidence_sc'])
+            columns_names.append(str(len(columns_media) + 1) + ', confidence: ' + confidence_str)
+            columns_media.append(source_data['medium'])
+        return routed_experiments
+
+    def make_all_bounds(self):
+        """
+        This method, makes growth and non-growth bounds together: the media are read once, the base bounds are
+        computed once per medium, and each experiment is routed into the growth or non-growth bounds in one pass.
+        :return: -. Filling self.growth_lower_bounds, self.growth_upper_bounds,
+                    self.non_growth_lower_bounds, and self.non_growth_upper_bounds
+        """
+        self.make_base_bounds_vectors()
+        routed_experiments = self.route_sources_experiments()
+        # ############## Filling the preallocated matrices of each growth status ##############
+        num_reactions = len(self.all_reactions_ids)
+        growth_bounds = {}
+        for growth, (columns_media, columns_names, uptake_rows_indexes, uptake_columns_indexes) \
+                in routed_experiments.items():
+            lower_bounds_matrix = np.empty((num_reactions, len(columns_media)))
+            upper_bounds_matrix = np.empty((num_reactions, len(columns_media)))
+            columns_media = np.array(columns_media, dtype=object)
+            for medium_name, (lower_bounds_vector, upper_bounds_vector) in self.media_base_bounds.items():
+                medium_columns = np.flatnonzero(columns_media == medium_name)
+                lower_bounds_matrix[:, medium_columns] = lower_bounds_vector[:, np.newaxis]
+                upper_bounds_matrix[:, medium_columns] = upper_bounds_vector[:, np.newaxis]
+            # Setting the lower bounds for the sources to -5:
+            lower_bounds_matrix[uptake_rows_indexes, uptake_columns_indexes] = -5
+            growth_bounds[growth] = (
+                make_bounds_dataframe(self.all_reactions_ids, lower_bounds_matrix,
+                                      ['l' + column_name for column_name in columns_names]),
+                make_bounds_dataframe(self.all_reactions_ids, upper_bounds_matrix,
+                                      ['u' + column_name for column_name in columns_names]))
+        self.growth_lower_bounds, self.growth_upper_bounds = growth_bounds[True]
+        self.non_growth_lower_bounds, self.non_growth_upper_bounds = growth_bounds[False]
+
+    def make_all_base_delta_bounds(self):
+        """
+        The base-plus-delta version of self.make_all_bounds, with no dense column materialized (see SparseBounds).
+        :return: -. Filling the growth and non-growth BaseDeltaBounds
+        """
+        self.make_base_bounds_vectors()
+        routed_experiments = self.route_sources_experiments()
+        growth_bounds = {}
+        for growth, (columns_media, columns_names, uptake_rows_indexes, uptake_columns_indexes) \
+                in routed_experiments.items():
+            lower_base_delta = BaseDeltaBounds(reactions_ids=self.all_reactions_ids)
+            upper_base_delta = BaseDeltaBounds(reactions_ids=self.all_reactions_ids)
+            for medium_name, (lower_bounds_vector, upper_bounds_vector) in self.media_base_bounds.items():
+                lower_base_delta.add_base(base_name=medium_name, base_vector=lower_bounds_vector)
+                upper_base_delta.add_base(base_name=medium_name, base_vector=upper_bounds_vector)
+            # The lower bounds for the sources are -5, and the upper bounds are the same as the base
+            lower_base_delta.add_columns(columns_names=['l' + column_name for column_name in columns_names],
+                                         columns_bases_names=columns_media,
+                                         delta_rows=uptake_rows_indexes, delta_columns=uptake_columns_indexes,
+                                         delta_values=np.full(len(uptake_rows_indexes), -5.0))
+            upper_base_delta.add_columns(columns_names=['u' + column_name for column_name in columns_names],
+                                         columns_bases_names=columns_media,
+                                         delta_rows=[], delta_columns=[], delta_values=[])
+            growth_bounds[growth] = (lower_base_delta, upper_base_delta)
+        self.growth_lower_base_delta, self.growth_upper_base_delta = growth_bounds[True]
+        self.non_growth_lower_base_delta, self.non_growth_upper_base_delta = growth_bounds[False]
+
+    def save_all_base_delta_bounds(self, folder_to_save):
+        """
+        :param folder_to_save: Folder path to save all four growth and non-growth base-plus-delta bounds (.npz)
+        :return: -
+        """
+        if not os.path.exists(folder_to_save):
+            os.makedirs(folder_to_save)
+        self.growth_lower_base_delta.save(folder_to_save + 'g_lower_bounds.npz')
+        self.growth_upper_base_delta.save(folder_to_save + 'g_upper_bounds.npz')
+        self.non_growth_lower_base_delta.save(folder_to_save + 'ng_lower_bounds.npz')
+        self.non_growth_upper_base_delta.save(folder_to_save + 'ng_upper_bounds.npz')
+
+    def save_all_bounds(self, folder_to_save, file_format='csv', binary_dtype=np.float64):
+        """
+        :param folder_to_save: Folder path to save all four growth and non-growth bound
+        :param file_format: "csv" for .csv files, or "binary" for BoundsMatrixStore folders (.bounds)
+        :param binary_dtype: The data type of the binary stores, np.float64 or np.float32
+        :return: -
+        """
         if not os.path.exists(folder_to_save):
             os.makedirs(folder_to_save)
-        self.growth_lower_bounds.to_csv(folder_to_save + 'g_lower_bounds.csv', index=False)
-        self.growth_upper_bounds.to_csv(folder_to_save + 'g_upper_bounds.csv', index=False)
-        self.non_growth_lower_bounds.to_csv(folder_to_save + 'ng_lower_bounds.csv', index=False)
-        self.non_growth_upper_bounds.to_csv(folder_to_save + 'ng_upper_bounds.csv', index=False)
+        for bounds_df, filename in [(self.growth_lower_bounds, 'g_lower_bounds'),
+                                    (self.growth_upper_bounds, 'g_upper_bounds'),
+                                    (self.non_growth_lower_bounds, 'ng_lower_bounds'),
+                                    (self.non_growth_upper_bounds, 'ng_upper_bounds')]:
+            save_bounds_dataframe(bounds_df=bounds_df, filepath_prefix=folder_to_save + filename,
+                                  file_format=file_format, dtype=binary_dtype)
 
 
 media_filepath_dict1 = {'minimal_media': "../Data/Palsson B.Subtilis Reconstruction/Biolog_Medium_Bounds.csv"}
 obj = SourceUtilBoundsMaker(sources_util_filepath="../../Data/Palsson B.Subtilis Reconstruction/Growth_Biolog.json",
                             media_filepath_dict=media_filepath_dict1,
                             internal_rxns_filepath="../../Data/Palsson B.Subtilis Reconstruction/Internal_Rxns_Bounds.csv")
-obj.make_growth_bounds()
-obj.make_non_growth_bounds()
+obj.make_all_bounds()
 obj.save_all_bounds(folder_to_save="../Data/Palsson B.Subtilis Reconstruction/Util Bounds/")
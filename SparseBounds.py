@@ -0,0 +1,249 @@
+"""
+SparseBounds
+This code, provides a class to keep the bounds of many experiments columns as one dense base vector per medium
+plus a sparse (COO) delta per experiment column, since each KO or source utilization column differs from its
+medium's base bounds only in a handful of rows.
+
+Dense columns are materialized only when a consumer asks for them (get_column, to_dense, to_dataframe),
+and the bounds are saved and loaded as a single .npz file.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class BaseDeltaBounds:
+    def __init__(self, reactions_ids: list):
+        """
+        :param reactions_ids: List of the reactions ids, i.e. the rows of all bounds columns
+        """
+        self.reactions_ids = list(reactions_ids)
+        self.reactions_index_map = {rxn_id: row_index for row_index, rxn_id in enumerate(self.reactions_ids)}
+        # ############ Base vectors ############
+        self.bases_names = []
+        self.bases_matrix = np.zeros((len(self.reactions_ids), 0))  # (reactions x bases)
+        # ############ Columns ############
+        self.columns_names = []
+        self.columns_bases = np.zeros(0, dtype=np.int32)  # column --> base index
+        # ############ COO deltas, sorted by column ############
+        self.delta_rows = np.zeros(0, dtype=np.int32)
+        self.delta_columns = np.zeros(0, dtype=np.int32)
+        self.delta_values = np.zeros(0)
+
+    def get_num_columns(self) -> int:
+        return len(self.columns_names)
+
+    def add_base(self, base_name: str, base_vector) -> int:
+        """
+        :param base_name: The name of the base (e.g. the medium name)
+        :param base_vector: The base bounds of all the reactions
+        :return: The index of the added (or replaced) base
+        """
+        base_vector = np.asarray(base_vector, dtype=float)
+        if base_vector.shape != (len(self.reactions_ids),):
+            raise ValueError("The base vector of " + base_name + " does not match the reactions")
+        if base_name in self.bases_names:
+            base_index = self.bases_names.index(base_name)
+            self.bases_matrix[:, base_index] = base_vector
+        else:
+            base_index = len(self.bases_names)
+            self.bases_names.append(base_name)
+            self.bases_matrix = np.column_stack([self.bases_matrix, base_vector])
+        return base_index
+
+    def add_columns(self, columns_names: list, columns_bases_names: list,
+                    delta_rows, delta_columns, delta_values):
+        """
+        :param columns_names: Names of the new columns
+        :param columns_bases_names: The base name of each new column
+        :param delta_rows: Row indexes of the deltas
+        :param delta_columns: Column indexes of the deltas, counted among the new columns (from 0)
+        :param delta_values: Values of the deltas. For repeated (row, column) pairs, the last one is effective.
+        :return: -. Appends the new columns
+        """
+        bases_index_map = {base_name: base_index for base_index, base_name in enumerate(self.bases_names)}
+        new_columns_bases = np.array([bases_index_map[base_name] for base_name in columns_bases_names],
+                                     dtype=np.int32)
+        delta_columns = np.asarray(delta_columns, dtype=np.int32) + len(self.columns_names)
+        sorting_order = np.argsort(delta_columns, kind='stable')
+        self.columns_names = self.columns_names + list(columns_names)
+        self.columns_bases = np.concatenate([self.columns_bases, new_columns_bases])
+        self.delta_rows = np.concatenate([self.delta_rows, np.asarray(delta_rows, dtype=np.int32)[sorting_order]])
+        self.delta_columns = np.concatenate([self.delta_columns, delta_columns[sorting_order]])
+        self.delta_values = np.concatenate([self.delta_values, np.asarray(delta_values, dtype=float)[sorting_order]])
+
+    def get_column(self, column_index: int):
+        """
+        :param column_index: The index of a column
+        :return: The dense bounds vector of the column
+        """
+        column_vector = self.bases_matrix[:, self.columns_bases[column_index]].copy()
+        start, end = np.searchsorted(self.delta_columns, [column_index, column_index + 1])
+        column_vector[self.delta_rows[start:end]] = self.delta_values[start:end]
+        return column_vector
+
+    def to_dense(self, columns_indexes=None):
+        """
+        :param columns_indexes: Indexes of the desired columns, all the columns if None
+        :return: A dense (reactions x columns) matrix
+        """
+        if columns_indexes is None:
+            columns_indexes = np.arange(len(self.columns_names))
+        columns_indexes = np.asarray(columns_indexes, dtype=np.int64)
+        dense_matrix = self.bases_matrix[:, self.columns_bases[columns_indexes]]
+        local_columns = np.full(len(self.columns_names), -1, dtype=np.int64)
+        local_columns[columns_indexes] = np.arange(len(columns_indexes))
+        delta_local_columns = local_columns[self.delta_columns]
+        is_selected = delta_local_columns >= 0
+        dense_matrix[self.delta_rows[is_selected], delta_local_columns[is_selected]] = self.delta_values[is_selected]
+        return dense_matrix
+
+    def to_dataframe(self, columns_indexes=None):
+        """
+        :param columns_indexes: Indexes of the desired columns, all the columns if None
+        :return: A DataFrame in the format of the bounds .csv files: the 'ID' column followed by the columns
+        """
+        if columns_indexes is None:
+            columns_indexes = range(len(self.columns_names))
+        bounds_df = pd.DataFrame(self.to_dense(columns_indexes=columns_indexes),
+                                 columns=[self.columns_names[column_index] for column_index in columns_indexes])
+        bounds_df.insert(0, 'ID', self.reactions_ids)
+        return bounds_df
+
+    def set_row_value(self, rxn_id: str, value: float):
+        """
+        This method, sets the bound of a reaction in all the columns (e.g. for the biomass reaction)
+        :param rxn_id: The reaction id
+        :param value: The new bound value
+        :return: -
+        """
+        row_index = self.reactions_index_map[rxn_id]
+        self.bases_matrix[row_index, :] = value
+        is_kept = self.delta_rows != row_index
+        self.delta_rows = self.delta_rows[is_kept]
+        self.delta_columns = self.delta_columns[is_kept]
+        self.delta_values = self.delta_values[is_kept]
+
+    def select_rows(self, rows_indexes):
+        """
+        :param rows_indexes: Indexes of the rows to be kept, in the order of the new rows
+        :return: The bounds of the selected rows (e.g. the reactions kept after pruning), as a new BaseDeltaBounds
+        """
+        rows_indexes = np.asarray(rows_indexes, dtype=np.int64)
+        selected_bounds = BaseDeltaBounds(reactions_ids=[self.reactions_ids[row_index] for row_index in rows_indexes])
+        selected_bounds.bases_names = list(self.bases_names)
+        selected_bounds.bases_matrix = self.bases_matrix[rows_indexes, :]
+        selected_bounds.columns_names = list(self.columns_names)
+        selected_bounds.columns_bases = self.columns_bases.copy()
+        new_rows = np.full(len(self.reactions_ids), -1, dtype=np.int64)
+        new_rows[rows_indexes] = np.arange(len(rows_indexes))
+        is_kept = new_rows[self.delta_rows] >= 0
+        selected_bounds.delta_rows = new_rows[self.delta_rows[is_kept]].astype(np.int32)
+        selected_bounds.delta_columns = self.delta_columns[is_kept]
+        selected_bounds.delta_values = self.delta_values[is_kept]
+        return selected_bounds
+
+    def place_rows(self, source_rows, target_rows, target_reactions_ids: list, target_default_vector):
+        """
+        This method, places these bounds onto another list of reactions (e.g. the template), keeping the
+        base-plus-delta form.
+        :param source_rows: Row indexes in these bounds
+        :param target_rows: The corresponding row indexes in the target_reactions_ids.
+                            If a target row is repeated, its last source row is effective.
+        :param target_reactions_ids: List of the target reactions ids
+        :param target_default_vector: Default bounds of the target reactions, for the rows not placed
+        :return: The placed bounds, as a new BaseDeltaBounds
+        """
+        source_rows = np.asarray(source_rows, dtype=np.int64)
+        target_rows = np.asarray(target_rows, dtype=np.int64)
+        # ########### Keeping the last source of each target row ###########
+        target_sources = np.full(len(target_reactions_ids), -1, dtype=np.int64)
+        target_sources[target_rows] = source_rows
+        placed_target_rows = np.flatnonzero(target_sources >= 0)
+        placed_source_rows = target_sources[placed_target_rows]
+        # ########################## Placing ##########################
+        placed_bounds = BaseDeltaBounds(reactions_ids=target_reactions_ids)
+        target_default_vector = np.asarray(target_default_vector, dtype=float)
+        for base_index, base_name in enumerate(self.bases_names):
+            base_vector = target_default_vector.copy()
+            base_vector[placed_target_rows] = self.bases_matrix[placed_source_rows, base_index]
+            placed_bounds.add_base(base_name=base_name, base_vector=base_vector)
+        # A source row can be placed on several target rows
+        source_targets_order = np.argsort(placed_source_rows, kind='stable')
+        sorted_sources = placed_source_rows[source_targets_order]
+        starts = np.searchsorted(sorted_sources, self.delta_rows, side='left')
+        ends = np.searchsorted(sorted_sources, self.delta_rows, side='right')
+        repeats = ends - starts
+        delta_indexes = np.repeat(np.arange(len(self.delta_rows)), repeats)
+        offsets = np.arange(len(delta_indexes)) - np.repeat(np.cumsum(repeats) - repeats, repeats)
+        placed_delta_rows = placed_target_rows[source_targets_order[np.repeat(starts, repeats) + offsets]]
+        placed_bounds.add_columns(columns_names=self.columns_names,
+                                  columns_bases_names=[self.bases_names[base_index]
+                                                       for base_index in self.columns_bases],
+                                  delta_rows=placed_delta_rows,
+                                  delta_columns=self.delta_columns[delta_indexes],
+                                  delta_values=self.delta_values[delta_indexes])
+        return placed_bounds
+
+    def save(self, filepath: str):
+        """
+        :param filepath: The path to save the bounds as a .npz file
+        :return: -
+        """
+        np.savez_compressed(filepath,
+                            reactions_ids=np.array(self.reactions_ids, dtype=str),
+                            bases_names=np.array(self.bases_names, dtype=str),
+                            bases_matrix=self.bases_matrix,
+                            columns_names=np.array(self.columns_names, dtype=str),
+                            columns_bases=self.columns_bases,
+                            delta_rows=self.delta_rows,
+                            delta_columns=self.delta_columns,
+                            delta_values=self.delta_values)
+
+    @classmethod
+    def load(cls, filepath: str):
+        """
+        :param filepath: The path of a .npz file saved by BaseDeltaBounds.save
+        :return: The loaded BaseDeltaBounds
+        """
+        with np.load(filepath, allow_pickle=False) as npz_file:
+            bounds = cls(reactions_ids=npz_file['reactions_ids'].tolist())
+            bounds.bases_names = npz_file['bases_names'].tolist()
+            bounds.bases_matrix = npz_file['bases_matrix']
+            bounds.columns_names = npz_file['columns_names'].tolist()
+            bounds.columns_bases = npz_file['columns_bases']
+            bounds.delta_rows = npz_file['delta_rows']
+            bounds.delta_columns = npz_file['delta_columns']
+            bounds.delta_values = npz_file['delta_values']
+        return bounds
+
+    @classmethod
+    def concatenate(cls, bounds_list: list):
+        """
+        :param bounds_list: List of BaseDeltaBounds with identical reactions ids
+        :return: A BaseDeltaBounds with all the columns of bounds_list, in order
+        """
+        merged_bounds = cls(reactions_ids=bounds_list[0].reactions_ids)
+        for bounds in bounds_list:
+            if bounds.reactions_ids != merged_bounds.reactions_ids:
+                raise ValueError("Reactions of the merged bounds are not identical")
+            merged_bases_names = []
+            for base_index, base_name in enumerate(bounds.bases_names):
+                base_vector = bounds.bases_matrix[:, base_index]
+                merged_base_name = base_name
+                suffix_number = 1
+                # Bases with identical names but different bounds are kept apart
+                while merged_base_name in merged_bounds.bases_names and not np.array_equal(
+                        merged_bounds.bases_matrix[:, merged_bounds.bases_names.index(merged_base_name)],
+                        base_vector):
+                    suffix_number += 1
+                    merged_base_name = base_name + ' (' + str(suffix_number) + ')'
+                merged_bounds.add_base(base_name=merged_base_name, base_vector=base_vector)
+                merged_bases_names.append(merged_base_name)
+            merged_bounds.add_columns(columns_names=bounds.columns_names,
+                                      columns_bases_names=[merged_bases_names[base_index]
+                                                           for base_index in bounds.columns_bases],
+                                      delta_rows=bounds.delta_rows,
+                                      delta_columns=bounds.delta_columns,
+                                      delta_values=bounds.delta_values)
+        return merged_bounds
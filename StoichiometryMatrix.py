@@ -0,0 +1,70 @@
+"""
+StoichiometryMatrix
+This code, builds the (metabolites x reactions) stoichiometry matrix as a scipy.sparse matrix, and saves/loads it as
+a binary .npz file (scipy.sparse.save_npz), so that the solver can use it without re-parsing a triplet .csv file.
+"""
+
+import numpy as np
+import pandas as pd
+import scipy.sparse
+
+
+def make_stoichiometry_matrix(stoichiometric_data: dict, reactions_index_map: dict, metabolites_index_map: dict):
+    """
+    :param stoichiometric_data: Dict in the format of {rxn_id: {met_id: stoichiometric coefficient}}
+    :param reactions_index_map: indexes assigned to the reactions (columns)
+    :param metabolites_index_map: indexes assigned to the metabolites (rows)
+    :return: The stoichiometry matrix as a scipy.sparse CSC matrix
+    """
+    num_entries = sum(len(metabolites) for metabolites in stoichiometric_data.values())
+    rows_indexes = np.empty(num_entries, dtype=np.int32)
+    cols_indexes = np.empty(num_entries, dtype=np.int32)
+    coefficients = np.empty(num_entries, dtype=np.float64)
+    entry_index = 0
+    for rxn_id, metabolites in stoichiometric_data.items():
+        entry_end = entry_index + len(metabolites)
+        rows_indexes[entry_index:entry_end] = [metabolites_index_map[metabolite] for metabolite in metabolites]
+        cols_indexes[entry_index:entry_end] = reactions_index_map[rxn_id]
+        coefficients[entry_index:entry_end] = list(metabolites.values())
+        entry_index = entry_end
+    return scipy.sparse.csc_matrix((coefficients, (rows_indexes, cols_indexes)),
+                                   shape=(len(metabolites_index_map), len(reactions_index_map)))
+
+
+def make_triplets_dataframe(stoichiometry_matrix):
+    """
+    :param stoichiometry_matrix: A scipy.sparse stoichiometry matrix
+    :return: A DataFrame with three columns of met_id, rxn_id, and coeff (the format of S.csv)
+    """
+    coo_matrix = stoichiometry_matrix.tocoo()
+    return pd.DataFrame({'met_id': coo_matrix.row,
+                         'rxn_id': coo_matrix.col,
+                         'coeff': coo_matrix.data})
+
+
+def save_stoichiometry_matrix(stoichiometry_matrix, filepath: str):
+    """
+    :param stoichiometry_matrix: A scipy.sparse stoichiometry matrix
+    :param filepath: The path to save the matrix as a .npz file
+    :return: -
+    """
+    scipy.sparse.save_npz(filepath, scipy.sparse.csc_matrix(stoichiometry_matrix))
+
+
+def load_stoichiometry_matrix(filepath: str, matrix_format: str = 'csc', shape: tuple = None):
+    """
+    :param filepath: The path for S.npz (saved by save_stoichiometry_matrix), or a triplet S.csv file
+    :param matrix_format: 'csc' or 'csr'
+    :param shape: (number of metabolites, number of reactions) for a S.csv file, since trailing empty rows and columns
+                  are not present in the triplets. Inferred from the triplets if None.
+    :return: The stoichiometry matrix as a scipy.sparse matrix in the matrix_format
+    """
+    if filepath.endswith('.csv'):
+        triplets = pd.read_csv(filepath)
+        stoichiometry_matrix = scipy.sparse.coo_matrix((triplets['coeff'].to_numpy(dtype=np.float64),
+                                                        (triplets['met_id'].to_numpy(dtype=np.int32),
+                                                         triplets['rxn_id'].to_numpy(dtype=np.int32))),
+                                                       shape=shape)
+    else:
+        stoichiometry_matrix = scipy.sparse.load_npz(filepath)
+    return stoichiometry_matrix.asformat(matrix_format)
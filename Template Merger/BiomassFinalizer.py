@@ -1,10 +1,27 @@
 """
 This code, finalizes the stoichiomety matrix and bounds based on the biomass reaction necessary for growth constraints.
+The template bounds can be either .csv files, binary .bounds stores (see BoundsMatrixStore),
+or base-plus-delta .npz files (see SparseBounds). The .bounds stores are finalized as views of their rows
+(see BoundsMatrixStore.BoundsStoreView), whose columns are read chunk by chunk.
+Optionally, the template reactions that cannot fire in any medium (see NetworkScope), and that are confirmed to be
+blocked by the union LP of all the columns, are pruned before saving. "expansion_map.npz" (see ExpansionMap) maps the
+kept reactions back to the template reactions, and "pruning_index_map.json" maps the template reactions ids to their
+indexes among the kept reactions (null for the pruned reactions).
 """
 
-import pandas as pd
 import json
 import os
+import numpy as np
+import scipy.sparse
+from SparseBounds import BaseDeltaBounds
+from BoundsMatrixStore import BoundsMatrixStore, BoundsStoreView, is_bounds_store_path, read_bounds_dataframe, \
+    save_bounds_dataframe, save_bounds_view
+from StoichiometryMatrix import make_stoichiometry_matrix, make_triplets_dataframe, save_stoichiometry_matrix
+from NetworkScope import NetworkScope
+from ExpansionMap import ExpansionMap
+from NetworkCompressor import find_lp_blocked_reactions
+
+PRUNING_INDEX_MAP_FILENAME = 'pruning_index_map.json'
 
 
 class BiomassFinalizer:
@@ -16,7 +33,11 @@ class BiomassFinalizer:
                  existing_reactions_filepath: str,
                  biomass_template_id: str = None,
                  biomass_composition_filepath: str = None,
-                 biomass_growth_threshold: float = 1e-6):
+                 biomass_growth_threshold: float = 1e-6,
+                 template_non_growth_lower_bounds_filepath: str = None,
+                 template_non_growth_upper_bounds_filepath: str = None,
+                 prune_by_media_scope: bool = False,
+                 scope_seed_metabolites_ids: list = None):
         """
         :param template_lower_bounds_filepath: The filepath for all_lower_bounds.csv
         :param template_upper_bounds_filepath: The filepath for all_upper_bounds.csv
@@ -26,6 +47,13 @@ class BiomassFinalizer:
         :param biomass_template_id: The ID for the biomass reaction, if present in the template
         :param biomass_composition_filepath: The filepath for biomass_composition.csv
         :param biomass_growth_threshold: The minimum biomass production rate for organism's growth
+        :param template_non_growth_lower_bounds_filepath: The filepath for ng_lower_bounds.csv (optional)
+        :param template_non_growth_upper_bounds_filepath: The filepath for ng_upper_bounds.csv (optional)
+        :param prune_by_media_scope: Whether to prune the reactions that cannot fire in any medium before saving
+                                     (see self.prune_unreachable_reactions)
+        :param scope_seed_metabolites_ids: IDs of the metabolites in the scopes of all the media, required for the
+                                           pruning: a metabolite of each cycle not fed by the exchanges, e.g. one of
+                                           each recycled cofactor pair (atp/adp, nad/nadh, nadp/nadph)
         """
         # #################################################################
         self.all_template_reactions = None
@@ -34,6 +62,12 @@ class BiomassFinalizer:
         self.template_upper_bounds_filepath = template_upper_bounds_filepath
         self.template_placed_upper_bounds = None
         self.load_template_bounds()
+        self.template_non_growth_lower_bounds_filepath = template_non_growth_lower_bounds_filepath
+        self.template_placed_non_growth_lower_bounds = None
+        self.template_non_growth_upper_bounds_filepath = template_non_growth_upper_bounds_filepath
+        self.template_placed_non_growth_upper_bounds = None
+        if template_non_growth_lower_bounds_filepath and template_non_growth_upper_bounds_filepath:
+            self.load_template_non_growth_bounds()
         # ##############################################################
         self.stoichiometric_data_filepath = stoichiometric_data_filepath
         self.stoichiometric_data = None
@@ -51,19 +85,56 @@ class BiomassFinalizer:
         self.biomass_template_id = biomass_template_id
         self.biomass_composition_filepath = biomass_composition_filepath
         self.biomass_growth_threshold = biomass_growth_threshold
+        # #############################################
+        self.prune_by_media_scope = prune_by_media_scope
+        self.scope_seed_metabolites_ids = scope_seed_metabolites_ids
+        self.expansion_map = None
+        self.pruning_index_map = None
+
+    @staticmethod
+    def read_template_bounds(bounds_filepath: str):
+        """
+        :param bounds_filepath: The filepath for template placed bounds .csv (or .bounds, .npz) file
+        :return: (the bounds as a BaseDeltaBounds, a BoundsStoreView, or a DataFrame, the list of the reactions ids)
+        """
+        if bounds_filepath.endswith('.npz'):
+            bounds = BaseDeltaBounds.load(bounds_filepath)
+            return bounds, bounds.reactions_ids
+        if is_bounds_store_path(bounds_filepath):
+            bounds = BoundsStoreView.from_store(BoundsMatrixStore(bounds_filepath))
+            return bounds, bounds.reactions_ids
+        bounds = read_bounds_dataframe(bounds_filepath)
+        return bounds, bounds['ID'].tolist()
 
     def load_template_bounds(self):
         """
-        This method, loads the template bounds .csv file from self.template_lower/upper_bounds_filepath
+        This method, loads the template bounds .csv (or .bounds, .npz) files
+        from self.template_lower/upper_bounds_filepath
         :return: -
         """
-        self.template_placed_lower_bounds = pd.read_csv(self.template_lower_bounds_filepath)
-        self.template_placed_upper_bounds = pd.read_csv(self.template_upper_bounds_filepath)
-        self.all_template_reactions = self.template_placed_lower_bounds['ID'].tolist()
-        if self.all_template_reactions != self.template_placed_upper_bounds['ID'].tolist():
+        self.template_placed_lower_bounds, self.all_template_reactions = \
+            self.read_template_bounds(self.template_lower_bounds_filepath)
+        self.template_placed_upper_bounds, upper_bounds_reactions = \
+            self.read_template_bounds(self.template_upper_bounds_filepath)
+        if self.all_template_reactions != upper_bounds_reactions:
             print("Your lower and upper bounds are not compatible")
             raise Exception
 
+    def load_template_non_growth_bounds(self):
+        """
+        This method, loads the template non-growth bounds .csv (or .bounds, .npz) files
+        from self.template_non_growth_lower/upper_bounds_filepath
+        :return: -
+        """
+        self.template_placed_non_growth_lower_bounds, lower_bounds_reactions = \
+            self.read_template_bounds(self.template_non_growth_lower_bounds_filepath)
+        self.template_placed_non_growth_upper_bounds, upper_bounds_reactions = \
+            self.read_template_bounds(self.template_non_growth_upper_bounds_filepath)
+        if lower_bounds_reactions != self.all_template_reactions or \
+                upper_bounds_reactions != self.all_template_reactions:
+            print("Your growth and non-growth bounds are not compatible")
+            raise Exception
+
     def load_stoichiometric_data(self):
         """
         This method, loads the stoichiometric data .json file from self.stoichiometric_data_filepath
@@ -92,82 +163,253 @@ class BiomassFinalizer:
         # ToDo (Important one!)
         pass
 
+    def set_biomass_bounds(self, lower_bounds, upper_bounds, biomass_lower_bound: float, biomass_upper_bound: float):
+        """
+        This method, sets the biomass bounds in all the columns of lower_bounds and upper_bounds
+        :param lower_bounds: Template placed lower bounds (a BaseDeltaBounds, a BoundsStoreView, or a DataFrame)
+        :param upper_bounds: Template placed upper bounds (a BaseDeltaBounds, a BoundsStoreView, or a DataFrame)
+        :param biomass_lower_bound: The new lower bound of the biomass reaction
+        :param biomass_upper_bound: The new upper bound of the biomass reaction
+        :return: -
+        """
+        if isinstance(lower_bounds, (BaseDeltaBounds, BoundsStoreView)):
+            lower_bounds.set_row_value(rxn_id=self.biomass_template_id, value=biomass_lower_bound)
+            upper_bounds.set_row_value(rxn_id=self.biomass_template_id, value=biomass_upper_bound)
+            return
+        lb_columns = list(lower_bounds.columns)
+        ub_columns = list(upper_bounds.columns)
+        lb_columns.remove('ID')
+        ub_columns.remove('ID')
+        lower_bounds.loc[lower_bounds['ID'] == self.biomass_template_id, lb_columns] = biomass_lower_bound
+        upper_bounds.loc[upper_bounds['ID'] == self.biomass_template_id, ub_columns] = biomass_upper_bound
+
     def finalize_biomass_by_id(self):
         """
         This method, modified the biomass bounds to be (self.biomass_growth_threshold, 1e6)
         in our growth data of self.template_placed_lower_bounds and self.template_placed_upper_bounds.
+        In the non-growth data, the biomass bounds are (0, 1e6), so that the solver can maximize the biomass
+        and compare it to the threshold.
         :return: -
         """
-        lb_columns = list(self.template_placed_lower_bounds.columns)
-        ub_columns = list(self.template_placed_upper_bounds.columns)
-        lb_columns.remove('ID')
-        ub_columns.remove('ID')
-        self.template_placed_lower_bounds.loc[
-            self.template_placed_lower_bounds['ID'] == self.biomass_template_id,
-            lb_columns
-        ] = self.biomass_growth_threshold
-        self.template_placed_upper_bounds.loc[
-            self.template_placed_upper_bounds['ID'] == self.biomass_template_id,
-            ub_columns
-        ] = 1e6
+        self.set_biomass_bounds(lower_bounds=self.template_placed_lower_bounds,
+                                upper_bounds=self.template_placed_upper_bounds,
+                                biomass_lower_bound=self.biomass_growth_threshold,
+                                biomass_upper_bound=1e6)
+        if self.template_placed_non_growth_lower_bounds is not None:
+            self.set_biomass_bounds(lower_bounds=self.template_placed_non_growth_lower_bounds,
+                                    upper_bounds=self.template_placed_non_growth_upper_bounds,
+                                    biomass_lower_bound=0.0,
+                                    biomass_upper_bound=1e6)
+
+    def make_scope_bounds(self, columns_chunk_size: int = 1024) -> tuple:
+        """
+        :param columns_chunk_size: Number of base-plus-delta (or .bounds store) columns materialized at a time
+        :return: (lower bounds, upper bounds, is_zero_feasible): the dense (template reactions x scopes) bounds of the
+                 scopes, one per medium (the widest bounds over the growth and non-growth columns of the medium) for
+                 base-plus-delta bounds, or one per column for DataFrame bounds and BoundsStoreView bounds, and the
+                 flags of the reactions whose bounds allow a zero flux in all the columns
+        """
+        bounds_pairs = [(self.template_placed_lower_bounds, self.template_placed_upper_bounds)]
+        if self.template_placed_non_growth_lower_bounds is not None:
+            bounds_pairs.append((self.template_placed_non_growth_lower_bounds,
+                                 self.template_placed_non_growth_upper_bounds))
+        media_bounds = {}
+        scopes_lower_bounds = []
+        scopes_upper_bounds = []
+        is_zero_feasible = np.ones(len(self.all_template_reactions), dtype=bool)
+        for lower_bounds, upper_bounds in bounds_pairs:
+            if isinstance(lower_bounds, BoundsStoreView):
+                num_columns = lower_bounds.get_num_columns()
+                for chunk_start in range(0, num_columns, columns_chunk_size):
+                    chunk_columns = np.arange(chunk_start, min(chunk_start + columns_chunk_size, num_columns))
+                    chunk_lower = lower_bounds.to_dense(columns_indexes=chunk_columns)
+                    chunk_upper = upper_bounds.to_dense(columns_indexes=chunk_columns)
+                    is_zero_feasible &= (chunk_lower <= 0).all(axis=1) & (chunk_upper >= 0).all(axis=1)
+                    scopes_lower_bounds.append(chunk_lower)
+                    scopes_upper_bounds.append(chunk_upper)
+                continue
+            if not isinstance(lower_bounds, BaseDeltaBounds):
+                lower_matrix = lower_bounds.drop(columns='ID').to_numpy(dtype=float)
+                upper_matrix = upper_bounds.drop(columns='ID').to_numpy(dtype=float)
+                is_zero_feasible &= (lower_matrix <= 0).all(axis=1) & (upper_matrix >= 0).all(axis=1)
+                scopes_lower_bounds.append(lower_matrix)
+                scopes_upper_bounds.append(upper_matrix)
+                continue
+            num_columns = lower_bounds.get_num_columns()
+            for chunk_start in range(0, num_columns, columns_chunk_size):
+                chunk_columns = np.arange(chunk_start, min(chunk_start + columns_chunk_size, num_columns))
+                chunk_lower = lower_bounds.to_dense(columns_indexes=chunk_columns)
+                chunk_upper = upper_bounds.to_dense(columns_indexes=chunk_columns)
+                is_zero_feasible &= (chunk_lower <= 0).all(axis=1) & (chunk_upper >= 0).all(axis=1)
+                chunk_media = np.array([lower_bounds.bases_names[base_index]
+                                        for base_index in lower_bounds.columns_bases[chunk_columns]])
+                for medium_name in np.unique(chunk_media):
+                    is_medium = chunk_media == medium_name
+                    medium_lower = chunk_lower[:, is_medium].min(axis=1)
+                    medium_upper = chunk_upper[:, is_medium].max(axis=1)
+                    if medium_name in media_bounds:
+                        medium_lower = np.minimum(medium_lower, media_bounds[medium_name][0])
+                        medium_upper = np.maximum(medium_upper, media_bounds[medium_name][1])
+                    media_bounds[medium_name] = (medium_lower, medium_upper)
+        for medium_lower, medium_upper in media_bounds.values():
+            scopes_lower_bounds.append(medium_lower[:, np.newaxis])
+            scopes_upper_bounds.append(medium_upper[:, np.newaxis])
+        return np.hstack(scopes_lower_bounds), np.hstack(scopes_upper_bounds), is_zero_feasible
+
+    @staticmethod
+    def select_bounds_rows(bounds, rows_indexes):
+        """
+        :param bounds: Template placed bounds (a BaseDeltaBounds, a BoundsStoreView, or a DataFrame), or None
+        :param rows_indexes: Indexes of the rows to be kept
+        :return: The bounds of the kept rows, in the same format
+        """
+        if bounds is None:
+            return None
+        if isinstance(bounds, (BaseDeltaBounds, BoundsStoreView)):
+            return bounds.select_rows(rows_indexes=rows_indexes)
+        return bounds.iloc[rows_indexes].reset_index(drop=True)
+
+    def prune_unreachable_reactions(self, columns_chunk_size: int = 1024):
+        """
+        This method, drops the template reactions that cannot fire in any medium, i.e. the reactions out of the scopes
+        of all the media (see NetworkScope and self.make_scope_bounds), from the stoichiometric data, the placed
+        bounds, and the existing reactions. The biomass reaction, and the reactions whose bounds exclude a zero flux
+        in some column (so that the infeasible columns stay infeasible) are kept. The metabolites of no kept reaction
+        are dropped as well. Since the scopes miss the cycles not fed by the exchanges (e.g. the cofactors recycling,
+        see NetworkScope), the pruning is refused without the seed metabolites, and, as the pruning cannot be undone,
+        each reaction out of the scopes is only dropped if it cannot carry flux in the union LP of all the columns
+        (see NetworkCompressor.find_lp_blocked_reactions) either.
+        :param columns_chunk_size: Number of base-plus-delta columns materialized at a time
+        :return: -, filling self.expansion_map with the map from the kept reactions back to the template reactions,
+                 and self.pruning_index_map with the indexes of the template reactions among the kept reactions
+        """
+        if not self.scope_seed_metabolites_ids:
+            raise ValueError("The seed metabolites (e.g. the recycled cofactors) are required for the pruning, "
+                             "without them the reactions of the cofactor cycles are pruned")
+        reactions_index_map = {k: v for v, k in enumerate(self.all_template_reactions)}
+        metabolites_index_map = {k: v for v, k in enumerate(self.all_template_metabolites)}
+        stoichiometry_matrix = make_stoichiometry_matrix(stoichiometric_data=self.stoichiometric_data,
+                                                         reactions_index_map=reactions_index_map,
+                                                         metabolites_index_map=metabolites_index_map)
+        scopes_lower_bounds, scopes_upper_bounds, is_zero_feasible = self.make_scope_bounds(
+            columns_chunk_size=columns_chunk_size)
+        network_scope = NetworkScope(stoichiometry_matrix=stoichiometry_matrix,
+                                     seed_metabolites_indexes=[metabolites_index_map[met_id] for met_id
+                                                               in self.scope_seed_metabolites_ids])
+        is_kept = network_scope.get_reachable_reactions(scopes_lower_bounds, scopes_upper_bounds).any(axis=1)
+        is_kept |= ~is_zero_feasible
+        if self.biomass_template_id in reactions_index_map:
+            is_kept[reactions_index_map[self.biomass_template_id]] = True
+        # Any flux of a column is a flux of the union LP, so a reaction blocked in the union LP is blocked in all
+        is_kept |= ~find_lp_blocked_reactions(stoichiometry_matrix=stoichiometry_matrix,
+                                              lower_bounds=scopes_lower_bounds.min(axis=1),
+                                              upper_bounds=scopes_upper_bounds.max(axis=1),
+                                              candidates_indexes=np.flatnonzero(~is_kept))
+        kept_indexes = np.flatnonzero(is_kept)
+        # ############################ The map to the template ############################
+        pruning_matrix = scipy.sparse.csr_matrix((np.ones(len(kept_indexes)), (kept_indexes,
+                                                                               np.arange(len(kept_indexes)))),
+                                                 shape=(len(self.all_template_reactions), len(kept_indexes)))
+        self.expansion_map = ExpansionMap(expansion_matrix=pruning_matrix,
+                                          original_reactions_ids=self.all_template_reactions,
+                                          original_existing_indexes=[reactions_index_map[rxn_id] for rxn_id
+                                                                     in self.existing_rxns_ids])
+        self.pruning_index_map = {rxn_id: None for rxn_id in self.all_template_reactions}
+        for kept_index, rxn_index in enumerate(kept_indexes):
+            self.pruning_index_map[self.all_template_reactions[rxn_index]] = kept_index
+        # ############################ Pruning ############################
+        self.template_placed_lower_bounds = self.select_bounds_rows(self.template_placed_lower_bounds, kept_indexes)
+        self.template_placed_upper_bounds = self.select_bounds_rows(self.template_placed_upper_bounds, kept_indexes)
+        self.template_placed_non_growth_lower_bounds = self.select_bounds_rows(
+            self.template_placed_non_growth_lower_bounds, kept_indexes)
+        self.template_placed_non_growth_upper_bounds = self.select_bounds_rows(
+            self.template_placed_non_growth_upper_bounds, kept_indexes)
+        self.all_template_reactions = [self.all_template_reactions[rxn_index] for rxn_index in kept_indexes]
+        kept_reactions = set(self.all_template_reactions)
+        self.stoichiometric_data = {rxn_id: metabolites for rxn_id, metabolites in self.stoichiometric_data.items()
+                                    if rxn_id in kept_reactions}
+        kept_metabolites = {met_id for metabolites in self.stoichiometric_data.values() for met_id in metabolites}
+        self.all_template_metabolites = [met_id for met_id in self.all_template_metabolites
+                                         if met_id in kept_metabolites]
+        self.existing_rxns_ids = [rxn_id for rxn_id in self.existing_rxns_ids if rxn_id in kept_reactions]
 
     def make_sparse_stoichiometry_matix(self, reactions_index_map: dict, metabolites_index_map: dict):
         """
         This method, parses the self.stoichiometric_data to make the stoichiometry matrix.
         :param reactions_index_map: indexes assigned to the reactions
         :param metabolites_index_map: indexes assigned to the metabolites
-        :return: Filling self.sparse_stoichiometry_matrix with a pandas' DataFrame including three columns of
-                 met_id, rxn_id, and coeff.
-        """
-        rows_indexes = []
-        cols_indexes = []
-        coefficients = []
-        for rxn_id, metabolites in self.stoichiometric_data.items():
-            for metabolite, stoich_coeff in metabolites.items():
-                rows_indexes.append(metabolites_index_map[metabolite])
-                cols_indexes.append(reactions_index_map[rxn_id])
-                coefficients.append(stoich_coeff)
-        self.sparse_stoichiometry_matrix = pd.DataFrame({'met_id': rows_indexes,
-                                                         'rxn_id': cols_indexes,
-                                                         'coeff': coefficients})
-
-    def save_final_data(self, folder_to_save: str):
+        :return: Filling self.sparse_stoichiometry_matrix with a scipy.sparse CSC matrix (metabolites x reactions)
+        """
+        self.sparse_stoichiometry_matrix = make_stoichiometry_matrix(stoichiometric_data=self.stoichiometric_data,
+                                                                     reactions_index_map=reactions_index_map,
+                                                                     metabolites_index_map=metabolites_index_map)
+
+    def save_final_data(self, folder_to_save: str, file_format: str = 'csv', binary_dtype: str = 'float64',
+                        save_stoichiometry_csv: bool = True):
         """
         This method, saves all 5 final files in the folder_to_save:
-            1. "L.csv": finalized self.template_placed_lower_bounds
-            2. "U.csv": finalized self.template_placed_lower_bounds
+            1. "L.csv": finalized self.template_placed_lower_bounds ("L.npz" for base-plus-delta bounds,
+                        "L.bounds" for the binary file_format)
+            2. "U.csv": finalized self.template_placed_lower_bounds ("U.npz" for base-plus-delta bounds,
+                        "U.bounds" for the binary file_format)
             3. "reactions_index_map.json": indexes assigned to the reactions
             4. "metabolites_index_map.json": indexes assigned to the metabolites
-            5. "S.csv": finalized self.sparse_stoichiometry_matrix
+            5. "S.npz": finalized self.sparse_stoichiometry_matrix (see StoichiometryMatrix.load_stoichiometry_matrix),
+               and "S.csv" with the met_id, rxn_id, and coeff triplets if save_stoichiometry_csv
+        plus "ng_L" and "ng_U" (in the format of L and U) if the non-growth bounds are given,
+        and "existing_reactions.json" with the indexes of the existing reactions,
+        and "expansion_map.npz" and "pruning_index_map.json" if the reactions are pruned
+        (see self.prune_unreachable_reactions).
         :param folder_to_save: The folder to save final files.
+        :param file_format: "csv" for .csv bounds, or "binary" for BoundsMatrixStore folders (.bounds)
+        :param binary_dtype: The data type of the binary stores, 'float64' or 'float32'
+        :param save_stoichiometry_csv: Whether to also save the S.csv triplets, for compatibility
         :return: -
         """
         if not os.path.exists(folder_to_save):
             os.makedirs(folder_to_save)
-        self.template_placed_lower_bounds = self.template_placed_lower_bounds.drop(columns=['ID'])
-        self.template_placed_upper_bounds = self.template_placed_upper_bounds.drop(columns=['ID'])
         reactions_index_map = {k: v for v, k in enumerate(self.all_template_reactions)}
         metabolites_index_map = {k: v for v, k in enumerate(self.all_template_metabolites)}
         internal_rxns_indexes = [reactions_index_map[rxn_id] for rxn_id in self.existing_rxns_ids]
         self.make_sparse_stoichiometry_matix(reactions_index_map=reactions_index_map,
                                              metabolites_index_map=metabolites_index_map)
         # ##################################  Saving ####################################
-        self.template_placed_lower_bounds.to_csv(folder_to_save + 'L.csv', index=False)
-        self.template_placed_upper_bounds.to_csv(folder_to_save + 'U.csv', index=False)
+        bounds_to_save = [(self.template_placed_lower_bounds, 'L'), (self.template_placed_upper_bounds, 'U')]
+        if self.template_placed_non_growth_lower_bounds is not None:
+            bounds_to_save += [(self.template_placed_non_growth_lower_bounds, 'ng_L'),
+                               (self.template_placed_non_growth_upper_bounds, 'ng_U')]
+        for bounds, filename in bounds_to_save:
+            if isinstance(bounds, BaseDeltaBounds):
+                bounds.save(folder_to_save + filename + '.npz')
+            elif isinstance(bounds, BoundsStoreView):
+                save_bounds_view(bounds_view=bounds, filepath_prefix=folder_to_save + filename,
+                                 file_format=file_format, dtype=binary_dtype, include_ids=False)
+            else:
+                # L.csv and U.csv are saved without the 'ID' column, rows follow reactions_index_map
+                save_bounds_dataframe(bounds_df=bounds, filepath_prefix=folder_to_save + filename,
+                                      file_format=file_format, dtype=binary_dtype, include_ids=False)
         with open(folder_to_save + 'existing_reactions.json', 'w') as file:
             json.dump(internal_rxns_indexes, file)
         with open(folder_to_save + 'reactions_index_map.json', 'w') as file:
             json.dump(reactions_index_map, file)
         with open(folder_to_save + 'metabolites_index_map.json', 'w') as file:
             json.dump(metabolites_index_map, file)
-        self.sparse_stoichiometry_matrix.to_csv(folder_to_save + 'S.csv', index=False)
+        if self.expansion_map is not None:
+            self.expansion_map.save(folder_to_save)
+            with open(folder_to_save + PRUNING_INDEX_MAP_FILENAME, 'w') as file:
+                json.dump(self.pruning_index_map, file)
+        save_stoichiometry_matrix(stoichiometry_matrix=self.sparse_stoichiometry_matrix,
+                                  filepath=folder_to_save + 'S.npz')
+        if save_stoichiometry_csv:
+            make_triplets_dataframe(self.sparse_stoichiometry_matrix).to_csv(folder_to_save + 'S.csv', index=False)
 
-    def finalize_and_save_data(self, folder_to_save: str):
+    def finalize_and_save_data(self, folder_to_save: str, file_format: str = 'csv'):
         """
         This method, chooses the right function to finalize date based on the biomass information.
         Note that composition information has a priority over the biomass id.
         Also, if neither of those parameters are defined, this method raises an Exception.
-        :param folder_to_save: The folder to save L.csv, U.csv, and S.csv
+        :param folder_to_save: The folder to save L.csv, U.csv, S.npz, and S.csv
+        :param file_format: "csv" for .csv bounds, or "binary" for BoundsMatrixStore folders (L.bounds and U.bounds)
         :return: -
         """
         if self.biomass_composition_filepath:
@@ -178,17 +420,23 @@ class BiomassFinalizer:
             else:
                 print("Neither Biomass_composition nor Biomass_id are defined")
                 raise Exception
-        self.save_final_data(folder_to_save=folder_to_save)
+        if self.prune_by_media_scope:
+            self.prune_unreachable_reactions()
+        self.save_final_data(folder_to_save=folder_to_save, file_format=file_format)
 
 
 lbs_filepath = "../Data/Palsson B.Subtilis Reconstruction/Micro-Template Placed Bounds/lower_bounds.csv"
 ubs_filepath = "../Data/Palsson B.Subtilis Reconstruction/Micro-Template Placed Bounds/upper_bounds.csv"
+ng_lbs_filepath = "../Data/Palsson B.Subtilis Reconstruction/Micro-Template Placed Bounds/ng_lower_bounds.csv"
+ng_ubs_filepath = "../Data/Palsson B.Subtilis Reconstruction/Micro-Template Placed Bounds/ng_upper_bounds.csv"
 stoich_filepath = "../Data/Palsson B.Subtilis Reconstruction/Microbial Template/Microbial Stoichiometric Data.json"
 mets_filepath = "../Data/Palsson B.Subtilis Reconstruction/Microbial Template/Microbial Template Metabolites.json"
 existing_rxns_filepath = "../Data/Palsson B.Subtilis Reconstruction/existing_rxns.json"
 obj = BiomassFinalizer(
     template_lower_bounds_filepath=lbs_filepath,
     template_upper_bounds_filepath=ubs_filepath,
+    template_non_growth_lower_bounds_filepath=ng_lbs_filepath,
+    template_non_growth_upper_bounds_filepath=ng_ubs_filepath,
     stoichiometric_data_filepath=stoich_filepath,
     template_metabolites_filepath=mets_filepath,
     existing_reactions_filepath=existing_rxns_filepath,
@@ -2,10 +2,17 @@
 ReactionsTranslation
 The main class in this script, Translator, builds an object to translate ids of reactions from an input_nomenclature
 into a template_nomenclature.
+The ids in each row of the translation file are kept as one row of equivalent reactions in an index of the rows of
+each id, ReactionsEquivalenceIndex, which can be saved and reloaded for the same translation file. The equivalents of
+an id are the ids sharing a row with it; the rows are not chained into wider classes, since an id listed in two rows
+(e.g. a generic reaction) would join otherwise unrelated reactions.
 """
 
+import os
 import warnings
+import numpy as np
 import pandas as pd
+from FileContentHash import get_file_content_hash
 
 
 def get_cell_str_to_list(cell_str: str):
@@ -108,13 +115,166 @@ def make_general_translation_dict(reactions_translation_filepath: str,
     return general_translation_dict
 
 
+class ReactionsEquivalenceIndex:
+    def __init__(self, source_key: str = ''):
+        """
+        :param source_key: A key denoting the source of the index (the translation file hash and nomenclatures),
+                           used to validate a saved index
+        """
+        self.source_key = source_key
+        self.ids = []
+        self.ids_index_map = {}
+        # The ids indexes of each row of the translation file, and the rows indexes of each id
+        self.rows_members = []
+        self.ids_rows = []
+
+    def get_id_index(self, rxn_id: str) -> int:
+        """
+        :param rxn_id: A reaction id
+        :return: The index of the reaction id, added with no rows if new
+        """
+        id_index = self.ids_index_map.get(rxn_id)
+        if id_index is None:
+            id_index = len(self.ids)
+            self.ids_index_map[rxn_id] = id_index
+            self.ids.append(rxn_id)
+            self.ids_rows.append([])
+        return id_index
+
+    def add_equivalent_ids(self, rxns_ids: list):
+        """
+        :param rxns_ids: List of equivalent reactions ids (a row of the translation file), to be kept as one row
+        :return: -
+        """
+        row_index = len(self.rows_members)
+        row_members = []
+        for rxn_id in rxns_ids:
+            id_index = self.get_id_index(rxn_id)
+            if not self.ids_rows[id_index] or self.ids_rows[id_index][-1] != row_index:
+                self.ids_rows[id_index].append(row_index)
+                row_members.append(id_index)
+        self.rows_members.append(row_members)
+
+    def get_equivalent_indexes(self, rxn_id: str):
+        """
+        This method, finds the ids sharing a row with rxn_id. The rows are not chained: if A~B and B~C come from two
+            rows, A and C are not equivalent (unless they share a row).
+        :param rxn_id: A reaction id
+        :return: The sorted indexes of the ids sharing a row with rxn_id (itself included), or None if rxn_id is not
+                 indexed
+        """
+        id_index = self.ids_index_map.get(rxn_id)
+        if id_index is None:
+            return None
+        equivalent_indexes = set()
+        for row_index in self.ids_rows[id_index]:
+            equivalent_indexes.update(self.rows_members[row_index])
+        return sorted(equivalent_indexes)
+
+    def save(self, filepath: str):
+        """
+        :param filepath: The path to save the index as a .npz file
+        :return: -
+        """
+        rows_indptr = np.cumsum([0] + [len(row_members) for row_members in self.rows_members], dtype=np.int64)
+        rows_members = np.array([id_index for row_members in self.rows_members for id_index in row_members],
+                                dtype=np.int64)
+        np.savez_compressed(filepath,
+                            source_key=np.array(self.source_key),
+                            ids=np.array(self.ids, dtype=str),
+                            rows_indptr=rows_indptr,
+                            rows_members=rows_members)
+
+    @classmethod
+    def load(cls, filepath: str):
+        """
+        :param filepath: The path of a .npz file saved by ReactionsEquivalenceIndex.save
+        :return: The loaded ReactionsEquivalenceIndex, or an empty one (with no source_key) for an index saved in
+                 another format, to be rebuilt
+        """
+        with np.load(filepath, allow_pickle=False) as npz_file:
+            if 'rows_indptr' not in npz_file.files:
+                return cls()
+            equivalence_index = cls(source_key=str(npz_file['source_key']))
+            ids = npz_file['ids'].tolist()
+            rows_indptr = npz_file['rows_indptr'].tolist()
+            rows_members = npz_file['rows_members'].tolist()
+        for rxn_id in ids:
+            equivalence_index.get_id_index(rxn_id)
+        for row_index in range(len(rows_indptr) - 1):
+            row_members = rows_members[rows_indptr[row_index]:rows_indptr[row_index + 1]]
+            equivalence_index.rows_members.append(row_members)
+            for id_index in row_members:
+                equivalence_index.ids_rows[id_index].append(row_index)
+        return equivalence_index
+
+    @classmethod
+    def from_translation_file(cls, reactions_translation_filepath: str, input_reactions_nomenclature: str,
+                              template_reactions_nomenclature: str, source_key: str = ''):
+        """
+        This method, reads reactions_translation_file.csv from reactions_translation_filepath, and keeps the ids of
+            both input_reactions_nomenclature and template_reactions_nomenclature cells of each row as one row
+        :param reactions_translation_filepath: Filepath for the reactions_translation_file.csv
+        :param input_reactions_nomenclature: Source IDs for translation
+        :param template_reactions_nomenclature: Destination IDs for translation
+        :param source_key: See ReactionsEquivalenceIndex.__init__
+        :return: The built ReactionsEquivalenceIndex
+        """
+        translation_file = pd.read_csv(reactions_translation_filepath)
+        if input_reactions_nomenclature not in translation_file.columns:
+            raise KeyError("input_reactions_nomenclature does not exist in translation_file")
+        if template_reactions_nomenclature not in translation_file.columns:
+            raise KeyError("template_reactions_nomenclature does not exist in translation_file")
+        equivalence_index = cls(source_key=source_key)
+        for key_cell, value_cell in zip(translation_file[input_reactions_nomenclature].tolist(),
+                                        translation_file[template_reactions_nomenclature].tolist()):
+            row_ids = []
+            if not pd.isna(key_cell):
+                row_ids += get_cell_str_to_list(cell_str=key_cell)
+            if not pd.isna(value_cell):
+                row_ids += get_cell_str_to_list(cell_str=value_cell)
+            if row_ids:
+                equivalence_index.add_equivalent_ids(row_ids)
+        return equivalence_index
+
+
+def load_reactions_equivalence_index(reactions_translation_filepath: str,
+                                     input_reactions_nomenclature: str,
+                                     template_reactions_nomenclature: str,
+                                     equivalence_index_filepath: str = None) -> ReactionsEquivalenceIndex:
+    """
+    :param reactions_translation_filepath: Filepath for the reactions_translation_file.csv
+    :param input_reactions_nomenclature: Source IDs for translation
+    :param template_reactions_nomenclature: Destination IDs for translation
+    :param equivalence_index_filepath: The .npz filepath of a saved index. If it was saved for another translation
+                                       file (or nomenclatures) or does not exist, the index is built and saved there.
+    :return: ReactionsEquivalenceIndex
+    """
+    source_key = '\n'.join([get_file_content_hash(reactions_translation_filepath),
+                            str(input_reactions_nomenclature),
+                            str(template_reactions_nomenclature)])
+    if equivalence_index_filepath and os.path.exists(equivalence_index_filepath):
+        equivalence_index = ReactionsEquivalenceIndex.load(equivalence_index_filepath)
+        if equivalence_index.source_key == source_key:
+            return equivalence_index
+    equivalence_index = ReactionsEquivalenceIndex.from_translation_file(
+        reactions_translation_filepath=reactions_translation_filepath,
+        input_reactions_nomenclature=input_reactions_nomenclature,
+        template_reactions_nomenclature=template_reactions_nomenclature,
+        source_key=source_key)
+    if equivalence_index_filepath:
+        equivalence_index.save(equivalence_index_filepath)
+    return equivalence_index
+
+
 class Translator:
     def __init__(self,
                  reactions_translation_filepath: str,
                  input_reactions_nomenclature: str,
                  template_reactions_nomenclature: str,
                  list_of_input_reactions: list,
-                 list_of_template_reactions: list):
+                 list_of_template_reactions: list,
+                 equivalence_index_filepath: str = None):
         """
         :param reactions_translation_filepath: The path for the reactions_translation.csv file
         :param input_reactions_nomenclature: The column name in the translation_file
@@ -123,6 +283,8 @@ class Translator:
                                                 corresponding to the template_bounds file
         :param list_of_input_reactions: List of desired reactions to be included in the translation (as keys)
         :param list_of_template_reactions: List of valid ids as translation outputs
+        :param equivalence_index_filepath: The .npz filepath to save (and later reload) the ReactionsEquivalenceIndex
+                                           built from the reactions_translation.csv file
         """
         # ##############################################################
         self.input_reactions_nomenclature = input_reactions_nomenclature
@@ -130,8 +292,11 @@ class Translator:
         # #######################################################
         self.list_of_input_reactions = list_of_input_reactions
         self.list_of_template_reactions = list_of_template_reactions
+        self.template_reactions_set = set(list_of_template_reactions)
         # ################################################################
         self.reactions_translation_filepath = reactions_translation_filepath
+        self.equivalence_index_filepath = equivalence_index_filepath
+        self.equivalence_index = None
         self.translation_dict = {}
         self.make_translation_dict()
 
@@ -140,51 +305,46 @@ class Translator:
         This method, finds corresponding reactions of source_reactions in the destination_reactions.
         :return: Filling self.translation_dict
         """
-        # ############ Building general_translation_dict ############
-        general_translation_dict = {}
+        # ############ Building the equivalence index ############
+        self.equivalence_index = ReactionsEquivalenceIndex()
         if self.reactions_translation_filepath:
-            general_translation_dict = make_general_translation_dict(
+            self.equivalence_index = load_reactions_equivalence_index(
                 reactions_translation_filepath=self.reactions_translation_filepath,
                 input_reactions_nomenclature=self.input_reactions_nomenclature,
-                template_reactions_nomenclature=self.template_reactions_nomenclature
+                template_reactions_nomenclature=self.template_reactions_nomenclature,
+                equivalence_index_filepath=self.equivalence_index_filepath
             )
         # ######## Filling self.translation_dict by self.total_reactions_list one by one #########
         for base_reaction_id in self.list_of_input_reactions:
-            if base_reaction_id in self.list_of_template_reactions:
+            if base_reaction_id in self.template_reactions_set:
                 # No need for translation
                 self.translation_dict[base_reaction_id] = [base_reaction_id]
             else:
                 # Translation needed
                 # ################## Adding some key variations ###################
-                rxn_id_exists = False
-                translated_ids = []
                 # 'X(Y)' --> 'X_Y'  and 'X-Y' --> 'X_Y'
                 variant_base_id = base_reaction_id.replace('-', '_').replace('(', '_').replace(')', '')
-                if base_reaction_id in general_translation_dict.keys():
-                    translated_ids = general_translation_dict[base_reaction_id]
-                    rxn_id_exists = True
-                elif variant_base_id in general_translation_dict.keys():
-                    translated_ids = general_translation_dict[variant_base_id]
-                    rxn_id_exists = True
-                elif variant_base_id + '_' in general_translation_dict.keys():
-                    translated_ids = general_translation_dict[variant_base_id + '_']
-                    rxn_id_exists = True
+                equivalent_indexes = self.equivalence_index.get_equivalent_indexes(base_reaction_id)
+                if equivalent_indexes is None:
+                    equivalent_indexes = self.equivalence_index.get_equivalent_indexes(variant_base_id)
+                if equivalent_indexes is None:
+                    equivalent_indexes = self.equivalence_index.get_equivalent_indexes(variant_base_id + '_')
                 # ################################################################
-                if rxn_id_exists:
-                    # Reaction exists in the general_translation_dict
-                    template_ids = [_rxn_id for _rxn_id in translated_ids
-                                    if _rxn_id in self.list_of_template_reactions]
+                if equivalent_indexes is not None:
+                    # Reaction exists in the equivalence index
+                    template_ids = [self.equivalence_index.ids[id_index] for id_index in equivalent_indexes
+                                    if self.equivalence_index.ids[id_index] in self.template_reactions_set]
                     if template_ids:
-                        # Intersection of translated_ids and self.all_template_reactions is not empty
+                        # Intersection of the equivalent ids and self.all_template_reactions is not empty
                         self.translation_dict[base_reaction_id] = template_ids
                     else:
-                        # The intersection of translated_ids and self.all_template_reactions is empty (# = 172 of 1165)
+                        # The intersection of the equivalent ids and self.all_template_reactions is empty
                         warning_text = "The reaction with ID " + base_reaction_id + \
                                        " does not have any corresponding reaction in the template"
                         warnings.warn(warning_text)
                         self.translation_dict[base_reaction_id] = []
                 else:
-                    # Reaction doesn't exist in the general_translation_dict (# = 43 of 1165)
+                    # Reaction doesn't exist in the equivalence index
                     warn_text = "The reaction " + base_reaction_id + " is not included in your translation file."
                     warnings.warn(warn_text)
                     self.translation_dict[base_reaction_id] = []
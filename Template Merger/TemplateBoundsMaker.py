@@ -1,13 +1,104 @@
 """
 TemplateBoundsMaker
 This code, provides a class to place organism's bounds into the template.
+The bounds files can be either .csv files, binary .bounds stores (see BoundsMatrixStore),
+or base-plus-delta .npz files (see SparseBounds), which are placed onto the template in the same format.
+The .bounds stores are placed as views of their rows (see BoundsMatrixStore.BoundsStoreView), whose columns are only
+read when saved, chunk by chunk.
+The growth and non-growth bounds sets are read once each and placed in one run, with one translation of the ids.
+A reaction id repeated within a bounds file keeps only its last row, with a warning.
 """
 
+import numpy as np
 import pandas as pd
 import warnings
 import os
 import json
 from ReactionsTranslation import Translator
+from SparseBounds import BaseDeltaBounds
+from BoundsMatrixStore import BoundsMatrixStore, BoundsStoreView, is_bounds_store_path, read_bounds_dataframe, \
+    save_bounds_dataframe, save_bounds_view
+
+
+def is_base_delta_filepaths(bounds_filepaths: list) -> bool:
+    """
+    :param bounds_filepaths: List of bounds filepaths
+    :return: True if all the files are base-plus-delta .npz files, and False if all are .csv files
+    """
+    npz_flags = [bounds_filepath.endswith('.npz') for bounds_filepath in bounds_filepaths]
+    if any(npz_flags) and not all(npz_flags):
+        raise ValueError("Bounds files should be either all .csv or all .npz files")
+    return any(npz_flags)
+
+
+def find_last_rows(reactions_ids: list) -> list:
+    """
+    :param reactions_ids: List of the reactions ids of a bounds file
+    :return: Row indexes of the last occurrence of each reaction id, in the order of the rows
+    """
+    last_rows = {rxn_id: row_index for row_index, rxn_id in enumerate(reactions_ids)}
+    return sorted(last_rows.values())
+
+
+def read_and_merge_bounds_files(bounds_filepaths: list) -> tuple:
+    """
+    This function, reads each bounds file of bounds_filepaths once and merges them together, by an inner join on the
+    reactions ids keeping the order of the first file. A repeated reaction id does not raise an error; only its last
+    row is kept, with a warning.
+    :param bounds_filepaths: List of paths for .csv (or .bounds, .npz) bounds files
+    :return: bounds_df, bounds_base_delta: The merged bounds; bounds_df for .csv files (or .csv and .bounds files),
+             and bounds_base_delta for .npz files, or a BoundsStoreView for .bounds files (the other one is None)
+    """
+    if not bounds_filepaths:
+        return None, None
+    # The .bounds stores (all of them) are kept on the disk, with the rows operations of the base-plus-delta bounds
+    is_store_view = all(is_bounds_store_path(bounds_filepath) for bounds_filepath in bounds_filepaths)
+    is_base_delta = is_store_view or is_base_delta_filepaths(bounds_filepaths)
+    bounds_list = []
+    reactions_ids_list = []
+    for bounds_filepath in bounds_filepaths:
+        if is_store_view:
+            bounds = BoundsStoreView.from_store(BoundsMatrixStore(bounds_filepath))
+            reactions_ids = bounds.reactions_ids
+        elif is_base_delta:
+            bounds = BaseDeltaBounds.load(bounds_filepath)
+            reactions_ids = bounds.reactions_ids
+        else:
+            bounds = read_bounds_dataframe(bounds_filepath)
+            reactions_ids = bounds['ID'].tolist()
+        last_rows = find_last_rows(reactions_ids)
+        if len(last_rows) < len(reactions_ids):
+            warnings.warn("Some reactions ids of " + bounds_filepath + " are repeated, only their last rows are kept")
+            if is_base_delta:
+                bounds = bounds.select_rows(rows_indexes=last_rows)
+            else:
+                bounds = bounds.iloc[last_rows].reset_index(drop=True)
+            reactions_ids = [reactions_ids[row_index] for row_index in last_rows]
+        bounds_list.append(bounds)
+        reactions_ids_list.append(reactions_ids)
+    if not is_base_delta:
+        bounds_df = bounds_list[0]
+        for bounds_file in bounds_list[1:]:
+            # Inner join on the reactions ids, keeping the order of the first file
+            bounds_df = pd.merge(bounds_df, bounds_file, on='ID', how='inner')
+        return bounds_df, None
+    common_reactions = set(reactions_ids_list[0]).intersection(*reactions_ids_list[1:])
+    joined_reactions_ids = [rxn_id for rxn_id in reactions_ids_list[0] if rxn_id in common_reactions]
+    bounds_base_delta = type(bounds_list[0]).concatenate(
+        [bounds.select_rows(rows_indexes=[bounds.reactions_index_map[rxn_id] for rxn_id in joined_reactions_ids])
+         for bounds in bounds_list])
+    return None, bounds_base_delta
+
+
+def get_bounds_reactions_ids(bounds_df, bounds_base_delta) -> list:
+    """
+    :return: The reactions ids of the merged bounds (see read_and_merge_bounds_files), [] if there is no bounds
+    """
+    if bounds_base_delta is not None:
+        return bounds_base_delta.reactions_ids
+    if bounds_df is not None:
+        return bounds_df['ID'].tolist()
+    return []
 
 
 class TemplateBoundsMaker:
@@ -18,10 +109,15 @@ class TemplateBoundsMaker:
                  template_bounds_filepath: str,
                  input_reactions_nomenclature: str = None,
                  template_reactions_nomenclature: str = None,
-                 reactions_translation_filepath: str = None):
+                 reactions_translation_filepath: str = None,
+                 equivalence_index_filepath: str = None,
+                 non_growth_lower_bounds_filepaths: list = None,
+                 non_growth_upper_bounds_filepaths: list = None):
         """
-        :param lower_bounds_filepaths: List of paths for all .csv lower_bounds to be merged and placed on the template.
-        :param upper_bounds_filepaths: List of paths for all .csv upper_bounds to be merged and placed on the template.
+        :param lower_bounds_filepaths: List of paths for all .csv (or .bounds, .npz) lower_bounds to be merged
+                                       and placed on the template.
+        :param upper_bounds_filepaths: List of paths for all .csv (or .bounds, .npz) upper_bounds to be merged
+                                       and placed on the template.
         :param internal_rxns_filepath: A string denoting the filepath for internal_rxns_bounds.csv file.
         :param template_bounds_filepath: The path for the template_bounds.csv file
         :param reactions_translation_filepath: The path for the reactions_translation.csv file
@@ -29,14 +125,29 @@ class TemplateBoundsMaker:
                                              corresponding to the reaction names in the lower/upper_bounds files
         :param template_reactions_nomenclature: The column name in the translation_file
                                                 corresponding to the template_bounds file
+        :param equivalence_index_filepath: The .npz filepath to save (and later reload) the reactions equivalence
+                                           index of the translation_file (see ReactionsTranslation)
+        :param non_growth_lower_bounds_filepaths: List of paths for the non-growth lower_bounds, placed on the
+                                                  template in the same run (lower_bounds_filepaths are the growth ones)
+        :param non_growth_upper_bounds_filepaths: List of paths for the non-growth upper_bounds
         """
         self.total_reactions_list = []
         self.lower_bounds_filepaths = lower_bounds_filepaths
         self.lower_bounds_df = None
+        self.lower_bounds_base_delta = None
         self.read_and_merge_lower_bounds()
         self.upper_bounds_filepaths = upper_bounds_filepaths
         self.upper_bounds_df = None
+        self.upper_bounds_base_delta = None
         self.read_and_merge_upper_bounds()
+        self.non_growth_lower_bounds_filepaths = non_growth_lower_bounds_filepaths
+        self.non_growth_upper_bounds_filepaths = non_growth_upper_bounds_filepaths
+        self.non_growth_lower_bounds_df = None
+        self.non_growth_lower_bounds_base_delta = None
+        self.non_growth_upper_bounds_df = None
+        self.non_growth_upper_bounds_base_delta = None
+        self.read_and_merge_non_growth_bounds()
+        self.make_total_reactions_list()
         # ###################################################
         self.internal_rxns_filepath = internal_rxns_filepath
         self.internal_rxns_ids = None
@@ -55,47 +166,56 @@ class TemplateBoundsMaker:
                                               input_reactions_nomenclature=input_reactions_nomenclature,
                                               template_reactions_nomenclature=template_reactions_nomenclature,
                                               list_of_input_reactions=self.total_reactions_list,
-                                              list_of_template_reactions=self.all_template_reactions)
+                                              list_of_template_reactions=self.all_template_reactions,
+                                              equivalence_index_filepath=equivalence_index_filepath)
+        self.template_scatter_indexes = {}
         # ###############################
         self.internal_rxns_temp = []
         self.template_placed_lower_bounds = None
         self.template_placed_upper_bounds = None
+        self.template_placed_non_growth_lower_bounds = None
+        self.template_placed_non_growth_upper_bounds = None
 
     def read_and_merge_lower_bounds(self):  # ToDo: columns names (and confidence)
         """
         This method, reads all lower_bound files of self.lower_bounds_filepaths and merges them together
-        :return: filling the self.lower_bounds_df
-        """
-        do_initiate = True
-        for lower_bounds_filepath in self.lower_bounds_filepaths:
-            lower_bounds_file = pd.read_csv(lower_bounds_filepath)
-            if do_initiate:
-                self.total_reactions_list = lower_bounds_file['ID'].tolist()
-                self.lower_bounds_df = lower_bounds_file
-                do_initiate = False
-            else:
-                lower_bounds_file = lower_bounds_file.drop('ID', 1)  # 1: column, 0:row
-                # Default inner join:
-                self.lower_bounds_df = pd.merge(self.lower_bounds_df, lower_bounds_file,
-                                                left_index=True, right_index=True)
+        :return: filling the self.lower_bounds_df (or self.lower_bounds_base_delta for .npz or .bounds files)
+        """
+        self.lower_bounds_df, self.lower_bounds_base_delta = read_and_merge_bounds_files(self.lower_bounds_filepaths)
 
     def read_and_merge_upper_bounds(self):
         """
         This method, reads all upper_bound files of self.upper_bounds_filepaths and merges them together
-        :return: filling the self.upper_bounds_df
-        """
-        do_initiate = True
-        for upper_bounds_filepath in self.upper_bounds_filepaths:
-            upper_bounds_file = pd.read_csv(upper_bounds_filepath)
-            if do_initiate:
-                self.total_reactions_list = upper_bounds_file['ID'].tolist()
-                self.upper_bounds_df = upper_bounds_file
-                do_initiate = False
-            else:
-                upper_bounds_file = upper_bounds_file.drop('ID', 1)  # 1: column, 0:row
-                # Default inner join:
-                self.upper_bounds_df = pd.merge(self.upper_bounds_df, upper_bounds_file,
-                                                left_index=True, right_index=True)
+        :return: filling the self.upper_bounds_df (or self.upper_bounds_base_delta for .npz or .bounds files)
+        """
+        self.upper_bounds_df, self.upper_bounds_base_delta = read_and_merge_bounds_files(self.upper_bounds_filepaths)
+
+    def read_and_merge_non_growth_bounds(self):
+        """
+        This method, reads all non-growth lower_bound and upper_bound files and merges them together
+        :return: filling the self.non_growth_lower/upper_bounds_df (or self.non_growth_lower/upper_bounds_base_delta)
+        """
+        self.non_growth_lower_bounds_df, self.non_growth_lower_bounds_base_delta = \
+            read_and_merge_bounds_files(self.non_growth_lower_bounds_filepaths)
+        self.non_growth_upper_bounds_df, self.non_growth_upper_bounds_base_delta = \
+            read_and_merge_bounds_files(self.non_growth_upper_bounds_filepaths)
+
+    def make_total_reactions_list(self):
+        """
+        This method, collects the reactions ids of all the bounds sets, so that they are translated once
+        :return: Filling self.total_reactions_list
+        """
+        total_reactions_set = set()
+        self.total_reactions_list = []
+        all_bounds = [(self.lower_bounds_df, self.lower_bounds_base_delta),
+                      (self.upper_bounds_df, self.upper_bounds_base_delta),
+                      (self.non_growth_lower_bounds_df, self.non_growth_lower_bounds_base_delta),
+                      (self.non_growth_upper_bounds_df, self.non_growth_upper_bounds_base_delta)]
+        for bounds_df, bounds_base_delta in all_bounds:
+            for rxn_id in get_bounds_reactions_ids(bounds_df=bounds_df, bounds_base_delta=bounds_base_delta):
+                if rxn_id not in total_reactions_set:
+                    total_reactions_set.add(rxn_id)
+                    self.total_reactions_list.append(rxn_id)
 
     def load_internal_reactions(self):
         """
@@ -118,8 +238,9 @@ class TemplateBoundsMaker:
         This method, finds corresponding ids for self.internal_rxns_ids in the template.
         :return: Filling self.internal_rxns_temp.
         """
+        total_reactions_set = set(self.total_reactions_list)
         for rxn_base_id in self.internal_rxns_ids:
-            if rxn_base_id in self.total_reactions_list:
+            if rxn_base_id in total_reactions_set:
                 rxn_template_ids = self.reaction_translator.translate(input_id=rxn_base_id)
                 if rxn_template_ids:
                     self.internal_rxns_temp.append(rxn_template_ids[0])
@@ -128,46 +249,136 @@ class TemplateBoundsMaker:
                 warn_text = "The internal reaction " + rxn_base_id + " is not a part of your organism"
                 warnings.warn(warn_text)
 
-    def make_template_lower_bounds(self):
+    def make_template_rows_pairs(self, reactions_ids: list) -> tuple:
+        """
+        :param reactions_ids: List of the organism's reactions ids (rows of the bounds)
+        :return: source_rows, template_rows: Index arrays, placing each row of the organism's bounds
+                 on the rows of its translated ids in the template
+        """
+        template_index_map = {rxn_id: row_index for row_index, rxn_id in enumerate(self.all_template_reactions)}
+        source_rows = []
+        template_rows = []
+        for source_row, rxn_id in enumerate(reactions_ids):
+            for template_id in self.reaction_translator.translate(input_id=rxn_id):
+                if template_id in template_index_map:
+                    source_rows.append(source_row)
+                    template_rows.append(template_index_map[template_id])
+        return np.array(source_rows, dtype=np.int64), np.array(template_rows, dtype=np.int64)
+
+    def make_template_scatter_indexes(self, reactions_ids: list) -> tuple:
+        """
+        :param reactions_ids: List of the organism's reactions ids (rows of the bounds)
+        :return: source_rows, template_rows: Index arrays with unique template rows. If several organism's
+                 reactions are translated into the same template reaction, the last one is effective.
+        """
+        reactions_key = tuple(reactions_ids)
+        if reactions_key in self.template_scatter_indexes:
+            return self.template_scatter_indexes[reactions_key]
+        source_rows, template_rows = self.make_template_rows_pairs(reactions_ids=reactions_ids)
+        # Last occurrences of the template rows, found as the first occurrences in the reversed order
+        unique_template_rows, reversed_positions = np.unique(template_rows[::-1], return_index=True)
+        self.template_scatter_indexes[reactions_key] = (source_rows[::-1][reversed_positions], unique_template_rows)
+        return self.template_scatter_indexes[reactions_key]
+
+    def place_dense_bounds(self, bounds_df, template_bound_column: str, columns_chunk_size: int = None):
+        """
+        This method, places the organism's bounds on the template by one scatter of the translated rows
+        (per chunk of columns).
+        :param bounds_df: Organism's bounds DataFrame, with the 'ID' column followed by the experiments columns
+        :param template_bound_column: 'Lower Bound' or 'Upper Bound'
+        :param columns_chunk_size: Number of columns placed in each scatter, all the columns at once if None
+        :return: The placed bounds DataFrame on the template, with the 'ID' column followed by the columns
+        """
+        all_data_columns = [data_column for data_column in bounds_df.columns if data_column != 'ID']
+        source_rows, template_rows = self.make_template_scatter_indexes(reactions_ids=bounds_df['ID'].tolist())
+        source_matrix = bounds_df[all_data_columns].to_numpy(dtype=float)
+        template_default_vector = self.template_bounds[template_bound_column].to_numpy(dtype=float)
+        placed_matrix = np.empty((len(self.all_template_reactions), len(all_data_columns)))
+        placed_matrix[:] = template_default_vector[:, np.newaxis]
+        if not columns_chunk_size:
+            columns_chunk_size = max(len(all_data_columns), 1)
+        for chunk_start in range(0, len(all_data_columns), columns_chunk_size):
+            chunk_end = chunk_start + columns_chunk_size
+            placed_matrix[template_rows, chunk_start:chunk_end] = source_matrix[source_rows, chunk_start:chunk_end]
+        placed_bounds = pd.DataFrame(placed_matrix, columns=all_data_columns)
+        placed_bounds.insert(0, 'ID', self.all_template_reactions)
+        return placed_bounds
+
+    def place_base_delta_bounds(self, bounds_base_delta, template_bound_column: str):
+        """
+        :param bounds_base_delta: Organism's bounds in the base-plus-delta format (or a BoundsStoreView)
+        :param template_bound_column: 'Lower Bound' or 'Upper Bound'
+        :return: The placed bounds on the template, in the same format
+        """
+        source_rows, template_rows = self.make_template_scatter_indexes(reactions_ids=bounds_base_delta.reactions_ids)
+        return bounds_base_delta.place_rows(source_rows=source_rows,
+                                            target_rows=template_rows,
+                                            target_reactions_ids=self.all_template_reactions,
+                                            target_default_vector=self.template_bounds[template_bound_column])
+
+    def place_bounds(self, bounds_df, bounds_base_delta, template_bound_column: str, columns_chunk_size: int = None):
+        """
+        :param bounds_df: Organism's bounds DataFrame (None for base-plus-delta bounds)
+        :param bounds_base_delta: Organism's base-plus-delta bounds or BoundsStoreView (None for DataFrame bounds)
+        :param template_bound_column: 'Lower Bound' or 'Upper Bound'
+        :param columns_chunk_size: Number of columns placed in each scatter, all the columns at once if None
+        :return: The placed bounds on the template, in the same format
+        """
+        if bounds_base_delta is not None:
+            return self.place_base_delta_bounds(bounds_base_delta=bounds_base_delta,
+                                                template_bound_column=template_bound_column)
+        return self.place_dense_bounds(bounds_df=bounds_df, template_bound_column=template_bound_column,
+                                       columns_chunk_size=columns_chunk_size)
+
+    def make_template_lower_bounds(self, columns_chunk_size: int = None):
         """
         This method, overrides the template lower bounds by existing organism's bounds based on self.translation_dict.
+        :param columns_chunk_size: Number of columns placed in each scatter, all the columns at once if None
         :return: Filling self.template_placed_lower_bounds.
         """
-        # ########## Initiate self.template_placed_lower_bounds with default Bounds #############
-        all_data_columns = list(self.lower_bounds_df.columns)
-        all_data_columns.remove('ID')
-        self.template_placed_lower_bounds = pd.DataFrame({'ID': self.all_template_reactions})
-        for data_column in all_data_columns:
-            self.template_placed_lower_bounds[data_column] = self.template_bounds['Lower Bound']
-        # ########### Finding corresponding rows and modify them in template rows ##############
-        for index, row in self.lower_bounds_df.iterrows():
-            template_ids = self.reaction_translator.translate(input_id=row['ID'])
-            for template_id in template_ids:
-                self.template_placed_lower_bounds.loc[
-                    self.template_placed_lower_bounds['ID'] == template_id,
-                    all_data_columns
-                ] = row[all_data_columns].tolist()
-
-    def make_template_upper_bounds(self):
+        self.template_placed_lower_bounds = self.place_bounds(bounds_df=self.lower_bounds_df,
+                                                              bounds_base_delta=self.lower_bounds_base_delta,
+                                                              template_bound_column='Lower Bound',
+                                                              columns_chunk_size=columns_chunk_size)
+
+    def make_template_upper_bounds(self, columns_chunk_size: int = None):
         """
         This method, overrides the template upper bounds by existing organism's bounds based on self.translation_dict.
+        :param columns_chunk_size: Number of columns placed in each scatter, all the columns at once if None
         :return: Filling self.template_placed_upper_bounds.
         """
-        # ########## Initiate self.template_placed_upper_bounds with default Bounds #############
-        all_data_columns = list(self.upper_bounds_df.columns)
-        all_data_columns.remove('ID')
-        self.template_placed_upper_bounds = pd.DataFrame({'ID': self.all_template_reactions})
-        for data_column in all_data_columns:
-            self.template_placed_upper_bounds[data_column] = self.template_bounds['Upper Bound']
-        # ########### Finding corresponding rows and modify them in template rows ##############
-        for index, row in self.upper_bounds_df.iterrows():
-            template_ids = self.reaction_translator.translate(input_id=row['ID'])
-            for template_id in template_ids:
-                if template_id in self.all_template_reactions:
-                    self.template_placed_upper_bounds.loc[
-                        self.template_placed_upper_bounds['ID'] == template_id,
-                        all_data_columns
-                    ] = row[all_data_columns].tolist()
+        self.template_placed_upper_bounds = self.place_bounds(bounds_df=self.upper_bounds_df,
+                                                              bounds_base_delta=self.upper_bounds_base_delta,
+                                                              template_bound_column='Upper Bound',
+                                                              columns_chunk_size=columns_chunk_size)
+
+    def make_template_non_growth_bounds(self, columns_chunk_size: int = None):
+        """
+        This method, overrides the template lower and upper bounds by the non-growth organism's bounds.
+        :param columns_chunk_size: Number of columns placed in each scatter, all the columns at once if None
+        :return: Filling self.template_placed_non_growth_lower/upper_bounds.
+        """
+        self.template_placed_non_growth_lower_bounds = self.place_bounds(
+            bounds_df=self.non_growth_lower_bounds_df,
+            bounds_base_delta=self.non_growth_lower_bounds_base_delta,
+            template_bound_column='Lower Bound',
+            columns_chunk_size=columns_chunk_size)
+        self.template_placed_non_growth_upper_bounds = self.place_bounds(
+            bounds_df=self.non_growth_upper_bounds_df,
+            bounds_base_delta=self.non_growth_upper_bounds_base_delta,
+            template_bound_column='Upper Bound',
+            columns_chunk_size=columns_chunk_size)
+
+    def make_all_template_bounds(self, columns_chunk_size: int = None):
+        """
+        This method, places all the growth and (if given) non-growth bounds on the template in one run
+        :param columns_chunk_size: Number of columns placed in each scatter, all the columns at once if None
+        :return: Filling self.template_placed_(non_growth_)lower/upper_bounds
+        """
+        self.make_template_lower_bounds(columns_chunk_size=columns_chunk_size)
+        self.make_template_upper_bounds(columns_chunk_size=columns_chunk_size)
+        if self.non_growth_lower_bounds_filepaths or self.non_growth_upper_bounds_filepaths:
+            self.make_template_non_growth_bounds(columns_chunk_size=columns_chunk_size)
 
     def save_existing_reaction(self, path_to_save: str):
         """
@@ -177,15 +388,32 @@ class TemplateBoundsMaker:
         with open(path_to_save, 'w') as file:
             json.dump(self.internal_rxns_temp, file)
 
-    def save_final_bounds(self, folder_to_save: str):
+    def save_final_bounds(self, folder_to_save: str, file_format: str = 'csv', binary_dtype=np.float64):
         """
         :param folder_to_save: Folder path to save final lower and upper bound
+                               ("lower_bounds" and "upper_bounds", and "ng_lower_bounds" and "ng_upper_bounds"
+                               for the non-growth bounds, if placed)
+        :param file_format: "csv" for .csv files, or "binary" for BoundsMatrixStore folders (.bounds).
+                            Base-plus-delta bounds are always saved as .npz files.
+        :param binary_dtype: The data type of the binary stores, np.float64 or np.float32
         :return: -
         """
         if not os.path.exists(folder_to_save):
             os.makedirs(folder_to_save)
-        self.template_placed_lower_bounds.to_csv(folder_to_save + 'lower_bounds.csv', index=False)
-        self.template_placed_upper_bounds.to_csv(folder_to_save + 'upper_bounds.csv', index=False)
+        for placed_bounds, filename in [(self.template_placed_lower_bounds, 'lower_bounds'),
+                                        (self.template_placed_upper_bounds, 'upper_bounds'),
+                                        (self.template_placed_non_growth_lower_bounds, 'ng_lower_bounds'),
+                                        (self.template_placed_non_growth_upper_bounds, 'ng_upper_bounds')]:
+            if placed_bounds is None:
+                continue
+            if isinstance(placed_bounds, BaseDeltaBounds):
+                placed_bounds.save(folder_to_save + filename + '.npz')
+            elif isinstance(placed_bounds, BoundsStoreView):
+                save_bounds_view(bounds_view=placed_bounds, filepath_prefix=folder_to_save + filename,
+                                 file_format=file_format, dtype=binary_dtype)
+            else:
+                save_bounds_dataframe(bounds_df=placed_bounds, filepath_prefix=folder_to_save + filename,
+                                      file_format=file_format, dtype=binary_dtype)
 
 
 g_lb_filepaths = ["../Data/Palsson B.Subtilis Reconstruction/Util Bounds/g_lower_bounds.csv",
@@ -204,24 +432,14 @@ micro_template_filepath = "../Data/Palsson B.Subtilis Reconstruction/Microbial T
 g_obj = TemplateBoundsMaker(
     lower_bounds_filepaths=g_lb_filepaths,
     upper_bounds_filepaths=g_ub_filepaths,
+    non_growth_lower_bounds_filepaths=ng_lb_filepaths,
+    non_growth_upper_bounds_filepaths=ng_ub_filepaths,
     internal_rxns_filepath="../Data/Palsson B.Subtilis Reconstruction/Internal_Rxns_Bounds.csv",
     template_bounds_filepath=micro_template_filepath,
     input_reactions_nomenclature="Base id",
     template_reactions_nomenclature="BiGG ids",
     reactions_translation_filepath="../Data/Palsson B.Subtilis Reconstruction/BiGG_Univ_Translation.csv")
 g_obj.translate_internal_reactions()
-g_obj.make_template_lower_bounds()
-g_obj.make_template_upper_bounds()
+g_obj.make_all_template_bounds()
 g_obj.save_existing_reaction(path_to_save="../Data/Palsson B.Subtilis Reconstruction/existing_rxns.json")
 g_obj.save_final_bounds(folder_to_save="../Data/Palsson B.Subtilis Reconstruction/Micro-Template Placed Bounds/")
-
-# ng_obj = TemplateBoundsMaker(
-#     lower_bounds_filepaths=ng_lb_filepaths,
-#     upper_bounds_filepaths=ng_ub_filepaths,
-#     template_bounds_filepath="../Data/Palsson B.Subtilis Reconstruction/Universal Bounds.csv",
-#     input_reactions_nomenclature="BiGG id",
-#     template_reactions_nomenclature="BiGG id",
-#     reactions_translation_filepath="../Data/Palsson B.Subtilis Reconstruction/Reactions Translation.csv")
-# ng_obj.make_template_lower_bounds()
-# ng_obj.make_template_upper_bounds()
-# ng_obj.save_final_bounds(folder_to_save="../Data/Palsson B.Subtilis Reconstruction/Template Placed Bounds/")
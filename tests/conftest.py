@@ -0,0 +1,52 @@
+import json
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+import scipy.sparse
+
+REPOSITORY_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for folder_name in ['', 'Knock-out Parser', 'SourceUtil Parser', 'Template Merger', 'Multicolumn Solver']:
+    sys.path.insert(0, os.path.join(REPOSITORY_FOLDER, folder_name))
+
+from StoichiometryMatrix import save_stoichiometry_matrix
+
+
+@pytest.fixture
+def write_final_data_folder(tmp_path):
+    """
+    :return: A function writing a final data folder (as BiomassFinalizer.save_final_data does) into tmp_path
+    """
+    def write(folder_name: str, stoichiometry: dict, metabolites_ids: list, reactions_ids: list,
+              existing_reactions_ids: list, bounds: dict) -> str:
+        """
+        :param stoichiometry: A dict in the format of {(met_id, rxn_id): coefficient}
+        :param bounds: A dict in the format of {'L': (reactions x columns) array, 'U': ..., 'ng_L': ..., 'ng_U': ...}
+        :return: The path of the folder
+        """
+        folder = str(tmp_path / folder_name)
+        os.makedirs(folder)
+        metabolites_index_map = {met_id: met_index for met_index, met_id in enumerate(metabolites_ids)}
+        reactions_index_map = {rxn_id: rxn_index for rxn_index, rxn_id in enumerate(reactions_ids)}
+        rows, cols, coefficients = [], [], []
+        for (met_id, rxn_id), coefficient in stoichiometry.items():
+            rows.append(metabolites_index_map[met_id])
+            cols.append(reactions_index_map[rxn_id])
+            coefficients.append(coefficient)
+        save_stoichiometry_matrix(scipy.sparse.coo_matrix((coefficients, (rows, cols)),
+                                                          shape=(len(metabolites_ids), len(reactions_ids))),
+                                  os.path.join(folder, 'S.npz'))
+        for bounds_name, bounds_matrix in bounds.items():
+            bounds_matrix = np.asarray(bounds_matrix, dtype=np.float64)
+            pd.DataFrame(bounds_matrix, columns=['c' + str(column_index + 1)
+                                                 for column_index in range(bounds_matrix.shape[1])]).to_csv(
+                os.path.join(folder, bounds_name + '.csv'), index=False)
+        with open(os.path.join(folder, 'reactions_index_map.json'), 'w') as file:
+            json.dump(reactions_index_map, file)
+        with open(os.path.join(folder, 'metabolites_index_map.json'), 'w') as file:
+            json.dump(metabolites_index_map, file)
+        with open(os.path.join(folder, 'existing_reactions.json'), 'w') as file:
+            json.dump([reactions_index_map[rxn_id] for rxn_id in existing_reactions_ids], file)
+        return folder
+    return write
@@ -0,0 +1,28 @@
+import json
+import pytest
+from BioDataParser import ModelStore, save_bigg_model
+
+
+def test_repeated_metabolite_is_reported():
+    model_store = ModelStore()
+    model_store.add_metabolite(met_id='a_c')
+    with pytest.raises(ValueError, match='a_c'):
+        model_store.add_metabolite(met_id='a_c')
+
+
+def test_saved_model_keeps_the_values_as_read(tmp_path):
+    model_data = {'metabolites': [{'id': 'b_c', 'name': 'B', 'notes': {}}, {'id': 'a_c', 'name': 'A', 'notes': {}}],
+                  'reactions': [{'id': 'R1', 'name': 'R1', 'metabolites': {'b_c': 1, 'a_c': -1.0},
+                                 'lower_bound': 0, 'upper_bound': 1000.0,
+                                 'notes': {'original_bigg_ids': ['R1']}}]}
+    model_filename = str(tmp_path / 'model.json')
+    with open(model_filename, 'w') as f:
+        json.dump(model_data, f)
+    save_bigg_model(model_filename, str(tmp_path), True)
+    assert (tmp_path / 'S.txt').read_text() == "2 1\n1 1 1\n2 1 -1.0\n"
+    assert (tmp_path / 'l.txt').read_text() == "1\n0\n"
+    assert (tmp_path / 'u.txt').read_text() == "1\n1000.0\n"
+    the_reaction = ModelStore.from_model_data(model_data).make_reactions_views()['R1']
+    assert the_reaction.get_metabolites() == {'b_c': 1, 'a_c': -1.0}
+    assert type(the_reaction.get_metabolites()['b_c']) is int
+    assert type(the_reaction.get_lower_bound()) is int and type(the_reaction.get_upper_bound()) is float
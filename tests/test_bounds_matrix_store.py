@@ -0,0 +1,60 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from BoundsMatrixStore import BoundsMatrixStore, BoundsStoreView, save_bounds_view
+
+
+def test_overwritten_store_keeps_no_stale_chunks(tmp_path):
+    store_path = str(tmp_path / 'L.bounds')
+    BoundsMatrixStore.write(store_path=store_path, reactions_ids=['R1', 'R2'], columns_names=['c1', 'c2', 'c3'],
+                            bounds_matrix=np.arange(6.0).reshape(2, 3), chunk_num_columns=1)
+    store = BoundsMatrixStore.write(store_path=store_path, reactions_ids=['R1', 'R2'], columns_names=['c1'],
+                                    bounds_matrix=np.ones((2, 1)), chunk_num_columns=1)
+    assert sorted(os.listdir(store_path)) == ['chunk_0.npy', 'metadata.json']
+    assert np.array_equal(store.get_columns(), np.ones((2, 1)))
+
+
+def test_csv_without_ids_is_imported_with_the_reactions_ids(tmp_path):
+    store = BoundsMatrixStore.write(store_path=str(tmp_path / 'L.bounds'), reactions_ids=['R1', 'R2'],
+                                    columns_names=['c1', 'c2'], bounds_matrix=np.array([[1.0, 2.0], [3.0, 4.0]]))
+    csv_filepath = str(tmp_path / 'L.csv')
+    store.export_csv(csv_filepath, include_ids=False)
+    with pytest.raises(ValueError):
+        BoundsMatrixStore.import_csv(csv_filepath, store_path=str(tmp_path / 'imported.bounds'))
+    imported_store = BoundsMatrixStore.import_csv(csv_filepath, store_path=str(tmp_path / 'imported.bounds'),
+                                                  reactions_ids=['R1', 'R2'])
+    assert imported_store.reactions_ids == ['R1', 'R2']
+    assert np.array_equal(imported_store.get_columns(), store.get_columns())
+
+
+def test_store_view_rows_operations_match_the_dense_bounds(tmp_path):
+    first_matrix = np.arange(12.0).reshape(4, 3)
+    second_matrix = -np.arange(8.0).reshape(4, 2)
+    stores = [BoundsMatrixStore.write(store_path=str(tmp_path / (store_name + '.bounds')),
+                                      reactions_ids=['R1', 'R2', 'R3', 'R4'], columns_names=columns_names,
+                                      bounds_matrix=bounds_matrix, chunk_num_columns=2)
+              for store_name, columns_names, bounds_matrix in [('first', ['a1', 'a2', 'a3'], first_matrix),
+                                                                ('second', ['b1', 'b2'], second_matrix)]]
+    bounds_view = BoundsStoreView.concatenate([BoundsStoreView.from_store(store).select_rows([3, 0, 2])
+                                               for store in stores])
+    expected_matrix = np.hstack([first_matrix, second_matrix])[[3, 0, 2]]
+    assert bounds_view.columns_names == ['a1', 'a2', 'a3', 'b1', 'b2']
+    assert np.array_equal(bounds_view.to_dense(), expected_matrix)
+    # Placing R4 and R3 on the template rows T1 and T3, the other rows take the template defaults
+    placed_view = bounds_view.place_rows(source_rows=[0, 2], target_rows=[0, 2],
+                                         target_reactions_ids=['T1', 'T2', 'T3'],
+                                         target_default_vector=[-1000.0, -5.0, -1000.0])
+    placed_view.set_row_value(rxn_id='T3', value=0.1)
+    expected_placed = np.vstack([expected_matrix[0], np.full(5, -5.0), np.full(5, 0.1)])
+    assert np.array_equal(placed_view.to_dense(columns_indexes=[4, 0, 3]), expected_placed[:, [4, 0, 3]])
+    assert np.array_equal(bounds_view.to_dense(), expected_matrix)
+    saved_path = save_bounds_view(placed_view, filepath_prefix=str(tmp_path / 'placed'), file_format='binary')
+    saved_store = BoundsMatrixStore(saved_path)
+    assert saved_store.reactions_ids == ['T1', 'T2', 'T3']
+    assert np.array_equal(saved_store.get_columns(), expected_placed)
+    with pytest.raises(ValueError):
+        save_bounds_view(BoundsStoreView.from_store(stores[0]), filepath_prefix=str(tmp_path / 'first'),
+                         file_format='binary')
+    save_bounds_view(placed_view, filepath_prefix=str(tmp_path / 'placed'), include_ids=False)
+    assert np.array_equal(pd.read_csv(str(tmp_path / 'placed.csv')).to_numpy(), expected_placed)
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+from MulticolumnSolver import MulticolumnSolver
+from DuplicateCollapser import DuplicateCollapser
+
+
+@pytest.fixture
+def duplicates_folder(write_final_data_folder):
+    # EX_a -> a, R1 and R1dup: a -> b (non-existing duplicates), Growth: b ->
+    stoichiometry = {('a', 'EX_a'): 1.0,
+                     ('a', 'R1'): -1.0, ('b', 'R1'): 1.0,
+                     ('a', 'R1dup'): -1.0, ('b', 'R1dup'): 1.0,
+                     ('b', 'Growth'): -1.0}
+    return write_final_data_folder('final', stoichiometry, ['a', 'b'], ['EX_a', 'R1', 'R1dup', 'Growth'],
+                                   existing_reactions_ids=['EX_a', 'Growth'],
+                                   bounds={'L': [[0.0, 0.0], [0.0, 0.0], [0.0, 0.0], [0.5, 2.0]],
+                                           'U': [[10.0, 10.0], [10.0, 10.0], [10.0, 10.0], [10.0, 10.0]]})
+
+
+def solve_objectives(final_data_folder: str, growth_objective: str):
+    solver = MulticolumnSolver(final_data_folder=final_data_folder, biomass_template_id='Growth',
+                               growth_objective=growth_objective)
+    solver.solve_all_columns()
+    assert (solver.columns_summary['status'] == 'optimal').all()
+    return solver.columns_summary['objective'].to_numpy(dtype=np.float64)
+
+
+@pytest.mark.parametrize('growth_objective', ['l1', 'cardinality'])
+def test_collapsed_objectives_match_uncollapsed(duplicates_folder, tmp_path, growth_objective):
+    collapser = DuplicateCollapser(final_data_folder=duplicates_folder, biomass_template_id='Growth',
+                                   cardinality=growth_objective == 'cardinality')
+    report = collapser.compress()
+    assert report['duplicate_groups'] == (1 if growth_objective == 'l1' else 0)
+    collapsed_folder = str(tmp_path / 'collapsed')
+    collapser.save_compressed_data(folder_to_save=collapsed_folder)
+    assert np.allclose(solve_objectives(collapsed_folder, growth_objective),
+                       solve_objectives(duplicates_folder, growth_objective))
+
+
+def test_cardinality_warns_on_collapsed_non_existing_duplicates(duplicates_folder, tmp_path):
+    collapser = DuplicateCollapser(final_data_folder=duplicates_folder, biomass_template_id='Growth')
+    collapser.compress()
+    collapsed_folder = str(tmp_path / 'collapsed')
+    collapser.save_compressed_data(folder_to_save=collapsed_folder)
+    with pytest.warns(UserWarning, match='cardinality'):
+        MulticolumnSolver(final_data_folder=collapsed_folder, biomass_template_id='Growth',
+                          growth_objective='cardinality')
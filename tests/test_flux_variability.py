@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+from FluxVariability import FluxVariability
+from MulticolumnSolver import MulticolumnSolver
+from NetworkCompressor import NetworkCompressor
+
+
+def test_no_solved_reactions_is_reported(write_final_data_folder, tmp_path):
+    # R_dead consumes d, which is never produced, so the compressor removes it
+    stoichiometry = {('a', 'EX_a'): 1.0,
+                     ('a', 'R1'): -1.0, ('b', 'R1'): 1.0,
+                     ('b', 'Growth'): -1.0,
+                     ('d', 'R_dead'): -1.0}
+    reactions_ids = ['EX_a', 'R1', 'R_dead', 'Growth']
+    final_data_folder = write_final_data_folder('final', stoichiometry, ['a', 'b', 'd'], reactions_ids,
+                                                existing_reactions_ids=['EX_a', 'Growth'],
+                                                bounds={'L': [[0.0], [0.0], [0.0], [0.5]],
+                                                        'U': [[10.0], [10.0], [10.0], [10.0]]})
+    compressor = NetworkCompressor(final_data_folder=final_data_folder, biomass_template_id='Growth')
+    compressor.compress()
+    compressed_folder = str(tmp_path / 'compressed')
+    compressor.save_compressed_data(folder_to_save=compressed_folder)
+    solver = MulticolumnSolver(final_data_folder=compressed_folder, biomass_template_id='Growth')
+    with pytest.raises(ValueError, match='R_dead'):
+        FluxVariability(solver=solver, reactions_ids=['R_dead'])
+    variability = FluxVariability(solver=solver, reactions_ids=['R_dead', 'Growth'])
+    variability.analyze_all_columns()
+    assert np.allclose(variability.ranges[0], 0.0)
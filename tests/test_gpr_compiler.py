@@ -0,0 +1,27 @@
+import numpy as np
+from GPR_Compiler import GPRCompiler
+
+
+def test_knock_outs_evaluation_agrees_with_knocker_out_genes():
+    gpr_expressions = {'R_empty_or': {'GPAOr': []},
+                       'R_and_empty_or': {'GPAAnd': [{'GPARef': 'a'}, {'GPAOr': []}]},
+                       'R_or_nested': {'GPAOr': [{'GPARef': 'a'},
+                                                 {'GPAAnd': [{'GPARef': 'b'}, {'GPAOr': []}]}]},
+                       'R_complex': {'GPAAnd': [{'GPARef': 'b'}, {'GPAOr': [{'GPARef': 'a'}, {'GPARef': 'c'}]}]},
+                       'R_no_gpr': {}}
+    gpr_compiler = GPRCompiler()
+    for rxn_id, gpr_expression in gpr_expressions.items():
+        gpr_compiler.add_reaction(rxn_id=rxn_id, gpr_expression=gpr_expression)
+    strains_ko_genes = [[]] + [[gene_id] for gene_id in gpr_compiler.genes_ids]
+    shut_matrix = gpr_compiler.evaluate_knock_outs(gpr_compiler.make_deletion_matrix(strains_ko_genes)).toarray()
+    for reaction_position in range(len(gpr_compiler.reactions_ids)):
+        knocker_out_genes = [gpr_compiler.genes_ids[gene_index]
+                             for gene_index in gpr_compiler.get_reaction_knocker_out_genes(reaction_position)]
+        for strain_index, ko_genes in enumerate(strains_ko_genes):
+            if gpr_compiler.is_reaction_always_knocked_out(reaction_position):
+                # Shut by any gene
+                is_shut = len(ko_genes) > 0
+            else:
+                is_shut = bool(set(ko_genes) & set(knocker_out_genes))
+            assert shut_matrix[strain_index, reaction_position] == is_shut
+    assert not np.any(shut_matrix[0])
@@ -0,0 +1,56 @@
+import os
+import numpy as np
+import pandas as pd
+from MulticolumnSolver import MulticolumnSolver
+from NetworkCompressor import NetworkCompressor
+
+
+def test_reactions_lumped_into_biomass_stay_penalized(write_final_data_folder, tmp_path):
+    # EX_a -> a, R1: a -> b, R17: b -> 2 c, Growth: c ->, so R17 is lumped into Growth with the ratio 0.5
+    stoichiometry = {('a', 'EX_a'): 1.0,
+                     ('a', 'R1'): -1.0, ('b', 'R1'): 1.0,
+                     ('b', 'R17'): -1.0, ('c', 'R17'): 2.0,
+                     ('c', 'Growth'): -1.0}
+    reactions_ids = ['EX_a', 'R1', 'R17', 'Growth']
+    lower_bounds = np.array([[0.0, 0.0], [0.0, 0.0], [0.0, 0.0], [0.1, 0.4]])
+    upper_bounds = np.full((4, 2), 10.0)
+    final_data_folder = write_final_data_folder('final', stoichiometry, ['a', 'b', 'c'], reactions_ids,
+                                                existing_reactions_ids=['EX_a', 'Growth'],
+                                                bounds={'L': lower_bounds, 'U': upper_bounds})
+    compressor = NetworkCompressor(final_data_folder=final_data_folder, biomass_template_id='Growth')
+    compressor.compress()
+    assert len(compressor.groups_ids) < len(reactions_ids)
+    compressed_folder = str(tmp_path / 'compressed')
+    compressor.save_compressed_data(folder_to_save=compressed_folder)
+    for growth_objective in ['l1', 'cardinality']:
+        objective_values = []
+        for folder in [final_data_folder, compressed_folder]:
+            solver = MulticolumnSolver(final_data_folder=folder, biomass_template_id='Growth',
+                                       growth_objective=growth_objective)
+            solver.solve_all_columns()
+            assert solver.columns_summary['status'].tolist() == ['optimal', 'optimal']
+            objective_values.append(solver.columns_summary['objective'].to_numpy(dtype=np.float64))
+        assert np.allclose(objective_values[0], objective_values[1])
+
+
+def test_compressed_fluxes_are_saved_with_template_ids(write_final_data_folder, tmp_path):
+    stoichiometry = {('a', 'EX_a'): 1.0,
+                     ('a', 'R1'): -1.0, ('b', 'R1'): 1.0,
+                     ('b', 'R2'): -1.0, ('c', 'R2'): 1.0,
+                     ('c', 'Growth'): -1.0}
+    reactions_ids = ['EX_a', 'R1', 'R2', 'Growth']
+    final_data_folder = write_final_data_folder('final', stoichiometry, ['a', 'b', 'c'], reactions_ids,
+                                                existing_reactions_ids=['EX_a', 'Growth'],
+                                                bounds={'L': [[0.0], [0.0], [0.0], [0.5]],
+                                                        'U': [[10.0], [10.0], [10.0], [10.0]]})
+    compressor = NetworkCompressor(final_data_folder=final_data_folder, biomass_template_id='Growth')
+    compressor.compress()
+    compressed_folder = str(tmp_path / 'compressed')
+    compressor.save_compressed_data(folder_to_save=compressed_folder)
+    solver = MulticolumnSolver(final_data_folder=compressed_folder, biomass_template_id='Growth')
+    solver.solve_all_columns()
+    results_folder = str(tmp_path / 'results')
+    solver.save_results(folder_to_save=results_folder)
+    fluxes_df = pd.read_csv(os.path.join(results_folder, 'final_csv.csv'))
+    assert fluxes_df['ID'].tolist() == reactions_ids
+    assert np.allclose(fluxes_df['x1'].to_numpy(), 0.5)
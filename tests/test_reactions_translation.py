@@ -0,0 +1,23 @@
+import pandas as pd
+from ReactionsTranslation import ReactionsEquivalenceIndex, Translator
+
+
+def test_translation_rows_are_not_chained(tmp_path):
+    # A~B and B~C come from two rows, so A and C stay distinct
+    translation_filepath = str(tmp_path / 'translation.csv')
+    pd.DataFrame({'input': ["['A']", "['C']"], 'template': ["['B']", "['B'; 'T_C']"]}).to_csv(translation_filepath,
+                                                                                            index=False)
+    index_filepath = str(tmp_path / 'index.npz')
+    for _ in range(2):
+        # Built, then reloaded from index_filepath
+        translator = Translator(reactions_translation_filepath=translation_filepath,
+                                input_reactions_nomenclature='input', template_reactions_nomenclature='template',
+                                list_of_input_reactions=['A', 'C'], list_of_template_reactions=['B', 'T_C'],
+                                equivalence_index_filepath=index_filepath)
+        assert translator.translate('A') == ['B']
+        assert translator.translate('C') == ['B', 'T_C']
+    equivalence_index = ReactionsEquivalenceIndex.load(index_filepath)
+    assert [equivalence_index.ids[id_index] for id_index in equivalence_index.get_equivalent_indexes('B')] == \
+           ['A', 'B', 'C', 'T_C']
+    assert [equivalence_index.ids[id_index] for id_index in equivalence_index.get_equivalent_indexes('A')] == \
+           ['A', 'B']